@@ -5,6 +5,20 @@
 #define NUM_LEDS 64
 #define DEBOUNCE_CHECKS 5  // Number of checks to confirm a change
 
+// Binary framing (see the communication protocol in the README) :
+// SYNC | LENGTH | COMMAND ID | SEQUENCE NUMBER | PAYLOAD (LENGTH - 2 bytes) | CRC-8 of LENGTH to PAYLOAD
+#define FRAME_SYNC 0xA5
+#define FRAME_HEADER_LENGTH 2
+#define MAX_FRAME_LENGTH (FRAME_HEADER_LENGTH + NUM_LEDS * 3)
+
+#define CMD_LEDS_RANGE 1
+#define CMD_LEDS_MULTI 4
+#define CMD_BOARD_DATA 5
+#define CMD_ASK_BOARD_STATE 6
+#define CMD_LEDS_FRAME 7
+#define CMD_PING 9
+#define CMD_ACK 15
+
 CRGB leds[NUM_LEDS];
 
 int rowpins[BOARD_SIZE] = {11, 12, A0, A1, A2, A3, A4, A5}; // set row pin numbers
@@ -16,6 +30,9 @@ int lastSentBoardState[BOARD_SIZE * BOARD_SIZE]; // store the last sent state
 
 bool boardChanged = false; // Flag to indicate if the board state has changed
 
+uint8_t frame[MAX_FRAME_LENGTH + 1]; // Body (from the command ID) and CRC of the frame being read
+uint8_t boardSequenceNumber = 0; // Sequence number of the board data frames sent
+
 void setup() {
   Serial.begin(9600); // Start serial comms
   delay(2000);
@@ -89,72 +106,111 @@ void readReedMatrix() {
   delay(50); // Adjust this delay as needed
 }
 
+uint8_t CRC8(uint8_t crc, const uint8_t *data, int length) {
+  // CRC-8, polynomial x^8 + x^2 + x + 1 (same as crc8 in arduino_com.py)
+  for (int i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+void SendFrame(uint8_t command_id, uint8_t sequence_number, const uint8_t *payload, int payload_length) {
+  uint8_t header[3] = {(uint8_t)(payload_length + FRAME_HEADER_LENGTH), command_id, sequence_number};
+  uint8_t crc = CRC8(0, header, 3);
+  crc = CRC8(crc, payload, payload_length);
+
+  Serial.write(FRAME_SYNC);
+  Serial.write(header, 3);
+  Serial.write(payload, payload_length);
+  Serial.write(crc);
+}
+
 void SendBoardViaSerial() {
-    String boardData = "0101";  // Command ID for sending board data
+    // 8 bytes occupancy bitmap, bit i is square i
+    uint8_t occupancy[BOARD_SIZE] = {0};
     for (int i = 0; i < BOARD_SIZE * BOARD_SIZE; i++) {
-        boardData += String(board[i]);
-    }
-    // Ensure the data is exactly 64 bits long
-    while (boardData.length() < 64) {
-        boardData += '0'; // Pad with zeros if needed
+        if (board[i]) {
+            occupancy[i / 8] |= 1 << (i % 8);
+        }
     }
-    Serial.print(boardData + ';');
+    SendFrame(CMD_BOARD_DATA, boardSequenceNumber++, occupancy, BOARD_SIZE);
 }
 
 void ReadCommands(){
   // Check if there is incoming data from the computer
   if (Serial.available() > 0) {
-    String data = Serial.readStringUntil(';'); // Read incoming data until a ; character
+    // Skip the bytes until the start of a frame
+    if (Serial.read() != FRAME_SYNC) {
+      return;
+    }
 
-    int command_id = strtol(data.substring(0, 4).c_str(), nullptr, 2);
-    
-    if (command_id == 1 ){
-      int start_index = strtol(data.substring(4, 10).c_str(), nullptr, 2);
-      int end_index = strtol(data.substring(10, 16).c_str(), nullptr, 2);
-      int r = strtol(data.substring(17, 24 ).c_str(), nullptr, 2);
-      int g = strtol(data.substring(24, 32 ).c_str(), nullptr, 2);
-      int b = strtol(data.substring(32, 40 ).c_str(), nullptr, 2);
+    uint8_t length;
+    if (Serial.readBytes(&length, 1) != 1 || length < FRAME_HEADER_LENGTH || length > MAX_FRAME_LENGTH) {
+      return;
+    }
+
+    // Read the body and the CRC, a corrupted frame is not acknowledged so the RPI sends it again
+    if (Serial.readBytes(frame, length + 1) != length + 1) {
+      return;
+    }
+    uint8_t crc = CRC8(CRC8(0, &length, 1), frame, length);
+    if (crc != frame[length]) {
+      return;
+    }
+
+    uint8_t command_id = frame[0];
+    uint8_t sequence_number = frame[1];
+    uint8_t *payload = frame + FRAME_HEADER_LENGTH;
+    int payload_length = length - FRAME_HEADER_LENGTH;
+
+    if (command_id == CMD_LEDS_RANGE && payload_length == 5){
+      int start_index = payload[0];
+      int end_index = payload[1];
 
       for (int i = start_index; i <= end_index; i++) {
         if (i >= 0 && i < NUM_LEDS) {
-          leds[i] = CRGB(r, g, b);
+          leds[i] = CRGB(payload[2], payload[3], payload[4]);
+        }
+      }
+      FastLED.show(); // Update the LEDs
+      SendAck(sequence_number);
+    }
+    else if (command_id == CMD_LEDS_MULTI && payload_length >= 4 && payload_length == 4 + payload[0]){
+      int length_leds = payload[0];
+
+      for (int i = 0; i < length_leds; i++){
+        int index_led = payload[4 + i];
+        if (index_led < NUM_LEDS) {
+          leds[index_led] = CRGB(payload[1], payload[2], payload[3]);
         }
       }
       FastLED.show(); // Update the LEDs
-      SendAck();
+      SendAck(sequence_number);
     }
-    else if (command_id == 4 ){
-      int length = strtol(data.substring(4, 10).c_str(), nullptr, 2);
-      int r = strtol(data.substring(10, 18 ).c_str(), nullptr, 2);
-      int g = strtol(data.substring(18, 26 ).c_str(), nullptr, 2);
-      int b = strtol(data.substring(26, 34 ).c_str(), nullptr, 2);
-
-      int index_led = 100;
-      int st = 34; 
-      for (int i = 0; i< length; i++){
-        index_led = strtol(data.substring(st, st+6).c_str(), nullptr, 2);
-        leds[index_led] = CRGB(r,g,b); 
-        st += 6; 
+    else if (command_id == CMD_LEDS_FRAME && payload_length == NUM_LEDS * 3){
+      // Raw RGB bytes of every LED, in the order of the strip
+      for (int i = 0; i < NUM_LEDS; i++){
+        leds[i] = CRGB(payload[i * 3], payload[i * 3 + 1], payload[i * 3 + 2]);
       }
       FastLED.show(); // Update the LEDs
-      SendAck();
+      SendAck(sequence_number);
     }
-    else if (command_id == 6){
-      SendAck(); 
+    else if (command_id == CMD_ASK_BOARD_STATE){
+      SendAck(sequence_number); 
       SendBoardViaSerial(); 
     }
-    else if (command_id == 9){
+    else if (command_id == CMD_PING){
       // This is a test command to see if is working
-      SendAck(); 
+      SendAck(sequence_number); 
     }
-
-    // Check the ID of the command 
   }
 }
 
 
-void SendAck(){
-  // Send acknowledgement to RPI 
-  Serial.print("1111;");
+void SendAck(uint8_t sequence_number){
+  // Send acknowledgement to RPI, with the sequence number of the command
+  SendFrame(CMD_ACK, sequence_number, NULL, 0);
 }
-
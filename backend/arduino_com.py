@@ -1,17 +1,262 @@
 import serial
-import numpy as np 
+import numpy as np
 import time
 import sys
+import threading
+from collections import deque
+from concurrent.futures import Future
+import queue
 
-class ArduinoCom(): 
-    def __init__(self, port: str, baud_rate: int = 9600, timeout: int = 2) -> None:
+# Binary framing of the serial link (see the communication protocol in the README) :
+# SYNC | LENGTH | COMMAND ID | SEQUENCE NUMBER | PAYLOAD (LENGTH - 2 bytes) | CRC-8 of LENGTH to PAYLOAD
+FRAME_SYNC = 0xA5
+FRAME_HEADER_LENGTH = 2  # Command ID and sequence number, counted in LENGTH
+
+# Command IDs
+LEDS_RANGE_COMMAND_ID = 1
+LEDS_MULTI_COMMAND_ID = 4
+BOARD_DATA_COMMAND_ID = 5
+ASK_BOARD_STATE_COMMAND_ID = 6
+LEDS_FRAME_COMMAND_ID = 7
+PING_COMMAND_ID = 9
+ACK_COMMAND_ID = 15
+
+# Priorities of the commands in the command queue, the lowest is sent first
+PRIORITY_BOARD_STATE = 0  # Board state requests and pings
+PRIORITY_ALERT = 1        # Wrong moves, check, end of game
+PRIORITY_LEDS = 2         # Plain LED updates
+PRIORITY_HIGHLIGHT = 3    # Decorative highlights (moves of the piece in hand, AI move)
+
+ALL_LEDS_MASK = (1 << 64) - 1
+
+
+def build_crc8_table(polynomial: int = 0x07) -> list[int]:
+    """
+    Builds the lookup table of the CRC-8 (polynomial x^8 + x^2 + x + 1, no reflection, initial value 0).
+    """
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+CRC8_TABLE = build_crc8_table()
+
+
+def crc8(data: bytes) -> int:
+    """
+    Computes the CRC-8 of some bytes (same as CRC8 in the Arduino sketch).
+    """
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_frame(command_id: int, sequence_number: int, payload: bytes = b"") -> bytes:
+    """
+    Builds a frame of the serial protocol.
+    :param command_id: The ID of the command.
+    :param sequence_number: The sequence number of the command (only its lowest byte is sent).
+    :param payload: The bytes of the command.
+    @return: The frame, ready to be written on the serial port.
+    """
+    body = bytes([len(payload) + FRAME_HEADER_LENGTH, command_id, sequence_number & 0xFF]) + payload
+    return bytes([FRAME_SYNC]) + body + bytes([crc8(body)])
+
+
+def build_square_to_led_strip():
+    """
+    Builds the permutation from the square indexes to the LED strip indexes (the strip goes back and forth on the rows).
+    """
+    indexes = np.arange(64).reshape(8, 8)
+    indexes[1::2] = indexes[1::2, ::-1]
+    return indexes.reshape(64)
+
+# LED of each square, and square of each LED
+SQUARE_TO_LED_STRIP = build_square_to_led_strip()
+LED_STRIP_TO_SQUARE = np.argsort(SQUARE_TO_LED_STRIP)
+
+
+def decode_occupancy(payload: bytes) -> int:
+    """
+    Converts the 8 bytes occupancy bitmap of a board data frame (bit i of the bitmap is square i) into the board state.
+    :return: The occupancy bitmask of the board (bit i is set if square i has a piece).
+    """
+    return int.from_bytes(payload, "little")
+
+
+class SerialCommand():
+    """
+    A command sent to the Arduino, completed by its acknowledgment.
+    """
+    def __init__(self, command_id: int, payload: bytes, sequence_number: int, ack_timeout: float = 2, max_retries: int = 3,
+                 priority: int = PRIORITY_LEDS, leds_mask: int = 0) -> None:
+        self.command_id = command_id
+        self.priority = priority
+        # Bit i is set if the command sets LED i of the strip
+        self.leds_mask = leds_mask
+        # Sequence number given by the transport, sent back by the Arduino in the ACK of the command
+        self.sequence_number = sequence_number
+        self.frame = encode_frame(command_id, sequence_number, payload)
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.retries = 0
+        self.time_sent = None
+        # Result set to True once acknowledged, False if every retry timed out (or if the command was dropped from the queue)
+        self.future = Future()
+
+    def supersedes(self, older_command) -> bool:
+        """
+        Returns whether this command makes an older command useless (it sets every LED the older one sets, or asks for the board state again).
+        """
+        if older_command.leds_mask != 0 :
+            return older_command.leds_mask & ~self.leds_mask == 0
+        return older_command.command_id == ASK_BOARD_STATE_COMMAND_ID and self.command_id == ASK_BOARD_STATE_COMMAND_ID
+
+
+class CommandQueue():
+    """
+    Bounded and thread-safe priority queue of the commands waiting to be sent.
+    - Commands are sent by priority (see PRIORITY_BOARD_STATE to PRIORITY_HIGHLIGHT), oldest first within a priority.
+    - A new command removes the queued commands it supersedes (their future gets the result of the new one).
+      If it only shares some LEDs with a queued command of the same or a more urgent priority it is sent after it, so that the newest color stays.
+      A less urgent queued command sharing some LEDs with it is dropped instead (its future result is False, its other LEDs are sent again
+      by the next flush of LedCom), so that an alert never waits behind a decorative highlight.
+    - When the queue is full the least urgent command is dropped (its future result is False).
+    """
+    def __init__(self, max_size: int = 64) -> None:
+        self.max_size = max_size
+        self.commands_by_priority = {priority: deque() for priority in range(PRIORITY_BOARD_STATE, PRIORITY_HIGHLIGHT + 1)}
+        self.lock = threading.Lock()
+
+        self.superseded_count = 0
+        self.dropped_count = 0
+
+    def put(self, serial_command: SerialCommand) -> None:
+        """
+        Adds a command to the queue.
+        """
+        superseded_commands = []
+        overlapped_commands = []
+        dropped_command = None
+        with self.lock :
+            for priority, commands in self.commands_by_priority.items() :
+                for queued_command in list(commands) :
+                    if serial_command.supersedes(queued_command) :
+                        commands.remove(queued_command)
+                        superseded_commands.append(queued_command)
+                        self.superseded_count += 1
+                    elif queued_command.leds_mask & serial_command.leds_mask != 0 and priority > serial_command.priority :
+                        # Less urgent command setting some of the same LEDs: sent after the new one it would put its older colors back
+                        commands.remove(queued_command)
+                        overlapped_commands.append(queued_command)
+                        self.superseded_count += 1
+
+            if self.get_depth() >= self.max_size :
+                least_urgent_command = self.get_least_urgent_command()
+                if least_urgent_command == None or least_urgent_command.priority <= serial_command.priority :
+                    dropped_command = serial_command
+                else :
+                    self.commands_by_priority[least_urgent_command.priority].remove(least_urgent_command)
+                    dropped_command = least_urgent_command
+                self.dropped_count += 1
+
+            if dropped_command is not serial_command :
+                self.commands_by_priority[serial_command.priority].append(serial_command)
+
+        # Complete the futures outside of the lock (their callbacks may queue new commands)
+        for superseded_command in superseded_commands :
+            serial_command.future.add_done_callback(lambda future, superseded_command=superseded_command : superseded_command.future.set_result(future.result()))
+        for overlapped_command in overlapped_commands :
+            overlapped_command.future.set_result(False)
+        if dropped_command != None :
+            print(f"Command {dropped_command.sequence_number} dropped, the command queue is full.")
+            dropped_command.future.set_result(False)
+
+    def get_least_urgent_command(self) -> SerialCommand:
+        """
+        Returns the oldest command of the least urgent priority (called with the lock held).
+        """
+        for priority in sorted(self.commands_by_priority, reverse=True) :
+            if len(self.commands_by_priority[priority]) > 0 :
+                return self.commands_by_priority[priority][0]
+        return None
+
+    def pop(self, busy_leds_mask: int = 0) -> SerialCommand:
+        """
+        Removes the next command to send from the queue.
+        A command setting some busy LEDs is held back, and so is every later command sharing LEDs with a held one.
+        :param busy_leds_mask: The LEDs set by the commands in flight (bit i for LED i of the strip).
+        @return: The most urgent command that can be sent, None if there is none.
+        """
+        with self.lock :
+            for priority in sorted(self.commands_by_priority) :
+                for queued_command in self.commands_by_priority[priority] :
+                    if queued_command.leds_mask & busy_leds_mask == 0 :
+                        self.commands_by_priority[priority].remove(queued_command)
+                        return queued_command
+                    busy_leds_mask |= queued_command.leds_mask
+        return None
+
+    def get_depth(self) -> int:
+        """
+        Returns the number of commands in the queue.
+        """
+        return sum(len(commands) for commands in self.commands_by_priority.values())
+
+    def __len__(self) -> int:
+        return self.get_depth()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the depth of the queue and its counters.
+        """
+        with self.lock :
+            return {
+                "depth": self.get_depth(),
+                "max_size": self.max_size,
+                "superseded": self.superseded_count,
+                "dropped": self.dropped_count,
+            }
+
+
+class ArduinoCom():
+    # Permutations between the squares and the LED strip (used by LedCom to find the LEDs next to each other)
+    SQUARE_TO_LED_STRIP = SQUARE_TO_LED_STRIP
+    LED_STRIP_TO_SQUARE = LED_STRIP_TO_SQUARE
+
+    # Priorities of the LED commands (used by LedCom)
+    PRIORITY_ALERT = PRIORITY_ALERT
+    PRIORITY_LEDS = PRIORITY_LEDS
+    PRIORITY_HIGHLIGHT = PRIORITY_HIGHLIGHT
+
+    def __init__(self, port: str, baud_rate: int = 9600, timeout: int = 2, in_flight_window: int = 2, command_queue_size: int = 64) -> None:
         self.serial = serial.Serial(port, baud_rate, timeout=timeout)
         self.last_command_sent = ""
         self.led_strip_colors_state = np.zeros((64, 3), dtype=int)
 
-        # Queue for storing commands to be sent
-        self.command_queue = [] 
-        self.awaiting_ack = False
+        # Queue for storing commands to be sent (the writer thread takes them as soon as there is room in the in-flight window)
+        self.command_queue = CommandQueue(command_queue_size)
+
+        # Transport: the writer thread sends the commands, at most in_flight_window of them waiting for their ACK,
+        # the reader thread takes every frame from the serial port and matches the ACKs with the commands in flight
+        self.in_flight_window = in_flight_window
+        self.next_sequence_number = 0
+        self.in_flight_commands = deque()
+        self.transport_condition = threading.Condition()
+
+        # Board states received from the Arduino, oldest first (unless a listener takes them, see set_board_frames_listener)
+        self.board_frames = queue.Queue()
+        self.board_frames_listener = None
+
+        self.running = True
+        self.reader_thread = threading.Thread(target=self.reader_loop, name="arduino_reader", daemon=True)
+        self.writer_thread = threading.Thread(target=self.writer_loop, name="arduino_writer", daemon=True)
+        self.reader_thread.start()
+        self.writer_thread.start()
 
 
 
@@ -19,157 +264,297 @@ class ArduinoCom():
         """
         Wait for the communication to be on before going to the next step
         """
-        retries = 0
-        while retries < max_retries:
-            command = "1001;"
-            self.serial.write(command.encode())
-            self.serial.flush()
-
-            # Wait for acknowledgment (ACK, in this case "1111;")
-            if self.wait_for_ack(timeout=20):
-                print(f"Command {command} acknowledged.")
-                return True  # Command was successfully acknowledged
-            else:
-                print(f"Retrying command: {command}")
-                retries += 1
+        # Wait for acknowledgment of a ping command
+        if self.send_command(PING_COMMAND_ID, max_retries=max_retries, ack_timeout=20, priority=PRIORITY_BOARD_STATE).result() :
+            print("Ping command acknowledged.")
+            return True  # Command was successfully acknowledged
 
-        print(f"Command {command} failed after {max_retries} retries.")
+        print(f"Ping command failed after {max_retries} retries.")
         return False
 
-    
+
     def index_square_to_led_strip(self, index: int) -> int:
         """
         Convert the index of the square to the index of the LED strip
         """
-        row = index // 8
-        col = index % 8
+        return int(SQUARE_TO_LED_STRIP[index])
 
-        if row % 2 == 0:
-            return row * 8 + col
-        else:
-            return row * 8 + 7 - col
-    
-    def set_leds_with_colors(self, leds_indexes: list[int], color: tuple[int,int,int]) -> None: 
+    def set_leds_with_colors(self, leds_indexes: list[int], color: tuple[int,int,int], priority: int = PRIORITY_LEDS) -> Future:
         """
         Set LEDS not next to each other with a specific color
-        @return: The command to send to the Arduino as a string
+        @return: The future of the command, done once acknowledged
         """
-        command_id = 4 # Command ID for setting the color of multiple LEDs
         length = len(leds_indexes) # Number of LEDs to set
+        leds_strip_indexes = SQUARE_TO_LED_STRIP[np.asarray(leds_indexes, dtype=int)]
 
-        #Construct the command
-        command = f"{command_id:04b}{length:06b}{color[0]:08b}{color[1]:08b}{color[2]:08b}"
+        #Construct the command : number of LEDs, color, then one byte per LED
+        payload = bytes([length, color[0], color[1], color[2]])
+        payload += leds_strip_indexes.astype(np.uint8).tobytes()
 
-        for index in leds_indexes :
-            good_index = self.index_square_to_led_strip(index)
-            command += f"{good_index:06b}"
+        leds_mask = 0
+        for led_index in leds_strip_indexes :
+            leds_mask |= 1 << int(led_index)
 
-        command += ";"
+        return self.queue_command(LEDS_MULTI_COMMAND_ID, payload, priority, leds_mask)
 
-        self.command_queue.append(command)
-    
-    def send_leds_range_command(self, start_index: int, end_index: int, color: tuple[int,int,int]):
+    def send_leds_range_command(self, start_index: int, end_index: int, color: tuple[int,int,int], priority: int = PRIORITY_LEDS) -> Future:
         """
         Sends a command to the Arduino to set LEDs from start_index to end_index to a specified color.
         :param start_index: The starting index of LEDs to set (0 to 63).
         :param end_index: The ending index of LEDs to set (0 to 63).
         :param color: The color to set the LEDs to as a tuple (r, g, b) where r, g, b are integers between 0 and 255.
+        @return: The future of the command, done once acknowledged
         """
+        payload = bytes([start_index, end_index, color[0], color[1], color[2]])
+        leds_mask = ((1 << (end_index + 1)) - 1) & ~((1 << start_index) - 1)
 
-        command_id = 1
+        return self.queue_command(LEDS_RANGE_COMMAND_ID, payload, priority, leds_mask)
 
-        command = f"{command_id:04b}{start_index:06b}{end_index:06b}{color[0]:08b}{color[1]:08b}{color[2]:08b};"
-        
-        self.command_queue.append(command)
+    def send_leds_frame_command(self, colors, priority: int = PRIORITY_LEDS) -> Future:
+        """
+        Sends a command to the Arduino setting the color of every LED at once (raw RGB bytes).
+        :param colors: The (64, 3) colors of the squares, by square index.
+        @return: The future of the command, done once acknowledged
+        """
+        # Reorder the squares into the order of the strip in one step
+        payload = np.asarray(colors, dtype=np.uint8)[LED_STRIP_TO_SQUARE].tobytes()
 
-    
+        return self.queue_command(LEDS_FRAME_COMMAND_ID, payload, priority, ALL_LEDS_MASK)
 
-    def ask_for_board_state(self) -> None:
+
+
+    def ask_for_board_state(self) -> Future:
         """
         Ask the Arduino for the board state
-        @return: The command to send to the Arduino as a string
+        @return: The future of the command, done once acknowledged (the board state itself comes through read_board_data)
+        """
+        return self.queue_command(ASK_BOARD_STATE_COMMAND_ID, priority=PRIORITY_BOARD_STATE)
+
+    def queue_command(self, command_id: int, payload: bytes = b"", priority: int = PRIORITY_LEDS, leds_mask: int = 0,
+                      max_retries: int = 3, ack_timeout: float = 2) -> Future:
         """
-        command_id = 6
-        command = f"{command_id:04b}000000;"
+        Wraps a command into a frame with the next sequence number and adds it to the command queue,
+        the writer thread sends it as soon as it is its turn.
+        @return: The future of the command
+        """
+        with self.transport_condition :
+            serial_command = SerialCommand(command_id, payload, self.next_sequence_number, ack_timeout, max_retries, priority, leds_mask)
+            self.next_sequence_number += 1
+
+        self.command_queue.put(serial_command)
+
+        with self.transport_condition :
+            self.transport_condition.notify_all()
+        return serial_command.future
 
-        self.command_queue.append(command)
+    def get_queue_stats(self) -> dict:
+        """
+        Returns the depth and the counters of the command queue, and the number of commands waiting for their ACK.
+        """
+        queue_stats = self.command_queue.get_stats()
+        with self.transport_condition :
+            queue_stats["in_flight"] = len(self.in_flight_commands)
+        return queue_stats
 
 
-    def read_board_data(self):
+    def read_board_data(self, timeout: float = 0):
         """
-        Reads data from the serial port and processes it to get the board state.
-        :return: A numpy array representing the board state (0s and 1s) or None if no valid data is read.
+        Returns the oldest board state received by the reader thread.
+        :param timeout: The time to wait for a board state in seconds (0 to return right away, None to wait as long as needed).
+        :return: The occupancy bitmask of the board (bit i is set if square i has a piece) or None if no board state was received.
         """
         try:
-            if self.serial.in_waiting > 0:
-                # Read data until ';' which signifies the end of a command
-                data = self.serial.read_until(b';').decode('utf-8').strip(';')
-                
-                if data:  # Check if data is not empty
-                    # Extract the command ID (first 4 bits)
-                    command_id = int(data[:4], 2)
-                    
-                    if command_id == 5:  # Command ID 5 for board data
-                        board_data_bits = data[4:68]  # Next 64 bits are the board data
-                        
-                        if len(board_data_bits) == 64:  # Ensure we have all 64 bits
-                            board_matrix = [int(bit) for bit in board_data_bits]
-                            binary_board = np.array(board_matrix)
-                            return binary_board
-                        else:
-                            print("Received incomplete board data. Ignoring...")
-                            return None
-                    else:
-                        print(f"Received unknown command ID: {command_id}")
-                        return None
+            if timeout == 0 :
+                return self.board_frames.get_nowait()
+            return self.board_frames.get(timeout=timeout)
+        except queue.Empty:
             return None  # No data in waiting
-        except Exception as e:
-            print(f"Error: {e}")
+
+    def set_board_frames_listener(self, board_frames_listener) -> None:
+        """
+        Hands every board state received to a function (called from the reader thread) instead of storing them for read_board_data.
+        :param board_frames_listener: The function taking the board state, None to store them again.
+        """
+        self.board_frames_listener = board_frames_listener
+
+    def read_frame(self):
+        """
+        Reads one frame from the serial port, bytes before the sync byte are skipped.
+        :return: The command ID, the sequence number and the payload of the frame or None if no valid frame was read.
+        """
+        sync = self.serial.read(1)
+        if len(sync) == 0 or sync[0] != FRAME_SYNC:
+            return None  # Timed out or out of sync
+
+        length = self.serial.read(1)
+        if len(length) == 0 or length[0] < FRAME_HEADER_LENGTH:
             return None
-    
-    def send_command(self, command: str, max_retries: int = 3) -> None: 
+
+        data = self.serial.read(length[0] + 1)
+        if len(data) != length[0] + 1:
+            print("Received incomplete frame. Ignoring...")
+            return None
+
+        body, crc = length + data[:-1], data[-1]
+        if crc8(body) != crc:
+            print("Received frame with a wrong CRC. Ignoring...")
+            return None
+
+        return body[1], body[2], body[3:]
+
+    def send_command(self, command_id: int, payload: bytes = b"", max_retries: int = 3, ack_timeout: float = 2, priority: int = PRIORITY_LEDS) -> Future:
         """
-        Send a command to the Arduino with acknowledgment and retries.
+        Send a command to the Arduino, with acknowledgment and retries.
+        @return: The future of the command, True once acknowledged, False if it failed after max_retries.
         """
-        retries = 0
-        while retries < max_retries:
-            print(f"Sending command: {command}")
-            self.serial.write(command.encode())
-            self.serial.flush()
+        return self.queue_command(command_id, payload, priority, max_retries=max_retries, ack_timeout=ack_timeout)
+
+    def reader_loop(self) -> None:
+        """
+        Reads every frame from the serial port (reader thread).
+        ACKs complete the command in flight with the same sequence number, board states are stored for read_board_data.
+        """
+        while self.running :
+            try:
+                frame = self.read_frame()
+            except Exception as e:
+                if self.running :
+                    print(f"Error: {e}")
+                    time.sleep(0.1)
+                continue
+
+            if frame is None:  # Timed out without any valid frame
+                continue
 
-            # Wait for acknowledgment (ACK, in this case "1111;")
-            if self.wait_for_ack():
-                print(f"Command {command} acknowledged.")
-                return  # Command was successfully acknowledged
+            command_id, sequence_number, payload = frame
+
+            if command_id == ACK_COMMAND_ID :  # ACK received
+                self.handle_ack(sequence_number)
+            elif command_id == BOARD_DATA_COMMAND_ID:  # Command ID 5 for board data
+                if len(payload) == 8:  # Ensure we have all 64 bits
+                    board_frames_listener = self.board_frames_listener
+                    if board_frames_listener != None :
+                        board_frames_listener(decode_occupancy(payload))
+                    else :
+                        self.board_frames.put(decode_occupancy(payload))
+                else:
+                    print("Received incomplete board data. Ignoring...")
             else:
-                print(f"Retrying command: {command}")
-                retries += 1
+                print(f"Received unknown command ID: {command_id}")
 
-        print(f"Command {command} failed after {max_retries} retries.")
-    
-    def wait_for_ack(self, timeout: int = 2) -> bool:
+    def handle_ack(self, sequence_number: int) -> None:
         """
-        Wait for an acknowledgment (ACK) from the Arduino.
-        :param timeout: Time to wait for an ACK in seconds.
-        :return: True if ACK ("1111;") is received, False if timeout occurs.
+        Completes the command in flight acknowledged by the Arduino.
+        :param sequence_number: The sequence number sent back in the ACK (lowest byte only).
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if self.serial.in_waiting > 0:
-                data = self.serial.read_until(b';').decode('utf-8').strip(';')
-                if data == "1111":  # ACK received
-                    return True
-        return False  # Timeout occurred
+        with self.transport_condition :
+            serial_command = None
+            for command_in_flight in self.in_flight_commands :
+                if command_in_flight.sequence_number & 0xFF == sequence_number :
+                    serial_command = command_in_flight
+                    break
+            if serial_command == None :
+                # Late ACK of a command that was already sent again
+                return
+            self.in_flight_commands.remove(serial_command)
+            self.transport_condition.notify_all()
+
+        print(f"Command {serial_command.sequence_number} acknowledged.")
+        serial_command.future.set_result(True)
 
-    
-    def process_queue(self) : 
+    def writer_loop(self) -> None:
         """
-        Process the command queue and send commands one at a time.
+        Sends the pending commands while there is room in the in-flight window, and sends again the commands whose ACK timed out (writer thread).
+        Commands sharing LEDs are in flight one at a time, so they are applied in the order they were queued.
         """
-        while self.command_queue:
-            command = self.command_queue.pop(0)
-            self.send_command(command)
+        while self.running :
+            commands_to_write = []
+            with self.transport_condition :
+                commands_to_write += self.get_timed_out_commands()
 
-    def __del__(self):
+                serial_command = None
+                if len(self.in_flight_commands) < self.in_flight_window :
+                    # A command is never sent while an older one setting some of the same LEDs waits for its ACK,
+                    # the retry of the older one would put its colors back on top of the newer ones
+                    busy_leds_mask = 0
+                    for command_in_flight in self.in_flight_commands :
+                        busy_leds_mask |= command_in_flight.leds_mask
+                    serial_command = self.command_queue.pop(busy_leds_mask)
+
+                if serial_command != None :
+                    self.in_flight_commands.append(serial_command)
+                    commands_to_write.append(serial_command)
+                elif len(commands_to_write) == 0 :
+                    self.transport_condition.wait(timeout=0.05)
+                    continue
+
+            for serial_command in commands_to_write :
+                self.write_command(serial_command)
+
+    def get_timed_out_commands(self) -> list[SerialCommand]:
+        """
+        Checks the commands in flight for an ACK timeout (called with the transport condition held).
+        The ACKs carry the sequence number of their command so only the timed out commands are sent again.
+        @return: The commands to send again.
+        """
+        timed_out_commands = []
+        current_time = time.time()
+        for serial_command in list(self.in_flight_commands) :
+            if serial_command.time_sent == None or current_time - serial_command.time_sent < serial_command.ack_timeout :
+                continue
+
+            serial_command.retries += 1
+            if serial_command.retries >= serial_command.max_retries :
+                self.in_flight_commands.remove(serial_command)
+                print(f"Command {serial_command.sequence_number} failed after {serial_command.max_retries} retries.")
+                serial_command.future.set_result(False)
+            else :
+                # Not timed out again until it has been written
+                serial_command.time_sent = None
+                timed_out_commands.append(serial_command)
+        return timed_out_commands
+
+    def write_command(self, serial_command: SerialCommand) -> None:
+        """
+        Writes a command on the serial port.
+        """
+        if serial_command.retries > 0 :
+            print(f"Retrying command {serial_command.sequence_number}: {serial_command.frame.hex()}")
+        else :
+            print(f"Sending command {serial_command.sequence_number}: {serial_command.frame.hex()}")
+        try:
+            self.serial.write(serial_command.frame)
+            self.serial.flush()
+        except Exception as e:
+            print(f"Error: {e}")
+        serial_command.time_sent = time.time()
+        self.last_command_sent = serial_command.frame
+
+
+    def process_queue(self, timeout: float = None) -> bool:
+        """
+        Waits until every queued command has been sent and acknowledged (or has failed).
+        The writer thread sends the commands on its own, this is only needed to wait for them (e.g. in scripts).
+        :param timeout: The maximum time to wait in seconds (None to wait as long as needed).
+        @return: Whether the queue was emptied in time.
+        """
+        end_time = None if timeout is None else time.time() + timeout
+        with self.transport_condition :
+            while len(self.command_queue) > 0 or len(self.in_flight_commands) > 0 :
+                time_left = None if end_time is None else end_time - time.time()
+                if time_left is not None and time_left <= 0 :
+                    return False
+                self.transport_condition.wait(timeout=0.05 if time_left is None else min(time_left, 0.05))
+        return True
+
+    def close(self) -> None:
+        """
+        Stops the transport threads and closes the serial port.
+        """
+        self.running = False
+        with self.transport_condition :
+            self.transport_condition.notify_all()
         self.serial.close()
-    
\ No newline at end of file
+
+    def __del__(self):
+        self.close()
@@ -1,7 +1,9 @@
-__all__ = ['chess_engine', 'board', 'move', 'pieces']
+__all__ = ['chess_engine', 'board', 'move', 'pieces', 'move_cache', 'fen']
 
 from .chess_engine import *
 from .board import *
 from .move import *
 from .pieces import *
-from .led_com import *
\ No newline at end of file
+from .led_com import *
+from .move_cache import *
+from .fen import *
\ No newline at end of file
@@ -0,0 +1,293 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+
+from chess_engine_lib.board import Board
+from chess_engine_lib.move import Move
+from chess_engine_lib.engine_pool import EnginePool
+from chess_engine_lib.opening_book import PolyglotBook
+from chess_engine_lib.tablebase import SyzygyTablebase
+from chess_engine_lib.uci_engine import UciEngine, UciInfo
+
+
+class AISearch :
+    '''
+    A search of the AI advisor: the position searched, the clocks and what the engine found so far.
+    The position is given as the start of the game and the moves played since (see get_position_command).
+    '''
+    def __init__(self, color: str, uci_engine: UciEngine, initial_fen: str, moves: list[str], board: Board, legal_moves: list[Move],
+                 wtime: int, btime: int, is_pondering: bool = False) -> None:
+        self.color: str = color
+        self.uci_engine: UciEngine = uci_engine
+        self.initial_fen: str = initial_fen
+        self.moves: list[str] = moves
+        self.board: Board = board
+        self.fen: str = board.get_board_fen()
+        self.legal_moves: list[Move] = legal_moves
+        self.wtime: int = wtime
+        self.btime: int = btime
+        # Pondering: searching while the opponent thinks, on the move the engine expects from them (the last of moves)
+        self.is_pondering: bool = is_pondering
+        # Where the best move comes from: "engine", "book" or "tablebase"
+        self.source: str = "engine"
+
+        self.info: UciInfo = None
+        self.best_move: Move = None
+        self.is_done: bool = False
+        # Set when the position changed on the board, the result of the search is not wanted anymore
+        self.is_stopped: bool = False
+        self.future: Future = None
+
+    def serialize(self) -> dict:
+        return {
+            "color": self.color,
+            "fen": self.fen,
+            "best_move": self.best_move.get_uci() if self.best_move != None else None,
+            "info": self.info.serialize() if self.info != None else None,
+            "searching": not self.is_done and not self.is_stopped,
+            "pondering": self.is_pondering,
+            "source": self.source,
+        }
+
+
+class AIAdvisor :
+    '''
+    Runs the searches of the UCI engines in a worker thread so that the game loop is never blocked.
+    Each new best move found during a search is given to on_best_move (from the worker thread),
+    a search is stopped as soon as it is not wanted anymore (see stop_search).
+    While a human thinks, the engine of the AI that just played ponders on the reply it expects,
+    if the human plays it the search goes on (ponderhit) instead of starting from scratch.
+    The opening book and the endgame tablebase (if any) are looked up before starting a search.
+    '''
+    def __init__(self, engine_pool: EnginePool, on_best_move=None, opening_book: PolyglotBook = None, tablebase: SyzygyTablebase = None) -> None:
+        self.engine_pool: EnginePool = engine_pool
+        # Function taking the search and its new best move
+        self.on_best_move = on_best_move
+        self.opening_book: PolyglotBook = opening_book
+        self.tablebase: SyzygyTablebase = tablebase
+
+        # One search at a time: a new search waits until the engine sent the best move of the stopped one
+        self.search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai_advisor")
+        self.search_lock = threading.Lock()
+        self.current_search: AISearch = None
+        self.last_search: AISearch = None
+        # Last search (not pondering) of each player, its principal variation gives the move to ponder on
+        self.last_search_by_color: dict[str, AISearch] = {}
+
+        self.ponder_hits: int = 0
+        self.ponder_misses: int = 0
+
+    def start_search(self, color: str, initial_fen: str, moves: list[str], board: Board, legal_moves: list[Move], wtime: int, btime: int) -> AISearch:
+        '''
+        Starts the search of the best move of a position, the previous search is stopped
+        (unless it was pondering on this very position: it goes on).
+        @param color: The color of the player to move.
+        @param initial_fen: The FEN of the position the game started from.
+        @param moves: The moves played since in UCI notation.
+        @param board: A copy of the board of the position.
+        @param legal_moves: The legal moves of the position.
+        @param wtime: The time left on the clock of white in milliseconds.
+        @param btime: The time left on the clock of black in milliseconds.
+        @return: The search started (or continued).
+        '''
+        with self.search_lock :
+            ai_search = self.current_search
+            is_ponder_hit = ai_search != None and ai_search.is_pondering and not ai_search.is_done \
+                            and ai_search.color == color and ai_search.initial_fen == initial_fen and ai_search.moves == moves
+            if is_ponder_hit :
+                ai_search.is_pondering = False
+                self.last_search = ai_search
+                self.last_search_by_color[color] = ai_search
+                self.ponder_hits += 1
+            elif ai_search != None and ai_search.is_pondering :
+                self.ponder_misses += 1
+
+        if is_ponder_hit :
+            print("The AI expected this move, its search goes on.")
+            ai_search.uci_engine.ponderhit()
+            # Show right away what was found while pondering
+            if ai_search.best_move != None and self.on_best_move != None :
+                self.on_best_move(ai_search, ai_search.best_move)
+            return ai_search
+
+        self.stop_search()
+
+        # A move from the book or the tablebase needs no search
+        known_move, source = self.probe_known_move(board, legal_moves)
+        if known_move != None :
+            ai_search = AISearch(color, None, initial_fen, moves, board, legal_moves, wtime, btime)
+            ai_search.source = source
+            ai_search.best_move = known_move
+            ai_search.is_done = True
+            with self.search_lock :
+                self.current_search = ai_search
+                self.last_search = ai_search
+                self.last_search_by_color[color] = ai_search
+            print(f"AI plays {known_move} from the {source}")
+            if self.on_best_move != None :
+                self.on_best_move(ai_search, known_move)
+            return ai_search
+
+        ai_search = AISearch(color, self.engine_pool.get_engine(color), initial_fen, moves, board, legal_moves, wtime, btime)
+        with self.search_lock :
+            self.current_search = ai_search
+            self.last_search = ai_search
+            self.last_search_by_color[color] = ai_search
+        # From now on a stop or a ponderhit is kept by the engine until the search begins
+        ai_search.uci_engine.prepare_search()
+        ai_search.future = self.search_executor.submit(self.run_search, ai_search)
+        return ai_search
+
+    def start_ponder(self, color: str, initial_fen: str, moves: list[str], board: Board, wtime: int, btime: int) -> AISearch:
+        '''
+        Starts pondering for a player that just played, on the reply it expects from its opponent.
+        Nothing is done if the move played is not the one the player found (or if it has no expected reply).
+        @param color: The color of the player that just played.
+        @param initial_fen: The FEN of the position the game started from.
+        @param moves: The moves played since in UCI notation (the last one being the move of the player).
+        @param board: A copy of the board of the position (it is modified).
+        @param wtime: The time left on the clock of white in milliseconds.
+        @param btime: The time left on the clock of black in milliseconds.
+        @return: The ponder search, None if there is nothing to ponder on.
+        '''
+        if not self.engine_pool.ponder :
+            return None
+
+        with self.search_lock :
+            last_search = self.last_search_by_color.get(color)
+        if last_search == None or last_search.info == None or len(last_search.info.pv) < 2 \
+           or last_search.initial_fen != initial_fen or last_search.moves + [last_search.info.pv[0]] != moves :
+            return None
+
+        expected_reply = Move.from_uci(board, last_search.info.pv[1])
+        if expected_reply == None :
+            return None
+        board.execute_move(expected_reply)
+
+        self.stop_search()
+
+        ai_search = AISearch(color, last_search.uci_engine, initial_fen, moves + [expected_reply.get_uci()], board, board.generate_legal_moves(),
+                             wtime, btime, is_pondering=True)
+        with self.search_lock :
+            self.current_search = ai_search
+        ai_search.uci_engine.prepare_search(ponder=True)
+        ai_search.future = self.search_executor.submit(self.run_search, ai_search)
+        return ai_search
+
+    def probe_known_move(self, board: Board, legal_moves: list[Move]) -> tuple[Move, str]:
+        '''
+        Looks the position up in the endgame tablebase then in the opening book.
+        @return: The move and where it comes from ("tablebase" or "book"), (None, None) if the position is in neither.
+        '''
+        if self.tablebase != None :
+            tablebase_move = self.tablebase.get_move(board, legal_moves)
+            if tablebase_move != None :
+                return tablebase_move, "tablebase"
+        if self.opening_book != None :
+            book_move = self.opening_book.get_move(board, legal_moves)
+            if book_move != None :
+                return book_move, "book"
+        return None, None
+
+    def stop_search(self, keep_ponder: bool = False) -> None:
+        '''
+        Stops the current search (if any), its best moves are not reported anymore.
+        @param keep_ponder: Whether to let a ponder search go on (the board changing does not make it useless).
+        '''
+        with self.search_lock :
+            ai_search = self.current_search
+            if ai_search == None or (keep_ponder and ai_search.is_pondering) :
+                return
+            self.current_search = None
+
+        ai_search.is_stopped = True
+        if ai_search.future != None and not ai_search.future.cancel() and not ai_search.is_done :
+            # Already searching: end it right away
+            ai_search.uci_engine.stop()
+
+    def new_game(self) -> None:
+        '''
+        Stops the current search and tells the engines a new game begins (once the stopped search is over).
+        '''
+        self.stop_search()
+        with self.search_lock :
+            self.last_search_by_color.clear()
+        self.search_executor.submit(self.engine_pool.new_game)
+
+    def is_current_search(self, ai_search: AISearch) -> bool:
+        '''
+        Returns whether a search is still wanted.
+        '''
+        with self.search_lock :
+            return ai_search is self.current_search
+
+    def run_search(self, ai_search: AISearch) -> Move:
+        '''
+        Runs a search (worker thread).
+        @return: The best move found, None if the engine found none or if the search was stopped before it started.
+        '''
+        if ai_search.is_stopped :
+            return None
+
+        try :
+            uci_best_move = ai_search.uci_engine.search(ai_search.initial_fen, ai_search.moves, ai_search.wtime, ai_search.btime,
+                                                        lambda uci_info : self.handle_info(ai_search, uci_info), ponder=ai_search.is_pondering)
+        except Exception as e :
+            print(f"AI search failed: {e}")
+            ai_search.is_done = True
+            return None
+
+        self.report_best_move(ai_search, Move.from_uci(ai_search.board, uci_best_move, ai_search.legal_moves))
+        ai_search.is_done = True
+        return ai_search.best_move
+
+    def handle_info(self, ai_search: AISearch, uci_info: UciInfo) -> None:
+        '''
+        Reports the first move of a new principal variation (worker thread).
+        '''
+        if ai_search.is_stopped :
+            return
+
+        ai_search.info = uci_info
+        self.report_best_move(ai_search, Move.from_uci(ai_search.board, uci_info.pv[0], ai_search.legal_moves))
+
+    def report_best_move(self, ai_search: AISearch, best_move: Move) -> None:
+        '''
+        Gives the best move to on_best_move if it changed (kept silent while pondering, the opponent has not played yet).
+        '''
+        if best_move == None or best_move is ai_search.best_move :
+            return
+        ai_search.best_move = best_move
+        if ai_search.is_pondering :
+            return
+        print(f"AI thinks the best move is {best_move} (depth {ai_search.info.depth if ai_search.info != None else '?'})")
+
+        if self.on_best_move != None and not ai_search.is_stopped :
+            self.on_best_move(ai_search, best_move)
+
+    def get_infos(self) -> dict:
+        '''
+        Returns the last search of the advisor and the pondering counters.
+        '''
+        with self.search_lock :
+            ai_search = self.last_search
+            current_search = self.current_search
+        return {
+            "last_search": ai_search.serialize() if ai_search != None else None,
+            "pondering": current_search != None and current_search.is_pondering,
+            "ponder_hits": self.ponder_hits,
+            "ponder_misses": self.ponder_misses,
+            "opening_book": self.opening_book.get_stats() if self.opening_book != None else None,
+            "tablebase": self.tablebase.get_stats() if self.tablebase != None else None,
+        }
+
+    def close(self) -> None:
+        '''
+        Stops the current search, the worker thread and the engines.
+        '''
+        self.stop_search()
+        self.search_executor.shutdown(wait=True)
+        self.engine_pool.close()
+        if self.opening_book != None :
+            self.opening_book.close()
+        if self.tablebase != None :
+            self.tablebase.close()
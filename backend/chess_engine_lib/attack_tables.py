@@ -0,0 +1,185 @@
+'''
+Attack tables built once at import time.
+
+Squares use the same indexes as Board.board_list (0 is h1, 7 is a1, 63 is a8) and every table
+entry is a bitboard where bit i is set when square i is attacked.
+
+- Knight and king attacks are plain lists indexed by square.
+- Pawn attacks are indexed by color then by square.
+- Sliding attacks use per-square lookup tables keyed by the relevant occupancy (the occupied
+  squares on the piece rays, board edges excluded). This is the PEXT approach to sliding
+  attacks: Python has no bit extract instruction so a dict does the hashing of the masked
+  occupancy instead of a magic multiplication.
+'''
+
+KNIGHT_OFFSETS: list[tuple[int, int]] = [(1, 2), (2, 1), (-1, 2), (-2, 1), (1, -2), (2, -1), (-1, -2), (-2, -1)]
+KING_OFFSETS: list[tuple[int, int]] = [(1, 1), (1, -1), (-1, -1), (-1, 1), (1, 0), (0, 1), (-1, 0), (0, -1)]
+BISHOP_DIRECTIONS: list[tuple[int, int]] = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+ROOK_DIRECTIONS: list[tuple[int, int]] = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+def is_on_board(x: int, y: int) -> bool:
+    '''
+    Returns whether the coordinates are on the board.
+    @param x: The column (0 to 7).
+    @param y: The row (0 to 7).
+    '''
+    return 0 <= x < 8 and 0 <= y < 8
+
+
+def iterate_bits(bitboard: int) -> list[int]:
+    '''
+    Returns the indexes of the bits set in a bitboard, lowest first.
+    @param bitboard: The bitboard.
+    @return: The list of square indexes.
+    '''
+    indexes: list[int] = []
+    while bitboard :
+        lowest_bit = bitboard & -bitboard
+        indexes.append(lowest_bit.bit_length() - 1)
+        bitboard ^= lowest_bit
+    return indexes
+
+
+def build_step_attacks(offsets: list[tuple[int, int]]) -> list[int]:
+    '''
+    Builds the attack table of a piece that moves by fixed offsets (knight, king).
+    @param offsets: The list of (x, y) offsets the piece can jump by.
+    @return: The attack bitboard of every square.
+    '''
+    attacks: list[int] = []
+    for square in range(64) :
+        attack = 0
+        for offset_x, offset_y in offsets :
+            x, y = square % 8 + offset_x, square // 8 + offset_y
+            if is_on_board(x, y) :
+                attack |= 1 << (y * 8 + x)
+        attacks.append(attack)
+    return attacks
+
+
+def ray_attacks(square: int, occupied: int, directions: list[tuple[int, int]]) -> int:
+    '''
+    Walks the rays from a square until the edge of the board or the first occupied square (included).
+    Only used to fill the tables, the move generation itself uses the lookups.
+    @param square: The square the rays start from.
+    @param occupied: The occupancy bitboard.
+    @param directions: The (x, y) directions of the rays.
+    @return: The attack bitboard.
+    '''
+    attack = 0
+    for direction_x, direction_y in directions :
+        x, y = square % 8 + direction_x, square // 8 + direction_y
+        while is_on_board(x, y) :
+            attack |= 1 << (y * 8 + x)
+            if occupied & (1 << (y * 8 + x)) :
+                break
+            x += direction_x
+            y += direction_y
+    return attack
+
+
+def relevant_occupancy_mask(square: int, directions: list[tuple[int, int]]) -> int:
+    '''
+    Returns the squares whose occupancy changes the attacks of a slider (last square of each ray excluded).
+    @param square: The square of the slider.
+    @param directions: The (x, y) directions of the rays.
+    @return: The mask bitboard.
+    '''
+    mask = 0
+    for direction_x, direction_y in directions :
+        x, y = square % 8 + direction_x, square // 8 + direction_y
+        while is_on_board(x + direction_x, y + direction_y) :
+            mask |= 1 << (y * 8 + x)
+            x += direction_x
+            y += direction_y
+    return mask
+
+
+def build_slider_tables(directions: list[tuple[int, int]]) -> tuple[list[int], list[dict[int, int]]]:
+    '''
+    Builds the occupancy masks and the attack lookup tables of a slider.
+    @param directions: The (x, y) directions of the rays.
+    @return: The masks and, for each square, a dict mapping the masked occupancy to the attacks.
+    '''
+    masks: list[int] = []
+    tables: list[dict[int, int]] = []
+    for square in range(64) :
+        mask = relevant_occupancy_mask(square, directions)
+        table: dict[int, int] = {}
+        # Enumerate every subset of the mask (Carry-Rippler trick)
+        subset = 0
+        while True :
+            table[subset] = ray_attacks(square, subset, directions)
+            subset = (subset - mask) & mask
+            if subset == 0 :
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+KNIGHT_ATTACKS: list[int] = build_step_attacks(KNIGHT_OFFSETS)
+KING_ATTACKS: list[int] = build_step_attacks(KING_OFFSETS)
+PAWN_ATTACKS: dict[str, list[int]] = {
+    "w": build_step_attacks([(1, 1), (-1, 1)]),
+    "b": build_step_attacks([(1, -1), (-1, -1)]),
+}
+
+BISHOP_MASKS, BISHOP_TABLES = build_slider_tables(BISHOP_DIRECTIONS)
+ROOK_MASKS, ROOK_TABLES = build_slider_tables(ROOK_DIRECTIONS)
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    '''
+    Returns the squares attacked by a bishop.
+    @param square: The square of the bishop.
+    @param occupied: The occupancy bitboard of both colors.
+    @return: The attack bitboard.
+    '''
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    '''
+    Returns the squares attacked by a rook.
+    @param square: The square of the rook.
+    @param occupied: The occupancy bitboard of both colors.
+    @return: The attack bitboard.
+    '''
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    '''
+    Returns the squares attacked by a queen.
+    @param square: The square of the queen.
+    @param occupied: The occupancy bitboard of both colors.
+    @return: The attack bitboard.
+    '''
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] | ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def build_line_tables() -> tuple[list[list[int]], list[list[int]]]:
+    '''
+    Builds, for every pair of aligned squares, the squares strictly between them and the full line through them.
+    @return: The between table and the line table (0 when the squares are not on a common rank, file or diagonal).
+    '''
+    between: list[list[int]] = [[0] * 64 for _ in range(64)]
+    line: list[list[int]] = [[0] * 64 for _ in range(64)]
+    for square in range(64) :
+        for direction_x, direction_y in BISHOP_DIRECTIONS + ROOK_DIRECTIONS :
+            full_line = ray_attacks(square, 0, [(direction_x, direction_y), (-direction_x, -direction_y)]) | (1 << square)
+            squares_walked = 0
+            x, y = square % 8 + direction_x, square // 8 + direction_y
+            while is_on_board(x, y) :
+                target = y * 8 + x
+                between[square][target] = squares_walked
+                line[square][target] = full_line
+                squares_walked |= 1 << target
+                x += direction_x
+                y += direction_y
+    return between, line
+
+
+BETWEEN, LINE = build_line_tables()
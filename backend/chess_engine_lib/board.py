@@ -1,10 +1,54 @@
-from chess_engine_lib.pieces import Piece, Pawn, Knight, Bishop, Rook, Queen, King, generate_piece_from_name
+from chess_engine_lib.pieces import Piece, PIECES, generate_piece_from_name
 from chess_engine_lib.move import Move
+from chess_engine_lib.fen import FenError, parse_fen, piece_placement_to_fen
+from chess_engine_lib.attack_tables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BETWEEN, LINE, bishop_attacks, rook_attacks
+from chess_engine_lib.zobrist import PIECE_SQUARE_KEYS, CASTLING_KEYS, EN_PASSANT_FILE_KEYS, WHITE_TO_MOVE_KEY
 import numpy as np
 
+# Names of the pieces, one bitboard is kept for each of them
+PIECE_NAMES: str = "PNBRQKpnbrqk"
+
+# Castling right lost when a piece leaves or lands on one of the corner squares
+CASTLING_RIGHTS_BY_CORNER: dict[int, str] = {0: "K", 7: "Q", 56: "k", 63: "q"}
+
+# Squares of the first and last rows, where no pawn can stand
+FIRST_AND_LAST_ROWS: int = 0xFF000000000000FF
+
+# The game is drawn automatically after 75 moves without capture nor pawn move
+MAX_HALFMOVE_CLOCK: int = 150
+
+
+class UndoRecord :
+    '''
+    Everything needed by Board.unmake_move to restore the position a move was executed from.
+    '''
+    def __init__(self, move: Move, moved_piece: Piece, captured_piece: Piece, captured_index: int,
+                 castling_rights_w: str, castling_rights_b: str, en_passant_square: str,
+                 halfmove_clock: int, fullmove_number: int, zobrist_key: int) -> None:
+        self.move: Move = move
+        self.moved_piece: Piece = moved_piece
+        self.captured_piece: Piece = captured_piece
+        self.captured_index: int = captured_index
+        self.castling_rights_w: str = castling_rights_w
+        self.castling_rights_b: str = castling_rights_b
+        self.en_passant_square: str = en_passant_square
+        self.halfmove_clock: int = halfmove_clock
+        self.fullmove_number: int = fullmove_number
+        self.zobrist_key: int = zobrist_key
+
+
 class Board :
     def __init__(self) :
         self.board_list: list[Piece] = [None for _ in range(64)]
+        # Bitboard representation kept in sync with board_list (bit i <=> board_list[i])
+        self.bitboards: dict[str, int] = {name: 0 for name in PIECE_NAMES}
+        self.occupancy: dict[str, int] = {"w": 0, "b": 0}
+        # Index of each king, kept up to date by put_piece
+        self.king_positions: dict[str, int] = {"w": -1, "b": -1}
+        # Zobrist hash of the position, updated incrementally by put_piece, remove_piece and execute_move
+        self.zobrist_key: int = 0
+        # FEN of the position, built on demand and reset whenever the position changes
+        self.fen_cache: str = None
         self.player_to_move: str = "w"
         self.castling_rights_w: str = "KQ"
         self.castling_rights_b: str = "kq"
@@ -17,90 +61,94 @@ class Board :
     def get_board_fen(self) -> str:
         '''
         Returns the FEN of the board.
+        The FEN is only built again when the position has changed since the last call.
         @return: The FEN of the board.
         '''
-        fen: str = ""
-
-        # Parse the pieces positions in reversed order (bottom to top)
-        empty_squares: int = 0
-        for i in range(63, -1, -1):
-            if i % 8 == 7 and i != 63:
-                if empty_squares != 0:
-                    fen += str(empty_squares)
-                    empty_squares = 0
-                fen += "/"
-            
-            if self.board_list[i] is None:
-                empty_squares += 1
-            else:
-                if empty_squares != 0:
-                    fen += str(empty_squares)
-                    empty_squares = 0
-                fen += self.board_list[i].name  # Assuming .name returns piece notation (e.g., 'P', 'r', etc.)
-        
-        # Handle trailing empty squares if any
-        if empty_squares != 0:
-            fen += str(empty_squares)
-        
-        # Parse the player to move
-        fen += " " + self.player_to_move  # Expecting 'w' or 'b'
-        
-        # Parse the castling rights
-        fen += " "
-        if self.castling_rights_w == "" and self.castling_rights_b == "":
-            fen += "-"
-        else:
-            if self.castling_rights_w != "":
-                fen += self.castling_rights_w
-            if self.castling_rights_b != "":
-                fen += self.castling_rights_b
-        
-        # Parse the en passant square
-        fen += " "
-        if self.en_passant_square == "-":
-            fen += "-"
-        else:
-            fen += self.en_passant_square  # Expecting something like 'a3', 'h6', etc.
-        
-        # Parse the halfmove clock
-        fen += " " + str(self.halfmove_clock)
-        
-        # Parse the fullmove number
-        fen += " " + str(self.fullmove_number)
-        
-        return fen
+        if self.fen_cache == None :
+            castling_rights = self.castling_rights_w + self.castling_rights_b
+            self.fen_cache = (f"{piece_placement_to_fen(self.board_list)} {self.player_to_move} {castling_rights or '-'} "
+                              f"{self.en_passant_square} {self.halfmove_clock} {self.fullmove_number}")
+        return self.fen_cache
+
+    @property
+    def last_valid_board(self) -> str:
+        '''
+        FEN of the position after the last move executed, only serialized when asked for.
+        '''
+        return self.get_board_fen()
     
     def is_fen_valid(self, fen_position) -> bool:
+        '''
+        Returns whether a FEN describes a legal position (see validate_fen).
+        @param fen_position: The FEN.
+        '''
+        return self.validate_fen(fen_position) == None
 
-        fen_split: list[str] = fen_position.split(" ")
-
-        # Check that there is no more than one king for each colour
-        if fen_split[0].count('k') > 1 or fen_split[0].count('K') > 1 :
-            return False
-        
-        # Check that the sum of row empty squares and pieces adds up
-        nb_row = 0
-        for row in fen_split[0].split('/') :
-            count = 0
-            for char in row :
-                if char.isnumeric() : 
-                    count += int(char)
-                else: 
-                    count += 1
-                
-            if count != 8 :
-                return False
-            
-            nb_row += 1
-
-        # If there is not 8 rows then not valid
-        if nb_row != 8 :
-            return False
-
-        # If all the conditions above are met then the FEN is probably valid
-        # TO DO: Improve the conditions, invalid fen can still pass the tests right now...
-        return True
-
+    def validate_fen(self, fen_position) -> FenError:
+        '''
+        Checks that a FEN can be parsed and describes a position reachable in a game.
+        The board itself is not modified.
+        @param fen_position: The FEN.
+        @return: None if the FEN is valid, otherwise a FenError telling which field is wrong and why.
+        '''
+        try :
+            parsed_fen = parse_fen(fen_position)
+        except FenError as fen_error :
+            return fen_error
+
+        position = Board()
+        position.board_list = parsed_fen.board_list
+        position.player_to_move = parsed_fen.player_to_move
+        position.castling_rights_w = parsed_fen.castling_rights_w
+        position.castling_rights_b = parsed_fen.castling_rights_b
+        position.en_passant_square = parsed_fen.en_passant_square
+        position.update_bitboards()
+        bitboards = position.bitboards
+
+        # Kings, pawns and number of pieces
+        for color, king_name, pawn_name in (("w", "K", "P"), ("b", "k", "p")) :
+            king_count = bin(bitboards[king_name]).count("1")
+            if king_count != 1 :
+                return FenError("piece placement", f"expected one {king_name} king, got {king_count}", fen_position)
+            if bin(bitboards[pawn_name]).count("1") > 8 :
+                return FenError("piece placement", f"more than 8 '{pawn_name}' pawns", fen_position)
+            if bin(position.occupancy[color]).count("1") > 16 :
+                return FenError("piece placement", f"more than 16 pieces for {color}", fen_position)
+        if (bitboards["P"] | bitboards["p"]) & FIRST_AND_LAST_ROWS :
+            return FenError("piece placement", "pawn on the first or last row", fen_position)
+
+        # Castling rights need the king and the rook on their starting squares
+        for right in parsed_fen.castling_rights_w + parsed_fen.castling_rights_b :
+            king_name, first_row_index = ("K", 0) if right.isupper() else ("k", 56)
+            rook_index = next(index for index, corner_right in CASTLING_RIGHTS_BY_CORNER.items() if corner_right == right)
+            if position.board_list[first_row_index + 3] is not PIECES[king_name] or position.board_list[rook_index] is not PIECES["R" if right.isupper() else "r"] :
+                return FenError("castling rights", f"'{right}' without the king and rook on their starting squares", fen_position)
+
+        # The en passant square is behind a pawn that has just moved two squares
+        if parsed_fen.en_passant_square != "-" :
+            en_passant_index = self.square_to_index(parsed_fen.en_passant_square)
+            expected_row, pawn_offset, pushed_pawn = ("6", -8, "p") if parsed_fen.player_to_move == "w" else ("3", 8, "P")
+            if parsed_fen.en_passant_square[1] != expected_row :
+                return FenError("en passant square", f"must be on row {expected_row} when '{parsed_fen.player_to_move}' is to move", fen_position)
+            if position.board_list[en_passant_index] != None or position.board_list[en_passant_index - pawn_offset] != None :
+                return FenError("en passant square", "the squares the pawn went through must be empty", fen_position)
+            if position.board_list[en_passant_index + pawn_offset] is not PIECES[pushed_pawn] :
+                return FenError("en passant square", "no pawn in front of the en passant square", fen_position)
+            if parsed_fen.halfmove_clock != 0 :
+                return FenError("halfmove clock", "must be 0 right after a pawn move", fen_position)
+
+        # The player who has just moved cannot have left the king in check
+        player_not_to_move = "b" if parsed_fen.player_to_move == "w" else "w"
+        if position.check_verification(player_not_to_move) == 1 :
+            return FenError("player to move", f"the '{player_not_to_move}' king is in check but it is not its turn", fen_position)
+
+        # Clocks
+        if parsed_fen.halfmove_clock > MAX_HALFMOVE_CLOCK :
+            return FenError("halfmove clock", f"must be at most {MAX_HALFMOVE_CLOCK}", fen_position)
+        if parsed_fen.fullmove_number < 1 :
+            return FenError("fullmove number", "must be at least 1", fen_position)
+
+        return None
 
     def set_board_fen(self, fen: str) -> None:
         '''
@@ -109,62 +157,98 @@ class Board :
         - Example : rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1
         - pieces positions -- player to move -- castling rights -- en passant square -- halfmove clock -- fullmove number
         @param fen: The FEN.
+        @raise FenError: If the FEN cannot be parsed (the board is left unchanged).
         '''
-        self.board_list: list[Piece] = []
+        parsed_fen = parse_fen(fen)
 
-        fen_split: list[str] = fen.split(" ")
+        self.board_list = parsed_fen.board_list
+        self.player_to_move = parsed_fen.player_to_move
+        self.castling_rights_w = parsed_fen.castling_rights_w
+        self.castling_rights_b = parsed_fen.castling_rights_b
+        self.en_passant_square = parsed_fen.en_passant_square
+        self.halfmove_clock = parsed_fen.halfmove_clock
+        self.fullmove_number = parsed_fen.fullmove_number
 
-        pieces_positions: str = fen_split[0][::-1]
+        # Rebuild the bitboards and the hash from the freshly parsed position
+        self.update_bitboards()
 
-        # Parse the pieces positions
-        for row in pieces_positions.split("/") :
-            for char in row :
-                if char.isdigit() :
-                    for _ in range(int(char)) :
-                        self.board_list.append(None)
-                else :
-                    # Check capitalization to determine color
-                    color: str = "w"
-                    if char.isupper() == False :
-                        color = "b"
-                    
-                    if char.lower() == "p" :
-                        self.board_list.append(Pawn(color))
-                    elif char.lower() == "n" :
-                        self.board_list.append(Knight(color))
-                    elif char.lower() == "b" :
-                        self.board_list.append(Bishop(color))
-                    elif char.lower() == "r" :
-                        self.board_list.append(Rook(color))
-                    elif char.lower() == "q" :
-                        self.board_list.append(Queen(color))
-                    elif char.lower() == "k" :
-                        self.board_list.append(King(color))
-                    else : 
-                        print(fen)
-
-
-        # Parse the player to move
-        self.player_to_move = fen_split[1]
-
-        # Parse the castling rights
-        self.castling_rights_w = ""
-        self.castling_rights_b = ""
-        if fen_split[2] != "-" :
-            for char in fen_split[2] :
-                if char.isupper() :
-                    self.castling_rights_w += char
-                else :
-                    self.castling_rights_b += char
-        
-        # Parse the en passant square
-        self.en_passant_square = fen_split[3]
+    def update_bitboards(self) -> None:
+        '''
+        Rebuilds the piece bitboards, occupancy masks and Zobrist hash from board_list.
+        '''
+        self.bitboards = {name: 0 for name in PIECE_NAMES}
+        self.occupancy = {"w": 0, "b": 0}
+        self.king_positions = {"w": -1, "b": -1}
+        self.zobrist_key = 0
+        self.fen_cache = None
+        for i in range(0, 64) :
+            piece = self.board_list[i]
+            if piece != None :
+                self.bitboards[piece.name] |= 1 << i
+                self.occupancy[piece.color] |= 1 << i
+                self.zobrist_key ^= PIECE_SQUARE_KEYS[piece.name][i]
+                if piece.name in "Kk" :
+                    self.king_positions[piece.color] = i
+        self.zobrist_key ^= self.get_state_key()
+
+    def get_state_key(self) -> int:
+        '''
+        Returns the part of the Zobrist hash that does not depend on the piece placement:
+        castling rights, en passant file (only if a pawn can take en passant) and player to move.
+        @return: The state key.
+        '''
+        state_key = 0
+        for right in self.castling_rights_w + self.castling_rights_b :
+            state_key ^= CASTLING_KEYS[right]
+
+        if self.en_passant_square != "-" :
+            en_passant_index = self.square_to_index(self.en_passant_square)
+            if self.player_to_move == "w" :
+                can_take_en_passant = PAWN_ATTACKS["b"][en_passant_index] & self.bitboards["P"]
+            else :
+                can_take_en_passant = PAWN_ATTACKS["w"][en_passant_index] & self.bitboards["p"]
+            if can_take_en_passant :
+                state_key ^= EN_PASSANT_FILE_KEYS[ord(self.en_passant_square[0]) - ord("a")]
 
-        # Parse the halfmove clock
-        self.halfmove_clock = int(fen_split[4])
+        if self.player_to_move == "w" :
+            state_key ^= WHITE_TO_MOVE_KEY
+        return state_key
 
-        # Parse the fullmove number
-        self.fullmove_number = int(fen_split[5])
+    def get_occupied(self) -> int:
+        '''
+        Returns the bitboard of all the occupied squares.
+        @return: The occupancy bitboard of both colors.
+        '''
+        return self.occupancy["w"] | self.occupancy["b"]
+
+    def put_piece(self, index: int, piece: Piece) -> None:
+        '''
+        Puts a piece on an empty square, keeping board_list and the bitboards in sync.
+        @param index: The index of the square.
+        @param piece: The piece to put on the square.
+        '''
+        self.board_list[index] = piece
+        self.fen_cache = None
+        self.bitboards[piece.name] |= 1 << index
+        self.occupancy[piece.color] |= 1 << index
+        self.zobrist_key ^= PIECE_SQUARE_KEYS[piece.name][index]
+        if piece.name in "Kk" :
+            self.king_positions[piece.color] = index
+
+    def remove_piece(self, index: int) -> Piece:
+        '''
+        Removes the piece on a square, keeping board_list and the bitboards in sync.
+        @param index: The index of the square.
+        @return: The piece removed (None if the square was empty).
+        '''
+        piece = self.board_list[index]
+        if piece != None :
+            self.board_list[index] = None
+            self.fen_cache = None
+            self.bitboards[piece.name] &= ~(1 << index)
+            self.occupancy[piece.color] &= ~(1 << index)
+            self.zobrist_key ^= PIECE_SQUARE_KEYS[piece.name][index]
+        return piece
 
     def get_board_visual(self) -> str:
         '''
@@ -200,203 +284,411 @@ class Board :
 
         return pieces_names
     
-    def get_all_moves_in_position(self) -> None:
+    def get_all_moves_in_position(self) -> list[Move]:
         '''
-        Updates the list of moves possible in the current position.
+        Returns the legal moves in the current position.
+        The check, checkmate and stalemate flags of the moves are computed on first access (see Move.annotate),
+        from a snapshot of the position shared by all the moves.
+        @return: The list of legal moves.
         '''
-        moves_possible_in_position_list = []
-        # Loop through the board
-        for i in range(0,64) :
-            piece = self.board_list[i]
-            # If there is a piece on the square
-            if piece != None :
-                # If the piece is of the color of the player to move
-                if piece.color == self.player_to_move :
-
-                    # Get the possible moves of the piece
-                    possible_moves: list[Move] = piece.possible_moves(self, i)
-                    # Loop through the possible moves
-                    for move in possible_moves :
-
-                        # Create a copy of the board
-                        board_copy = self.get_copy()
-                        # Execute the move on the copy
-                        board_copy.execute_move(move)
-                        # Check if the king of the player to move is in check after the move
-                        own_king_check = board_copy.check_verification(self.player_to_move)
-                        ennemy_king_check = board_copy.check_verification("w" if self.player_to_move == "b" else "b")
-
-                        # Ensure that the king of the player to move is not in check after the move
-                        if own_king_check == 0 :
-                            moves_possible_in_position_list.append(move)
-
-                        # If the moves is a check notify it in the move object
-                        if ennemy_king_check == 1 :
-                            move.is_check = True
-                            # Check if the move is a checkmate
-                            if board_copy.check_if_any_move_is_available() == False:
-                                move.is_checkmate = True
-                        else :
-                            # If no move available then it is stalemate
-                            if board_copy.check_if_any_move_is_available() == False:
-                                move.is_stalemate = True
-                        
-                        pieces_on_board = board_copy.get_pieces_on_board(['k',"K"]) 
-                        # If they are only two kings then stalemate as well 
-                        if len(pieces_on_board) == 0 :
-                            move.is_stalemate = True
-
-                        # If there is only one knight on a side (or both) then stalemate
-                        elif len([piece for x in pieces_on_board if x in ["r","R","B","b","Q","q","p","P"]]) == 0 :
-                            n_b = pieces_on_board.count("n")
-                            n_w = pieces_on_board.count("N")
-                            if (n_w == 0 and n_b == 1) or (n_b == 0 and n_w == 1) or (n_w == 0 and n_b == 0) :
-                                move.is_stalemate = True
-                                                
+        moves_possible_in_position_list = self.generate_legal_moves()
+        self.prepare_legal_moves(moves_possible_in_position_list)
         return moves_possible_in_position_list
-    
+
+    def prepare_legal_moves(self, moves: list[Move]) -> None:
+        '''
+        Gets the legal moves of the current position ready to be used by the engine:
+        lazy check / mate flags and notation disambiguation.
+        @param moves: The legal moves.
+        '''
+        self.set_annotation_origin(moves)
+        self.set_disambiguations(moves)
+
+    def set_disambiguations(self, moves: list[Move]) -> None:
+        '''
+        Sets the origin file and/or rank needed in the notation of the moves when several pieces of the same type can go to the same square.
+        @param moves: The legal moves of the current position.
+        '''
+        moves_by_destination: dict[tuple[str, int], list[Move]] = {}
+        for move in moves :
+            if move.piece_name not in "PpKk" :
+                moves_by_destination.setdefault((move.piece_name, move.end_pos_index), []).append(move)
+
+        for same_destination_moves in moves_by_destination.values() :
+            if len(same_destination_moves) < 2 :
+                continue
+            for move in same_destination_moves :
+                start_square = self.index_to_square(move.start_pos_index)
+                others = [self.index_to_square(other.start_pos_index) for other in same_destination_moves if other is not move]
+                if all(other[0] != start_square[0] for other in others) :
+                    move.disambiguation = start_square[0]
+                elif all(other[1] != start_square[1] for other in others) :
+                    move.disambiguation = start_square[1]
+                else :
+                    move.disambiguation = start_square
+
+    def set_annotation_origin(self, moves: list[Move]) -> None:
+        '''
+        Makes the flags of legal moves of the current position computed on first access, from one shared snapshot of the position.
+        @param moves: The legal moves.
+        '''
+        annotation_origin = self.get_copy()
+        for move in moves :
+            move.set_annotation_origin(annotation_origin)
+
+    def generate_legal_moves(self) -> list[Move]:
+        '''
+        Generates the legal moves of the player to move.
+        Checkers and pins are computed once for the position so that the pseudo-legal moves of the pieces
+        can be filtered with masks, without executing them (only en passant captures are tried on the board).
+        @return: The list of legal moves.
+        '''
+        player_color = self.player_to_move
+        ennemy_color = "w" if player_color == "b" else "b"
+        king_index = self.king_positions[player_color]
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+
+        checkers = self.get_attackers(king_index, ennemy_color, occupied)
+        pins = self.get_pins(player_color)
+
+        # In check, the other pieces must capture the checker or block the line between it and the king
+        check_mask = -1
+        if checkers :
+            checker_index = checkers.bit_length() - 1
+            check_mask = checkers | BETWEEN[king_index][checker_index]
+        is_double_check = checkers & (checkers - 1) != 0
+
+        legal_moves: list[Move] = []
+        player_occupancy = self.occupancy[player_color]
+        while player_occupancy :
+            piece_bit = player_occupancy & -player_occupancy
+            player_occupancy ^= piece_bit
+            i = piece_bit.bit_length() - 1
+            piece = self.board_list[i]
+
+            if i == king_index :
+                # The king cannot go to an attacked square (it does not block the rays it moves along)
+                occupied_without_king = occupied ^ piece_bit
+                for move in piece.possible_moves(self, i) :
+                    if not self.is_square_attacked(move.end_pos_index, ennemy_color, occupied_without_king) :
+                        legal_moves.append(move)
+                continue
+
+            # Only the king can answer a double check
+            if is_double_check :
+                continue
+
+            allowed_mask = check_mask & pins.get(i, -1)
+            for move in piece.possible_moves(self, i) :
+                if move.is_en_passant :
+                    # En passant removes two pieces from the same row, try it on the board
+                    undo_record = self.execute_move(move)
+                    own_king_check = self.check_verification(player_color)
+                    self.unmake_move(undo_record)
+                    if own_king_check == 0 :
+                        legal_moves.append(move)
+                elif allowed_mask & (1 << move.end_pos_index) :
+                    legal_moves.append(move)
+
+        return legal_moves
+
+    def get_attackers(self, square: int, by_color: str, occupied: int = None) -> int:
+        '''
+        Returns the pieces of a color attacking a square.
+        @param square: The index of the square.
+        @param by_color: The color of the attacking pieces.
+        @param occupied: The occupancy bitboard to use for the slider rays (defaults to the current one).
+        @return: The bitboard of the attacking pieces.
+        '''
+        bitboards = self.bitboards
+        if occupied == None :
+            occupied = self.occupancy["w"] | self.occupancy["b"]
+
+        if by_color == "w" :
+            pawns, knights, bishops, rooks, queens, king = bitboards["P"], bitboards["N"], bitboards["B"], bitboards["R"], bitboards["Q"], bitboards["K"]
+            defender_color = "b"
+        else :
+            pawns, knights, bishops, rooks, queens, king = bitboards["p"], bitboards["n"], bitboards["b"], bitboards["r"], bitboards["q"], bitboards["k"]
+            defender_color = "w"
+
+        return ((PAWN_ATTACKS[defender_color][square] & pawns)
+                | (KNIGHT_ATTACKS[square] & knights)
+                | (KING_ATTACKS[square] & king)
+                | (bishop_attacks(square, occupied) & (bishops | queens))
+                | (rook_attacks(square, occupied) & (rooks | queens)))
+
+    def get_pins(self, color: str) -> dict[int, int]:
+        '''
+        Returns the pieces of a color pinned against their king.
+        @param color: The color of the pinned pieces.
+        @return: A dict mapping the index of each pinned piece to the squares it can still move to (the pin line).
+        '''
+        pins: dict[int, int] = {}
+        king_index = self.king_positions[color]
+        if king_index == -1 :
+            return pins
+
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        if color == "w" :
+            diagonal_snipers = (self.bitboards["b"] | self.bitboards["q"]) & bishop_attacks(king_index, 0)
+            straight_snipers = (self.bitboards["r"] | self.bitboards["q"]) & rook_attacks(king_index, 0)
+        else :
+            diagonal_snipers = (self.bitboards["B"] | self.bitboards["Q"]) & bishop_attacks(king_index, 0)
+            straight_snipers = (self.bitboards["R"] | self.bitboards["Q"]) & rook_attacks(king_index, 0)
+
+        snipers = diagonal_snipers | straight_snipers
+        while snipers :
+            sniper_bit = snipers & -snipers
+            snipers ^= sniper_bit
+            sniper_index = sniper_bit.bit_length() - 1
+            blockers = BETWEEN[king_index][sniper_index] & occupied
+            # Pinned if exactly one piece stands between the king and the sniper and it is ours
+            if blockers and blockers & (blockers - 1) == 0 and blockers & self.occupancy[color] :
+                pins[blockers.bit_length() - 1] = LINE[king_index][sniper_index]
+        return pins
+
+    def annotate_move(self, move: Move) -> None:
+        '''
+        Sets the check, checkmate and stalemate flags of a legal move of the player to move.
+        @param move: The move to annotate.
+        '''
+        ennemy_color = "w" if self.player_to_move == "b" else "b"
+        undo_record = self.execute_move(move)
+        self.annotate_executed_move(move, ennemy_color)
+        self.unmake_move(undo_record)
+        # The snapshot is not needed anymore once the flags are known
+        move.annotation_origin = None
+
+    def annotate_moves(self, moves: list[Move]) -> None:
+        '''
+        Sets the flags of a chosen subset of the legal moves of the player to move, skipping the moves already annotated.
+        @param moves: The moves to annotate.
+        '''
+        for move in moves :
+            if not move.is_annotated() :
+                self.annotate_move(move)
+
+    def annotate_executed_move(self, move: Move, ennemy_color: str, ennemy_legal_moves: list[Move] = None) -> None:
+        '''
+        Sets the check, checkmate and stalemate flags of a move that has just been executed on the board.
+        @param move: The move executed.
+        @param ennemy_color: The color of the player receiving the move.
+        @param ennemy_legal_moves: The legal moves of the position reached, if they were already generated.
+        '''
+        is_check = self.check_verification(ennemy_color) == 1
+        if ennemy_legal_moves != None :
+            is_any_move_available = len(ennemy_legal_moves) > 0
+        else :
+            is_any_move_available = self.check_if_any_move_is_available()
+
+        # If the moves is a check notify it in the move object, without any move available it is a checkmate
+        move.is_check = is_check
+        move.is_checkmate = is_check and not is_any_move_available
+        # If no move available without check then it is stalemate
+        move.is_stalemate = not is_check and not is_any_move_available
+        
+        pieces_on_board = self.get_pieces_on_board(['k',"K"]) 
+        # If they are only two kings then stalemate as well 
+        if len(pieces_on_board) == 0 :
+            move.is_stalemate = True
+
+        # If there is only one knight on a side (or both) then stalemate
+        elif len([x for x in pieces_on_board if x in ["r","R","B","b","Q","q","p","P"]]) == 0 :
+            n_b = pieces_on_board.count("n")
+            n_w = pieces_on_board.count("N")
+            if (n_w == 0 and n_b == 1) or (n_b == 0 and n_w == 1) or (n_w == 0 and n_b == 0) :
+                move.is_stalemate = True
 
     def check_if_any_move_is_available(self) -> bool:
         '''
         Returns whether the player to move has any move available.
         @return: Whether the player to move has any move available.
         '''
-        # Loop through the board
-        for i in range(0,64) :
-            piece = self.board_list[i]
-            # If there is a piece on the square
-            if piece != None :
-                # If the piece is of the color of the player to move
-                if piece.color == self.player_to_move :
-
-                    # Get the possible moves of the piece
-                    possible_moves: list[Move] = piece.possible_moves(self, i)
-                    # Loop through the possible moves
-                    for move in possible_moves :
-
-                        # Create a copy of the board
-                        board_copy = self.get_copy()
-                        # Execute the move on the copy
-                        board_copy.execute_move(move)
-                        # Check if the king of the player to move is in check after the move
-                        own_king_check = board_copy.check_verification(self.player_to_move)
-
-                        # Ensure that the king of the player to move is not in check after the move
-                        if own_king_check == 0 :
-                            return True
-        return False
+        return len(self.generate_legal_moves()) > 0
     
     
+    def is_square_attacked(self, square: int, by_color: str, occupied: int = None) -> bool:
+        '''
+        Returns whether a square is attacked by the pieces of a color.
+        Works from the square outward: slider rays, knight jumps, pawn diagonals and king steps.
+        @param square: The index of the square.
+        @param by_color: The color of the attacking pieces.
+        @param occupied: The occupancy bitboard to use for the slider rays (defaults to the current one).
+        @return: Whether the square is attacked.
+        '''
+        bitboards = self.bitboards
+        if occupied == None :
+            occupied = self.occupancy["w"] | self.occupancy["b"]
+
+        if by_color == "w" :
+            pawns, knights, bishops, rooks, queens, king = bitboards["P"], bitboards["N"], bitboards["B"], bitboards["R"], bitboards["Q"], bitboards["K"]
+            defender_color = "b"
+        else :
+            pawns, knights, bishops, rooks, queens, king = bitboards["p"], bitboards["n"], bitboards["b"], bitboards["r"], bitboards["q"], bitboards["k"]
+            defender_color = "w"
+
+        # A pawn attacks the square if it stands where a pawn of the other color on the square would capture
+        if PAWN_ATTACKS[defender_color][square] & pawns :
+            return True
+        if KNIGHT_ATTACKS[square] & knights :
+            return True
+        if KING_ATTACKS[square] & king :
+            return True
+        if bishop_attacks(square, occupied) & (bishops | queens) :
+            return True
+        if rook_attacks(square, occupied) & (rooks | queens) :
+            return True
+        return False
+    
     def check_verification(self, color:str) -> bool :
         '''
         Check if the king of the color is in check
         '''
         # Get the index of the king
-        king_index = self.get_king_index(color)
-        # Loop through the board to find moves that can capture the king
-        for i in range(0,64) :
-            if self.board_list[i] != None :
-                if self.board_list[i].color != color :
-                    possible_moves: list[Move] = self.board_list[i].possible_moves(self, i)
-                    for move in possible_moves :
-                        if move.end_pos_index == king_index :
-                            return 1
+        king_index = self.king_positions[color]
+        if king_index == -1 :
+            return 0
+        # Look for attackers from the king square outward
+        if self.is_square_attacked(king_index, "b" if color == "w" else "w") :
+            return 1
         return 0
+
+    def get_castling_rook_squares(self, move: Move) -> tuple[int, int]:
+        '''
+        Returns the start and end index of the rook for a castling move.
+        @param move: The castling move (king moving two squares).
+        @return: The index the rook starts on and the index it ends on.
+        '''
+        # Index 0 is h1 so kingside castling moves the king towards the lower indexes
+        if move.end_pos_index < move.start_pos_index :
+            return move.start_pos_index - 3, move.start_pos_index - 1
+        return move.start_pos_index + 4, move.start_pos_index + 1
     
-    def execute_move(self, move) -> bool:
+    def execute_move(self, move: Move) -> UndoRecord:
         '''
         Executes a move.
         @param move: The move to execute.
-        @return: Whether the move was a game-ending move (checkmate or stalemate).
+        @return: The undo record to give to unmake_move to take the move back.
         '''
+        start_index = move.start_pos_index
+        end_index = move.end_pos_index
+        moved_piece = self.board_list[start_index]
 
-        # Check the kind of move
-        if move.get_algebraic_notation().lower() in ["o-o", "o-o-o"]:
-            row = 1 if 'O' in move.get_algebraic_notation() else 8
+        undo_record = UndoRecord(move, moved_piece, None, -1, self.castling_rights_w, self.castling_rights_b,
+                                 self.en_passant_square, self.halfmove_clock, self.fullmove_number, self.zobrist_key)
 
-            # Castling kingside 
-            if move.get_algebraic_notation().lower() == "o-o" :
-                # Move the king to g
-                self.board_list[self.square_to_index("g" + str(row))] = self.board_list[self.square_to_index("e" + str(row))]
-                self.board_list[self.square_to_index("e" + str(row))] = None
+        # Take the castling rights, en passant file and player to move out of the hash (added back at the end)
+        self.zobrist_key ^= self.get_state_key()
 
-                # Move the rook to f
-                self.board_list[self.square_to_index("f" + str(row))] = self.board_list[self.square_to_index("h" + str(row))]
-                self.board_list[self.square_to_index("h" + str(row))] = None
+        # Check the kind of move
+        if moved_piece.name in "Kk" and abs(end_index - start_index) == 2 :
+            # Castling move the king then the rook
+            rook_start_index, rook_end_index = self.get_castling_rook_squares(move)
+            self.put_piece(end_index, self.remove_piece(start_index))
+            self.put_piece(rook_end_index, self.remove_piece(rook_start_index))
 
-            else :
-                # Castling queenside
-                # Move the king to c
-                self.board_list[self.square_to_index("c" + str(row))] = self.board_list[self.square_to_index("e" + str(row))]
-                self.board_list[self.square_to_index("e" + str(row))] = None
-
-                # Move the rook to d
-                self.board_list[self.square_to_index("d" + str(row))] = self.board_list[self.square_to_index("a" + str(row))]
-                self.board_list[self.square_to_index("a" + str(row))] = None  
         elif move.is_en_passant :
-            # Make the move (if it is an en passant move)
-            # Move the piece to the end position
-            self.board_list[move.end_pos_index] = self.board_list[move.start_pos_index]
-            self.board_list[move.start_pos_index] = None
+            # Remove the captured pawn (behind the end square)
+            captured_index = end_index - 8 if moved_piece.color == "w" else end_index + 8
+            undo_record.captured_piece = self.remove_piece(captured_index)
+            undo_record.captured_index = captured_index
 
-            # Remove the captured pawn
-            if self.player_to_move == "w" :
-                self.board_list[move.end_pos_index - 8] = None
-            else :
-                self.board_list[move.end_pos_index + 8] = None
-        
-        elif move.promote_to != "" : 
-            # Promote the piece 
-            self.board_list[move.start_pos_index] = None
-            new_piece = generate_piece_from_name(move.promote_to)
-            self.board_list[move.end_pos_index] = new_piece
+            # Move the piece to the end position
+            self.put_piece(end_index, self.remove_piece(start_index))
 
         else :
-            # Make the move (if it is a classic move or a capture move)
-
-            # Move the piece to the end position
-            self.board_list[move.end_pos_index] = self.board_list[move.start_pos_index]
-            self.board_list[move.start_pos_index] = None
+            # Make the move (classic move, capture move or promotion)
+            captured_piece = self.remove_piece(end_index)
+            if captured_piece != None :
+                undo_record.captured_piece = captured_piece
+                undo_record.captured_index = end_index
+
+            self.remove_piece(start_index)
+            if move.promote_to != "" :
+                # Promote the piece (the promotion letter case follows the color of the pawn)
+                promote_to = move.promote_to.upper() if moved_piece.color == "w" else move.promote_to.lower()
+                self.put_piece(end_index, generate_piece_from_name(promote_to))
+            else :
+                self.put_piece(end_index, moved_piece)
 
         # Update en passant square (indicate the square behind the pawn moved two squares forward)
-        if move.piece_name.lower() == "p" and abs(move.start_pos_index - move.end_pos_index) == 16 :
-            indx= move.start_pos_index + (move.end_pos_index - move.start_pos_index) // 2
-            self.en_passant_square = self.index_to_square(indx)
+        if moved_piece.name in "Pp" and abs(start_index - end_index) == 16 :
+            self.en_passant_square = self.index_to_square((start_index + end_index) // 2)
         else :
             self.en_passant_square = "-"
 
-
-        # Update the castling rights
-        if 'k' in self.castling_rights_b :
-            if move.get_algebraic_notation() == "o-o" :
-                self.castling_rights_b = self.castling_rights_b.replace('k', '')
-        if 'q' in self.castling_rights_b :
-            if move.get_algebraic_notation() == "o-o-o" :
-                self.castling_rights_b = self.castling_rights_b.replace('q', '')
-        
-        if 'K' in self.castling_rights_w :
-            if move.get_algebraic_notation() == "O-O" :
-                self.castling_rights_w = self.castling_rights_w.replace('K', '')
-        if 'Q' in self.castling_rights_w :
-            if move.get_algebraic_notation() == "O-O-O" :
-                self.castling_rights_w = self.castling_rights_w.replace('Q', '')
-        
-        # If the king moved removed the castling rights from him
-        if move.piece_name == "k" :
+        # If the king moved remove the castling rights from him
+        if moved_piece.name == "k" :
             self.castling_rights_b = ''
-        if move.piece_name == "K" : 
+        if moved_piece.name == "K" : 
             self.castling_rights_w = ''
 
+        # A rook leaving its corner (or being captured on it) loses its castling right
+        for corner_index in (start_index, end_index) :
+            right = CASTLING_RIGHTS_BY_CORNER.get(corner_index)
+            if right != None :
+                self.castling_rights_w = self.castling_rights_w.replace(right, '')
+                self.castling_rights_b = self.castling_rights_b.replace(right, '')
+
+        # Update the move counters
+        if moved_piece.name in "Pp" or undo_record.captured_piece != None :
+            self.halfmove_clock = 0
+        else :
+            self.halfmove_clock += 1
+        if moved_piece.color == "b" :
+            self.fullmove_number += 1
+
         # Switch player to move
         self.player_to_move = "w" if self.player_to_move == "b" else "b"
-
-        # Update the last valid self
-        self.last_valid_board = self.get_board_fen()
+        self.zobrist_key ^= self.get_state_key()
         
-        # If the move is a game ending move stop the game
-        return move.is_checkmate or move.is_stalemate 
+        return undo_record
+
+    def unmake_move(self, undo_record: UndoRecord) -> None:
+        '''
+        Takes back a move executed with execute_move.
+        @param undo_record: The record returned by execute_move.
+        '''
+        move = undo_record.move
+        start_index = move.start_pos_index
+        end_index = move.end_pos_index
+        moved_piece = undo_record.moved_piece
+
+        if moved_piece.name in "Kk" and abs(end_index - start_index) == 2 :
+            # Put the rook back in its corner
+            rook_start_index, rook_end_index = self.get_castling_rook_squares(move)
+            self.put_piece(rook_start_index, self.remove_piece(rook_end_index))
+
+        # Move the piece back (a promoted piece turns back into the pawn)
+        self.remove_piece(end_index)
+        self.put_piece(start_index, moved_piece)
+
+        # Restore the captured piece
+        if undo_record.captured_piece != None :
+            self.put_piece(undo_record.captured_index, undo_record.captured_piece)
+
+        # Restore the state of the position
+        self.player_to_move = moved_piece.color
+        self.castling_rights_w = undo_record.castling_rights_w
+        self.castling_rights_b = undo_record.castling_rights_b
+        self.en_passant_square = undo_record.en_passant_square
+        self.halfmove_clock = undo_record.halfmove_clock
+        self.fullmove_number = undo_record.fullmove_number
+        self.zobrist_key = undo_record.zobrist_key
 
     
+    def get_terminal_status(self, legal_moves: list[Move]) -> str:
+        '''
+        Returns whether the position is over for the player to move.
+        @param legal_moves: The legal moves in the position.
+        @return: "checkmate", "stalemate" or "" if the game goes on.
+        '''
+        if len(legal_moves) > 0 :
+            return ""
+        if self.check_verification(self.player_to_move) == 1 :
+            return "checkmate"
+        return "stalemate"
+
     def board_correspond_starting_pos(self) -> bool:
         '''
         Returns whether the board corresponds to the starting position.
@@ -437,6 +729,11 @@ class Board :
         '''
         board_copy = Board()
         board_copy.board_list = self.board_list.copy()
+        board_copy.bitboards = self.bitboards.copy()
+        board_copy.occupancy = self.occupancy.copy()
+        board_copy.king_positions = self.king_positions.copy()
+        board_copy.zobrist_key = self.zobrist_key
+        board_copy.fen_cache = self.fen_cache
         board_copy.player_to_move = self.player_to_move
         board_copy.castling_rights_w = self.castling_rights_w
         board_copy.castling_rights_b = self.castling_rights_b
@@ -449,16 +746,9 @@ class Board :
         '''
         Returns the index of the king of a color.
         @param color: The color of the king.
-        @return: The index of the king.
+        @return: The index of the king (-1 if there is no king of that color).
         '''
-        looking_for = "K" if color == "w" else "k"
-
-        for i in range(0,64) :
-            piece = self.board_list[i]
-            if piece != None :
-                if piece.name == looking_for :
-                    return i
-        return -1
+        return self.king_positions[color]
 
     def get_binary_board(self) : 
         """
@@ -1,11 +1,19 @@
 # Import custom modules
 from chess_engine_lib.board import Board
-from chess_engine_lib.move import Move
-from chess_engine_lib.led_com import LedCom
+from chess_engine_lib.move import Move, unpack_moves
+from chess_engine_lib.led_com import LedCom, LedFrame, FRAME_ALERT
+from chess_engine_lib.move_cache import MoveCache
+from chess_engine_lib.move_inference import MoveInference, binary_board_to_occupancy, occupancy_to_indexes
+from chess_engine_lib.speculative_cache import PrecomputedPickUp, SpeculativeCache
+from chess_engine_lib.ai_advisor import AIAdvisor, AISearch
+from chess_engine_lib.opening_book import PolyglotBook
+from chess_engine_lib.tablebase import SyzygyTablebase
+from chess_engine_lib.config import load_config
 from chess_engine_lib.pieces import *
 
 # Import general modules
-import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
 import json 
 import serial
 import time 
@@ -18,32 +26,45 @@ class ChessEngine:
         # Set the board to the desired initial FEN position
         self.board.set_board_fen(initial_board_fen)
 
-        # Calculate the possible moves in the current position
-        self.current_moves_possible = self.board.get_all_moves_in_position()
+        # Setup the cache of the legal moves (keyed by the Zobrist hash of the positions)
+        self.config = load_config()
+        self.move_cache = MoveCache(self.config["engine"]["move_cache_size"])
+
+        # The legal moves are generated by a worker thread so that the serial loop is never blocked,
+        # they are only waited for when they are actually needed (see current_moves_possible)
+        self.move_generation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="move_generation")
+        self.moves_future: Future = None
+
+        # While the board is idle the same worker precomputes what each pick-up will need (see speculate_position)
+        self.speculative_cache = SpeculativeCache(self.config["engine"]["speculative_cache_size"])
+        self.speculation_future: Future = None
+        self.speculation_cancel_event: threading.Event = None
 
         self.last_valid_board = initial_board_fen
         self.initial_board_fen = initial_board_fen
 
-        # Setup the binary board
-        self.binary_board = self.board.get_binary_board()
-        self.last_binary_board = self.binary_board
+        # Setup the occupancy of the board (bit i is set if square i has a piece), the moves are inferred from its changes
+        self.occupancy = self.board.get_occupied()
+        self.move_inference = MoveInference(self.occupancy)
 
         # Setup the Serial communication with the Arduino (if available)
         self.arduino_com = arduino_com
         self.led_com = LedCom(arduino_com)
+        # The frame is composed by the game loop and by the AI advisor (see show_AI_suggestion)
+        self.led_board_lock = threading.RLock()
+
+        # Calculate the possible moves in the current position
+        self.schedule_moves_generation()
+        self.schedule_speculation()
 
         # Setup the game tracking 
         self.current_move = 0
-        self.in_hand_pieces = []
         self.captured_pieces = []
 
         self.moves_played = []
 
-        self.castling_move = None
-        self.square_to_put_rook_on = ""
-        self.en_passant_move = None
-
         self.promotion_move = None
+        self.is_pawn_promoting = False
         self.piece_type_promotion = ""
 
         self.timer_classic = 10*60
@@ -57,333 +78,284 @@ class ChessEngine:
 
         self.stockfish_brain = stockfish_brain
 
-        self.action_done = False
+        # The AI searches run in the background (stockfish_brain is an EnginePool), their best moves are shown on top of the frame of the position
+        self.ai_advisor = None
+        if stockfish_brain != None :
+            self.ai_advisor = AIAdvisor(stockfish_brain, self.show_AI_suggestion, *self.load_known_moves())
+        self.ai_base_frame: LedFrame = None
+
+        # Reason why the last FEN given to load_fen_pos was rejected (None if it was loaded)
+        self.last_fen_error = None
 
 
     def check_board_validity(self) -> bool:
         '''
         Checks if the board is valid.
-        @return: True if the board is valid, False otherwise.
+        @return: True if the board is valid (no piece sensed on an empty square), False otherwise.
         '''
+        return self.occupancy & ~self.board.get_occupied() == 0
 
-        for i in range(0,len(self.binary_board)) : 
-            square = self.binary_board[i]
-            if square == 1 and self.board.board_list[i] == None :
-                return False
-        
-        return True
-    
-    def detect_pick_and_drop(self, new_binary_board) :
-        # For starting I will assume we can only pick up one piece at a time and drop one piece at a time
-        # Compare the binary board with the last binary board
-        diff = new_binary_board - self.binary_board
-        # Update the binary board (without reference)
-        self.binary_board = new_binary_board.copy()
+    def handle_moves(self, new_binary_board) -> Move :
+        '''
+        Handles the moves of the player.
+        The speculation is stopped while the new board state is handled and started again once the board is idle.
+        @param new_binary_board: The occupancy bitmask of the board, or the binary board (1 a piece is there, 0 a piece is not there).
+        @return: The move done, None if no move was completed.
+        '''
+        occupancy = binary_board_to_occupancy(new_binary_board)
+        # Same board state as before, nothing to handle
+        if occupancy == self.occupancy :
+            return None
+        self.occupancy = occupancy
 
-        # Find the index of the picked pieces
-        picked_pieces_index: int = np.where(diff == -1)
+        # A new board state arrived: the speculation must not touch the moves while they are used
+        self.stop_speculation()
 
-        # Find the index of the dropped pieces
-        dropped_pieces_index: int = np.where(diff == 1)
+        with self.led_board_lock :
+            # The AI search of the previous board state is not wanted anymore (pondering goes on until the move is done)
+            self.stop_AI_search(keep_ponder=True)
 
-        return picked_pieces_index, dropped_pieces_index
-    
-    def can_pieces_in_hand_take_piece(self, piece_index) -> bool:
+            move_done = self.handle_board_change(occupancy)
+
+            # Send the frame composed while handling the board state (only what changed is sent)
+            self.led_com.flush()
+
+        # Back to an idle board: precompute the pick-ups again while nothing is in hand
+        if self.is_board_idle() :
+            self.schedule_speculation()
+
+        return move_done
+
+    def load_known_moves(self) -> tuple[PolyglotBook, SyzygyTablebase]:
         '''
-        Checks if the pieces in hand can take a piece.
-        @param piece_index: The index of the piece to check.
-        @return: True if the pieces in hand can take the piece, False otherwise.
+        Opens the opening book and the endgame tablebase of the configuration (both are optional).
+        @return: The opening book and the tablebase, None for the ones not configured or not found.
         '''
-        for piece_in_hand in self.in_hand_pieces :
-            possible_moves: list[Move] = piece_in_hand[0].possible_moves(self.board, piece_in_hand[1])
-            for move in possible_moves :
-                if move.end_pos_index == piece_index :
-                    return True
-        
-        return False
- 
-    def handle_moves(self, new_binary_board) -> Move :
+        ai_config = self.config["ai"]
+
+        opening_book = None
+        if ai_config.get("opening_book_path", "") != "" :
+            try :
+                opening_book = PolyglotBook(ai_config["opening_book_path"])
+            except OSError as e :
+                print(f"Could not open the opening book: {e}")
+
+        tablebase = None
+        if ai_config.get("tablebase_directory", "") != "" :
+            tablebase = SyzygyTablebase(ai_config["tablebase_directory"], ai_config.get("tablebase_max_pieces", 5))
+            if not tablebase.is_available() :
+                tablebase = None
+
+        return opening_book, tablebase
+
+    def start_AI_search(self) -> None:
         '''
-        Handles the moves of the player.
-        Figure out which piece was picked up and which piece was dropped. 
-        @param binary_board: The binary board (1 a piece is there, 0 a piece is not there).
+        Starts the search of the move of the AI in the current position, the time comes from the clocks of the players.
         '''
-        valid_move = False
-        has_move_been_played = False
-        is_game_over = False
+        if self.ai_advisor == None :
+            return
 
-        # Detect the picked and dropped pieces
-        picked_pieces_index, dropped_pieces_index = self.detect_pick_and_drop(new_binary_board)
+        print("White is thinking...." if self.board.player_to_move == "w" else "Black is thinking....")
+        # The suggestions are drawn on top of the frame of the position
+        self.ai_base_frame = LedFrame()
+        self.ai_base_frame.colors = self.led_com.led_board_colors.copy()
 
-        # If no move detected return
-        if picked_pieces_index[0].size == 0 and  dropped_pieces_index[0].size == 0 :
-            return has_move_been_played
-        
-        led_matrix = [0 for i in range(64)]
-        
-        # Handling of special moves
-        # Castling move
-        if self.castling_move != None :
-            # If a castling move is initiated (by moving the king two squares)
-            if picked_pieces_index[0].size > 0 :
-                # Get the piece picked up
-                picked_piece_index = picked_pieces_index[0][0]
-                picked_piece = self.board.board_list[picked_piece_index]
-
-                # Check if the piece taken is a rook
-                if picked_piece != None and picked_piece.name.lower() == "r" :
-                    self.led_com.highlight_square_led_board(self.board.square_to_index(self.square_to_put_rook_on), (0, 0, 255))
-                    self.in_hand_pieces.append([picked_piece, picked_piece_index])
-                else :
-                    self.led_com.wrong_move_led_board()
-                
-            elif dropped_pieces_index[0].size > 0 :
-                # Get the drop position 
-                dropped_piece_index = dropped_pieces_index[0][0]
-                # If the rook is dropped on the right square
-                if len(self.in_hand_pieces) > 0 and self.in_hand_pieces[0][0].name.lower() == "r" :
-                    if self.board.square_to_index(self.square_to_put_rook_on) == dropped_piece_index :
-                        # Execute the castling move
-                        is_game_over = self.apply_move(self.castling_move)
-                        self.castling_move = None
-                        self.square_to_put_rook_on = ""
-                        self.led_com.reset_led_board()
-                        self.in_hand_pieces.pop(0)
-                else :
-                    self.led_com.wrong_move_led_board()
-        
-        # En passant move
-        elif self.en_passant_move != None :
-            if picked_pieces_index[0].size > 0 :
-                # Get the piece picked up
-                picked_piece_index = picked_pieces_index[0][0]
-                picked_piece = self.board.board_list[picked_piece_index]
-
-                # Check if the piece taken is a pawn under the en passant square
-                if picked_piece != None and picked_piece.name.lower() == "p" :
-                    self.captured_pieces.append([picked_piece, picked_piece_index])
-
-                    is_game_over = self.apply_move(self.en_passant_move)
-
-                    self.en_passant_move = None
-
-
-                    self.led_com.reset_led_board()
-
-                else :
-                    self.led_com.wrong_move_led_board()
-
-        # promotion move
-        elif self.promotion_move != None :
-            if picked_pieces_index[0].size > 0 :
-                picked_piece_index = picked_pieces_index[0][0]
-
-                # Check if the piece picked up is really the pawn under promotion
-                if self.promotion_move.end_pos_index == picked_piece_index :
-                    picked_piece = self.board.board_list[self.promotion_move.start_pos_index] 
-
-            elif dropped_pieces_index[0].size > 0 : 
-                dropped_piece_index = dropped_pieces_index[0][0]
-
-                # Check if the place where the piece has been dropped is the pawn spot
-                if self.promotion_move.end_pos_index == dropped_piece_index :
-                    dropped_piece = self.board.board_list[self.promotion_move.start_pos_index] 
-                    # Turn the pawn into the new type of piece (by default queen)
-                    type_promotion = "Q"
-                    # Check if the player wants to promote it to something else
-                    if self.piece_type_promotion != "" : 
-                        type_promotion = self.piece_type_promotion
-                    
-                    # Check the color of the piece 
-                    if self.promotion_move.piece_name.isupper() == True :
-                        type_promotion = type_promotion.upper()
-                    else : 
-                        type_promotion = type_promotion.lower()
-
-                    self.promotion_move.promote_to = type_promotion
-                    self.piece_type_promotion = ""
-
-
-                    is_game_over = self.apply_move(self.promotion_move)
-                    self.promotion_move = None
-                    self.led_com.reset_led_board()
-
-        # Handle the picked up pieces
-        elif picked_pieces_index[0].size > 0 : 
-            # Get the piece picked up
-            picked_piece_index = picked_pieces_index[0][0]
-            picked_piece = self.board.board_list[picked_piece_index]
-
-            if picked_piece == None :
-                # Piece could not be picked up there is no piece on the square
-                # Should only happen on the simulator
-                self.led_com.wrong_move_led_board()
-                return has_move_been_played
-            
-            print(f"Piece picked: {picked_piece.name} on square {self.board.index_to_square(picked_piece_index)}")
-            
-            # Check the color of the piece
-            if picked_piece.color != self.board.player_to_move : 
-                if self.can_pieces_in_hand_take_piece(picked_piece_index) == False :
-                    self.led_com.wrong_move_led_board(last_piece_index=picked_piece_index)
-            else : 
-                # If the piece is of the color of the player to move
-                # Get the moves that are possible with this piece (from the moves list)
-                possible_moves = []
-                for move in self.current_moves_possible :
-                    if move.start_pos_index == picked_piece_index :
-                        possible_moves.append(move)
-                
-                print(f"Possible moves for this piece: {possible_moves}")
-
-                if (self.board.player_to_move == "w" and self.is_player_w_AI == False) or (self.board.player_to_move == "b" and self.is_player_b_AI == False): 
-                    self.led_com.highlight_move_led_board(possible_moves, picked_piece_index)
-            
-            if self.check_board_validity() == False :
-                self.led_com.wrong_move_led_board() 
-
-            # Add the piece to the hand pieces
-            self.in_hand_pieces.append([picked_piece, picked_piece_index])
-            
-        # Handle the dropped pieces
-        elif dropped_pieces_index[0].size > 0 :
-            # Get the drop position
-            dropped_piece_index = dropped_pieces_index[0][0]
-
-            # Check if there are no pieces in hand to drop
-            if len(self.in_hand_pieces) == 0 :
-
-                # Check if the board saved corresponds to the current binary board
-                if self.check_board_validity() == False :
-                    self.led_com.wrong_move_led_board()
-                else :
-                    self.led_com.reset_led_board()
-                return has_move_been_played
-            
-            # Get the piece dropped (assume it is the first piece in hand)
-            dropped_piece, last_know_pos = self.in_hand_pieces.pop(0)
-            print(f"Piece dropped: {dropped_piece.name} on square {self.board.index_to_square(dropped_piece_index)}")
-
-            # Check if the move is valid ( check if the drop position is in the possible moves of the piece)
-            possible_moves = []
-            for move in self.current_moves_possible :
-                if move.start_pos_index == last_know_pos and move.end_pos_index == dropped_piece_index :
-                    possible_moves.append(move)
-
-            move_done = None
-
-            if dropped_piece.color == self.board.player_to_move :
-                for move in possible_moves :
-                    if move.end_pos_index == dropped_piece_index :
-                        valid_move, move_done = True, move
-                        break
-            
-            # Initiating pawn promotion 
-            # TO DO : handle capture promotion
-            if move_done != None and move_done.promote_to != "" :
+        self.ai_advisor.start_search(self.board.player_to_move, self.initial_board_fen, self.get_moves_played_uci(), self.board.get_copy(), self.current_moves_possible,
+                                     max(self.timer_white, 0) * 1000, max(self.timer_black, 0) * 1000)
 
-                print("Initiating promotion move")
-                self.promotion_move = move_done
-                self.is_pawn_promoting = False
+    def start_AI_ponder(self) -> None:
+        '''
+        Lets the AI that just played think on the reply it expects while the human player thinks.
+        '''
+        if self.ai_advisor == None :
+            return
 
-                self.led_com.highlight_square_led_board(self.board.square_to_index(move_done.get_algebraic_notation()))
+        ai_color = "b" if self.board.player_to_move == "w" else "w"
+        self.ai_advisor.start_ponder(ai_color, self.initial_board_fen, self.get_moves_played_uci(), self.board.get_copy(),
+                                     max(self.timer_white, 0) * 1000, max(self.timer_black, 0) * 1000)
 
-            
-            elif move_done != None and move_done.get_algebraic_notation() == self.board.en_passant_square :
-                self.en_passant_move = move_done
-                if move_done.piece_name == "p" :
-                    self.led_com.highlight_square_led_board(self.board.square_to_index(self.board.en_passant_square)+8)
-                else : 
-                    self.led_com.highlight_square_led_board(self.board.square_to_index(self.board.en_passant_square)-8)
-        
-            elif move_done != None and move_done.get_algebraic_notation().lower() in ["o-o", "o-o-o"] :
-                # Initiate the castling move
-                self.castling_move = move_done
-                print(move_done.piece_name)
-                # Get the square to put the rook on
-                rook_castling_square = "f" if move_done.get_algebraic_notation().lower() == "o-o" else "d"
-                rook_castling_square += "8" if move_done.piece_name == "k" else "1"
-                self.square_to_put_rook_on = rook_castling_square
-                print(f"CASTLING MOVE INITIATED: square to put rook on: {self.square_to_put_rook_on}")
-                # Highlight the current square of the rook 
-                rook_square = "a" if move_done.get_algebraic_notation().lower() == "o-o-o" else "h"
-                rook_square += "8" if move_done.piece_name == "k" else "1"
-                print(f"Rook square: {rook_square}")
-                self.led_com.highlight_square_led_board(self.board.square_to_index(rook_square), (0, 0, 255))
-
-            elif valid_move : 
-                # A valid move was done
-                print(f"Valid move has been done! (Move done: {move_done})")
-
-                is_game_over = self.apply_move(move_done)
-                
-                # If the move is capturing a piece remove it from the hand pieces
-                if move_done.is_capturing :
-                    for piece_in_hand in self.in_hand_pieces :
-                        if piece_in_hand[1] == move_done.end_pos_index :
-                            self.in_hand_pieces.remove(piece_in_hand)
-                            self.captured_pieces.append(piece_in_hand)
-                            break
-                # If the move is a mate then stops the game and turn the board blue
-                if move_done.is_checkmate : 
-                    self.arduino_com.send_leds_range_command(0,63,(0,0,255))
-                elif move_done.is_stalemate : 
-                    self.arduino_com.send_leds_range_command(0,63,(255,255,0))
-                elif move_done.is_check : 
-                    # Highlight king pos
-                    self.led_com.reset_led_board()
-                    if self.board.player_to_move == "b" :
-                        self.arduino_com.set_leds_with_colors([self.board.get_king_index('b')], (255,0,0))
-                    else : 
-                        self.arduino_com.set_leds_with_colors([self.board.get_king_index('w')], (255,0,0))
-                else : 
-                    self.led_com.reset_led_board()
-
-            elif last_know_pos == dropped_piece_index : 
-                # Clear the LED board
+    def stop_AI_search(self, keep_ponder: bool = False) -> None:
+        '''
+        Stops the search of the AI (the position it was searching has changed).
+        @param keep_ponder: Whether to let the AI go on pondering.
+        '''
+        if self.ai_advisor != None :
+            self.ai_advisor.stop_search(keep_ponder)
+
+    def get_moves_played_uci(self) -> list[str]:
+        '''
+        Returns the moves played since the start of the game in UCI notation.
+        '''
+        return [move.get_uci() for move in self.moves_played]
+
+    def show_AI_suggestion(self, ai_search: AISearch, best_move: Move) -> None:
+        '''
+        Shows the best move found so far by the AI (called from the worker of the AI advisor).
+        @param ai_search: The search that found the move.
+        @param best_move: The best move.
+        '''
+        with self.led_board_lock :
+            # The board may have changed since the engine found the move
+            if not self.ai_advisor.is_current_search(ai_search) :
+                return
+            self.led_com.show_led_frame(self.ai_base_frame)
+            self.led_com.show_AI_move(best_move)
+            self.led_com.flush()
+
+    def handle_board_change(self, occupancy: int) -> Move :
+        '''
+        Figures out the move played from the pieces picked up and put down since the last move.
+        The squares that changed are matched against the legal moves (see MoveInference), whatever the order
+        the pieces were moved in. A promotion is done once the pawn is swapped for the new piece.
+        @param occupancy: The occupancy bitmask of the board (bit i is set if square i has a piece).
+        @return: The move done, None if no move was completed.
+        '''
+        delta = self.move_inference.update(occupancy)
+
+        # Every piece is back on its square
+        if delta == 0 :
+            self.promotion_move = None
+            self.led_com.reset_led_board()
+            return None
+
+        moves_done, moves_under_way = self.move_inference.match_moves(self.board, self.current_moves_possible, occupancy)
+
+        # Promotion under way: the pawn is on its promotion square, waiting to be swapped for the new piece
+        if self.promotion_move != None :
+            promotion_square_bit = 1 << self.promotion_move.end_pos_index
+            is_promotion_done = any(move.start_pos_index == self.promotion_move.start_pos_index and move.end_pos_index == self.promotion_move.end_pos_index
+                                    for move in moves_done)
+            if occupancy & promotion_square_bit == 0 and any(move.end_pos_index == self.promotion_move.end_pos_index for move in moves_under_way) :
+                # The pawn has been picked up
+                self.is_pawn_promoting = True
                 self.led_com.reset_led_board()
-            elif self.check_board_validity() == False :
-                self.led_com.wrong_move_led_board()
-            elif self.check_board_validity() == True :
+                self.led_com.highlight_square_led_board(self.promotion_move.end_pos_index)
+                return None
+            elif is_promotion_done :
+                if not self.is_pawn_promoting :
+                    return None
+                return self.play_move(self.get_promotion_move(moves_done))
+            else :
+                # The pawn went somewhere else
+                self.promotion_move = None
+
+        # Several moves done at once can only be the promotions of a pawn, else the board is ambiguous
+        if len(moves_done) > 0 and all(move.start_pos_index == moves_done[0].start_pos_index and move.end_pos_index == moves_done[0].end_pos_index
+                                       for move in moves_done) :
+            if moves_done[0].promote_to != "" :
+                print("Initiating promotion move")
+                self.promotion_move = moves_done[0]
+                self.is_pawn_promoting = False
                 self.led_com.reset_led_board()
-        
-        # If a valid move has been done
-        if valid_move : 
-            print(f"Valid move has been done : {move_done}")
-            # If the player that has to play is an AI, display the move wanted
-            if self.is_player_b_AI :
-                if self.board.player_to_move == "b" :
-                        print("Black is thinking....")
-                        # Display the move the AI wants to play
-                        self.stockfish_brain.set_fen_position(self.board.get_board_fen())
-                        best_move = self.stockfish_brain.get_best_move(wtime=1000, btime=1000)
-                        print(f"Black thinks the best move is {best_move}")
-                        self.led_com.show_AI_move(best_move)
-            if self.is_player_w_AI :
-                if self.board.player_to_move == "w" :
-                        print("White is thinking....")
-                        # Display the move the AI wants to play
-                        self.stockfish_brain.set_fen_position(self.board.get_board_fen())
-                        best_move = self.stockfish_brain.get_best_move(wtime=1000, btime=1000)
-                        print(f"White thinks the best move is {best_move}")
-                        self.led_com.show_AI_move(best_move)
-            
-            # Update time taken from last turn's player
-            time_taken = time.time() - self.time_start_turn
-
-            if self.board.player_to_move == "b" : 
-                self.timer_white -= time_taken
-            
-            if self.board.player_to_move == "w" :
-                self.timer_black -= time_taken
-
-            self.time_start_turn = time.time()
-
-            # Return the move done 
-            return move_done
+                self.led_com.highlight_square_led_board(self.promotion_move.end_pos_index)
+                return None
+            return self.play_move(moves_done[0])
+
+        lifted_squares = delta & self.move_inference.stable_occupancy
+        picked_piece_index = lifted_squares.bit_length() - 1
+        picked_piece = self.board.board_list[picked_piece_index] if lifted_squares != 0 else None
+
+        if delta == lifted_squares and bin(lifted_squares).count("1") == 1 and picked_piece.color == self.board.player_to_move :
+            # A single piece of the player to move is picked up
+            print(f"Piece picked: {picked_piece.name} on square {self.board.index_to_square(picked_piece_index)}")
+
+            # The pick-up was most likely precomputed while the board was idle
+            precomputed_pick_up = self.speculative_cache.get(self.board.zobrist_key, picked_piece_index)
+            if precomputed_pick_up != None :
+                possible_moves = precomputed_pick_up.moves
+                led_frame = precomputed_pick_up.led_frame
+            else :
+                # Get the moves that are possible with this piece (from the moves list)
+                possible_moves = [move for move in moves_under_way if move.start_pos_index == picked_piece_index]
+                # Only the moves of the picked piece need their check / mate flags
+                self.board.annotate_moves(possible_moves)
+                led_frame = None
+
+            print(f"Possible moves for this piece: {possible_moves}")
+
+            if (self.board.player_to_move == "w" and self.is_player_w_AI == False) or (self.board.player_to_move == "b" and self.is_player_b_AI == False):
+                self.led_com.highlight_move_led_board(possible_moves, picked_piece_index, led_frame)
+
+        elif len(moves_under_way) > 0 :
+            # Part of a move is done (king of a castling, pawn taking en passant, piece to capture picked up...), show what is left to move
+            missing_squares = 0
+            for move in moves_under_way :
+                missing_squares |= self.move_inference.get_missing_squares(self.board, move, occupancy)
+            self.led_com.reset_led_board()
+            self.led_com.highlight_squares_led_board(occupancy_to_indexes(missing_squares), (0, 0, 255))
+
+        else :
+            # No legal move goes through this board state
+            self.led_com.wrong_move_led_board(last_piece_index=picked_piece_index if picked_piece != None else -1)
 
         return None
 
+    def get_promotion_move(self, promotion_moves: list[Move]) -> Move :
+        '''
+        Picks the promotion to the piece chosen by the player (by default a queen).
+        @param promotion_moves: The promotions of the pawn (one per piece).
+        '''
+        type_promotion = "Q"
+        # Check if the player wants to promote it to something else
+        if self.piece_type_promotion != "" :
+            type_promotion = self.piece_type_promotion.upper()
+        self.piece_type_promotion = ""
+
+        for move in promotion_moves :
+            if move.promote_to == type_promotion :
+                return move
+        return promotion_moves[0]
+
+    def play_move(self, move_done: Move) -> Move :
+        '''
+        Plays the move done on the board: updates the LEDs, the clocks and starts the AI.
+        @param move_done: The move done.
+        @return: The move done.
+        '''
+        print(f"Valid move has been done! (Move done: {move_done})")
+
+        # Keep the piece captured (before it leaves the board)
+        if move_done.is_capturing :
+            captured_index = move_done.end_pos_index
+            if move_done.is_en_passant :
+                captured_index = captured_index - 8 if move_done.piece_name == "P" else captured_index + 8
+            self.captured_pieces.append([self.board.board_list[captured_index], captured_index])
+
+        self.promotion_move = None
+        is_game_over = self.apply_move(move_done)
+
+        # If the move is a mate then stops the game and turn the board blue
+        if move_done.is_checkmate :
+            self.led_com.end_of_game_led_board()
+        elif move_done.is_stalemate :
+            self.led_com.fill_led_board((255,255,0))
+        elif move_done.is_check :
+            # Highlight king pos
+            self.led_com.reset_led_board()
+            self.led_com.highlight_square_led_board(self.board.get_king_index(self.board.player_to_move), (255,0,0), FRAME_ALERT)
+        else :
+            self.led_com.reset_led_board()
+
+        # Update time taken from last turn's player
+        time_taken = time.time() - self.time_start_turn
+
+        if self.board.player_to_move == "b" :
+            self.timer_white -= time_taken
+
+        if self.board.player_to_move == "w" :
+            self.timer_black -= time_taken
+
+        self.time_start_turn = time.time()
+
+        # If the player that has to play is an AI, search the move it wants (shown as soon as it is found)
+        if (self.is_player_w_AI and self.board.player_to_move == "w") or (self.is_player_b_AI and self.board.player_to_move == "b") :
+            self.start_AI_search()
+        # Else if the AI just played, it thinks on the reply it expects while the player thinks
+        elif (self.is_player_w_AI and self.board.player_to_move == "b") or (self.is_player_b_AI and self.board.player_to_move == "w") :
+            self.start_AI_ponder()
+
+        return move_done
+
 
     def apply_move(self, move: Move) -> None:
         '''
@@ -391,44 +363,165 @@ class ChessEngine:
         @param move: The move to apply.
         '''
 
-        is_game_over = self.board.execute_move(move)
+        self.board.execute_move(move)
 
+        # Start generating the moves of the next position before annotating the move played
+        self.schedule_moves_generation()
+
+        # If the move is a game ending move stop the game
+        is_game_over = move.is_checkmate or move.is_stalemate
         if is_game_over == True :
             print("Game is over...")
 
-        self.current_moves_possible = self.board.get_all_moves_in_position()
         self.current_move += 1
         self.moves_played.append(move)
 
+        # The position the next move starts from
+        self.move_inference.reset(self.board.get_occupied())
+
         # Display board for debug purposes
         print(self.board.get_board_visual())
 
         return is_game_over
     
+    @property
+    def current_moves_possible(self) -> list[Move]:
+        '''
+        The legal moves in the current position (waits for the move generation worker if it is still running).
+        '''
+        return self.moves_future.result()[0]
+
+    @property
+    def terminal_status(self) -> str:
+        '''
+        Whether the current position is over: "checkmate", "stalemate" or "" (waits for the move generation worker).
+        '''
+        return self.moves_future.result()[1]
+
+    def schedule_moves_generation(self) -> None:
+        '''
+        Starts generating the legal moves of the current position in the worker thread.
+        The worker gets its own copy of the board, the board of the engine can keep being read meanwhile.
+        '''
+        self.stop_speculation()
+        self.moves_future = self.move_generation_executor.submit(self.get_moves_in_position, self.board.get_copy())
+
+    def is_board_idle(self) -> bool:
+        '''
+        Returns whether the board is waiting for a new move (every piece on its square and no promotion under way).
+        '''
+        return self.occupancy == self.move_inference.stable_occupancy and self.promotion_move == None
+
+    def schedule_speculation(self) -> None:
+        '''
+        Starts precomputing the pick-ups of the current position in the worker thread (after the move generation).
+        '''
+        if self.speculative_cache.max_size <= 0 :
+            return
+        self.stop_speculation()
+        self.speculation_cancel_event = threading.Event()
+        self.speculation_future = self.move_generation_executor.submit(self.speculate_position, self.board.get_copy(), self.moves_future, self.speculation_cancel_event)
+
+    def stop_speculation(self) -> None:
+        '''
+        Cancels the running speculation and waits for the worker to let go of the moves.
+        What was already precomputed stays in the speculative cache.
+        '''
+        if self.speculation_future == None :
+            return
+        self.speculation_cancel_event.set()
+        if not self.speculation_future.cancel() :
+            self.speculation_future.result()
+        self.speculation_future = None
+        self.speculation_cancel_event = None
+
+    def speculate_position(self, board: Board, moves_future: Future, cancel_event: threading.Event) -> None:
+        '''
+        Precomputes, piece by piece, the annotated moves and the highlight frame of every possible pick-up,
+        and caches the legal moves of every position reachable in one move on the way.
+        Runs in the move generation worker thread, stops as soon as cancel_event is set.
+        @param board: The board of the position (not used by anything else meanwhile).
+        @param moves_future: The future of the legal moves of the position.
+        @param cancel_event: Set when a new board state arrives.
+        '''
+        moves, terminal_status = moves_future.result()
+
+        moves_by_square: dict[int, list[Move]] = {}
+        for move in moves :
+            moves_by_square.setdefault(move.start_pos_index, []).append(move)
+
+        ennemy_color = "w" if board.player_to_move == "b" else "b"
+        for square, square_moves in moves_by_square.items() :
+            if self.speculative_cache.contains(board.zobrist_key, square) :
+                continue
+
+            for move in square_moves :
+                if cancel_event.is_set() :
+                    self.speculative_cache.cancelled_runs += 1
+                    return
+                undo_record = board.execute_move(move)
+                # One generation gives both the flags of the move and the moves of the next position
+                ennemy_moves, ennemy_terminal_status = self.get_moves_in_position(board, prepare_moves=False)
+                if not move.is_annotated() :
+                    board.annotate_executed_move(move, ennemy_color, ennemy_moves)
+                    move.annotation_origin = None
+                board.unmake_move(undo_record)
+
+            led_frame = self.led_com.compose_highlight_frame(square_moves, square)
+            self.speculative_cache.put(board.zobrist_key, square, PrecomputedPickUp(square_moves, led_frame))
+
+    def get_moves_in_position(self, board: Board, prepare_moves: bool = True) -> tuple[list[Move], str]:
+        '''
+        Returns the legal moves of a position, from the move cache if the position was already seen.
+        Runs in the move generation worker thread (the only user of the move cache).
+        @param board: The board of the position (not used by anything else meanwhile).
+        @param prepare_moves: Whether the moves get their lazy flags and disambiguation (only needed for the moves shown to the player).
+        @return: The list of legal moves and the terminal status of the position.
+        '''
+        cached_position = self.move_cache.get(board.zobrist_key)
+        if cached_position == None :
+            moves = board.generate_legal_moves()
+            terminal_status = board.get_terminal_status(moves)
+            self.move_cache.put(board.zobrist_key, moves, terminal_status)
+        else :
+            moves = unpack_moves(cached_position.packed_moves)
+            terminal_status = cached_position.terminal_status
+
+        if prepare_moves :
+            board.prepare_legal_moves(moves)
+
+        return moves, terminal_status
+
     def reset_game(self) -> None:
         '''
         Resets the game.
         '''
+        if self.ai_advisor != None :
+            self.ai_advisor.new_game()
         self.board.set_board_fen(self.last_valid_board)
-        self.binary_board = self.board.get_binary_board()
-        self.current_moves_possible = self.board.get_all_moves_in_position()
+        self.occupancy = self.board.get_occupied()
+        self.move_inference.reset(self.occupancy)
+        self.schedule_moves_generation()
         self.current_move = 0
-        self.in_hand_pieces = []
         self.captured_pieces = []
         self.moves_played = []
-        self.castling_move = None
-        self.square_to_put_rook_on = ""
-        self.en_passant_move = None
-        self.led_com.reset_led_board()
+        self.promotion_move = None
+        self.is_pawn_promoting = False
+        with self.led_board_lock :
+            self.led_com.reset_led_board()
+            self.led_com.flush()
+        self.schedule_speculation()
 
     def load_fen_pos(self, fen_position) -> bool :
         '''
         Load a FEN position into the engine
+        The FEN is validated first, the reason of a rejection is kept in last_fen_error.
         '''
 
         fen_loaded = False
+        self.last_fen_error = self.board.validate_fen(fen_position)
         # If the fen is valid load the fen position into the engine
-        if self.board.is_fen_valid(fen_position) : 
+        if self.last_fen_error == None : 
 
             self.initial_board_fen = fen_position
             self.last_valid_board = fen_position
@@ -453,9 +546,19 @@ class ChessEngine:
                     "black": self.timer_black
                 },
                 "promoting" : self.promotion_move != None
+            },
+            "engine_stats" : {
+                "move_cache": self.move_cache.get_stats(),
+                "speculative_cache": self.speculative_cache.get_stats()
             }
         }
 
+        if self.arduino_com != None :
+            engine_infos["engine_stats"]["command_queue"] = self.arduino_com.get_queue_stats()
+
+        if self.ai_advisor != None :
+            engine_infos["ai_infos"] = self.ai_advisor.get_infos()
+
         return engine_infos
     
 
@@ -467,23 +570,24 @@ class ChessEngine:
         '''
 
         is_setup_correct = False
-        
-        # Compare the binary board with the squares that need a piece
-        diff = binary_board - self.binary_board
+        occupancy = binary_board_to_occupancy(binary_board)
+        # Compare the occupancy with the squares that need a piece
+        expected_occupancy = self.board.get_occupied()
 
-        if not diff.any() :
+        if occupancy == expected_occupancy :
             # The board is already set up correctly
             is_setup_correct = True
             self.led_com.reset_led_board()
+            self.led_com.flush()
             return is_setup_correct
         
         # Send the information to the LED board by highlighting the squares that need a piece
-        self.led_com.highlight_squares_led_board(np.where(diff == -1)[0], (255, 255, 0))
+        self.led_com.reset_led_board()
+        self.led_com.highlight_squares_led_board(occupancy_to_indexes(expected_occupancy & ~occupancy), (255, 255, 0))
 
-        # Get the list of indices where diff == 0 and self.binary_board == 1
-        # These are the squares that have a piece on them
-        squares_with_piece = np.where((diff == 0) & (self.binary_board == 1))[0]
-        self.led_com.highlight_squares_led_board(squares_with_piece, (0, 255, 0))
+        # These are the squares that have their piece on them
+        self.led_com.highlight_squares_led_board(occupancy_to_indexes(expected_occupancy & occupancy), (0, 255, 0))
+        self.led_com.flush()
 
 
         return is_setup_correct
@@ -0,0 +1,15 @@
+import json
+import os
+
+# Default configuration file, next to this module
+CONFIG_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+
+def load_config(config_path: str = CONFIG_PATH) -> dict:
+    '''
+    Loads the configuration of the chess engine.
+    @param config_path: The path of the JSON configuration file.
+    @return: The configuration as a dict.
+    '''
+    with open(config_path, "r") as config_file :
+        return json.load(config_file)
@@ -0,0 +1,57 @@
+import os
+import threading
+
+from chess_engine_lib.uci_engine import UciEngine
+from chess_engine_lib.search import BuiltinEngine
+
+
+class EnginePool :
+    '''
+    Long-lived UCI engine processes, one per AI player (started the first time the player needs it).
+    Each player keeps its own process for the whole game, so its hash is kept between its moves
+    and it can ponder on the reply of its opponent without disturbing the other player.
+    If the engine binary is missing the built-in search is used instead (see BuiltinEngine).
+    '''
+    def __init__(self, path: str, parameters: dict = None, ponder: bool = True) -> None:
+        self.path: str = path
+        self.parameters: dict = dict(parameters or {})
+        self.ponder: bool = ponder
+        if ponder :
+            # Lets the engine manage its time knowing it will ponder
+            self.parameters["Ponder"] = "true"
+
+        self.is_builtin: bool = path == None or not os.access(path, os.X_OK)
+        if self.is_builtin :
+            print(f"No UCI engine at {path}, the built-in search is used instead.")
+
+        self.engines: dict[str, UciEngine] = {}
+        self.engines_lock = threading.Lock()
+
+    def get_engine(self, color: str) -> UciEngine:
+        '''
+        Returns the engine of a player, started if needed.
+        @param color: The color of the player ("w" or "b").
+        '''
+        with self.engines_lock :
+            if color not in self.engines :
+                self.engines[color] = BuiltinEngine() if self.is_builtin else UciEngine(self.path, self.parameters)
+            return self.engines[color]
+
+    def new_game(self) -> None:
+        '''
+        Tells the started engines a new game begins (not to be called during a search).
+        '''
+        with self.engines_lock :
+            engines = list(self.engines.values())
+        for uci_engine in engines :
+            uci_engine.new_game()
+
+    def close(self) -> None:
+        '''
+        Stops every engine process.
+        '''
+        with self.engines_lock :
+            engines = list(self.engines.values())
+            self.engines.clear()
+        for uci_engine in engines :
+            uci_engine.quit()
@@ -0,0 +1,144 @@
+'''
+FEN codec of the board.
+
+- The piece placement is parsed in a single pass over the string, straight into the 64 squares
+  of Board.board_list (0 is h1, 7 is a1, 63 is a8).
+- The piece placement is serialized with one join over the squares (empty squares written as "1")
+  followed by the merge of the runs of "1" into their count.
+- Malformed FEN strings raise a FenError telling which field is wrong. Board.validate_fen also
+  reports positions that parse but cannot happen in a game with a FenError.
+'''
+from chess_engine_lib.pieces import Piece, PIECES
+
+DEFAULT_FEN: str = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Runs of empty squares, longest first so that they are merged greedily
+EMPTY_SQUARES_RUNS: list[tuple[str, str]] = [("1" * count, str(count)) for count in range(8, 1, -1)]
+
+# Board index of the first square (file a) of each row of the FEN, top row (rank 8) first
+ROW_START_INDEXES: list[int] = [rank * 8 + 7 for rank in range(7, -1, -1)]
+
+
+class FenError(ValueError) :
+    '''
+    Raised when a FEN string cannot be parsed (also returned by Board.validate_fen for impossible positions).
+    '''
+    def __init__(self, field: str, message: str, fen: str) -> None:
+        super().__init__(f"Invalid FEN ({field}): {message} -- '{fen}'")
+        self.field: str = field
+        self.message: str = message
+        self.fen: str = fen
+
+    def serialize(self) -> dict:
+        dict_obj = {
+            'field': self.field,
+            'message': self.message,
+            'fen': self.fen
+        }
+        return dict_obj
+
+
+class ParsedFen :
+    '''
+    The fields of a parsed FEN string.
+    '''
+    def __init__(self, board_list: list[Piece], player_to_move: str, castling_rights_w: str, castling_rights_b: str,
+                 en_passant_square: str, halfmove_clock: int, fullmove_number: int) -> None:
+        self.board_list: list[Piece] = board_list
+        self.player_to_move: str = player_to_move
+        self.castling_rights_w: str = castling_rights_w
+        self.castling_rights_b: str = castling_rights_b
+        self.en_passant_square: str = en_passant_square
+        self.halfmove_clock: int = halfmove_clock
+        self.fullmove_number: int = fullmove_number
+
+
+def parse_piece_placement(placement: str, fen: str) -> list[Piece]:
+    '''
+    Parses the piece placement field of a FEN string.
+    @param placement: The piece placement field (e.g. "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR").
+    @param fen: The whole FEN string (for the error messages).
+    @return: The 64 squares of the board.
+    '''
+    board_list: list[Piece] = [None] * 64
+    rows = placement.split("/")
+    if len(rows) != 8 :
+        raise FenError("piece placement", f"expected 8 rows, got {len(rows)}", fen)
+
+    for row_number, row in enumerate(rows) :
+        index = ROW_START_INDEXES[row_number]
+        row_end_index = index - 8
+        for char in row :
+            if "1" <= char <= "8" :
+                index -= ord(char) - ord("0")
+            else :
+                piece = PIECES.get(char)
+                if piece == None :
+                    raise FenError("piece placement", f"unknown piece '{char}'", fen)
+                if index <= row_end_index :
+                    raise FenError("piece placement", f"row {8 - row_number} has more than 8 squares", fen)
+                board_list[index] = piece
+                index -= 1
+            if index < row_end_index :
+                raise FenError("piece placement", f"row {8 - row_number} has more than 8 squares", fen)
+        if index != row_end_index :
+            raise FenError("piece placement", f"row {8 - row_number} has less than 8 squares", fen)
+    return board_list
+
+
+def parse_fen(fen: str) -> ParsedFen:
+    '''
+    Parses a FEN string.
+    - Example : rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1
+    - pieces positions -- player to move -- castling rights -- en passant square -- halfmove clock -- fullmove number
+    The two clocks can be left out, they then default to "0 1".
+    @param fen: The FEN string.
+    @return: The parsed fields.
+    '''
+    if not isinstance(fen, str) :
+        raise FenError("fen", "not a string", str(fen))
+
+    fen_split: list[str] = fen.split()
+    if len(fen_split) == 4 :
+        fen_split += ["0", "1"]
+    if len(fen_split) != 6 :
+        raise FenError("fen", f"expected 6 fields, got {len(fen_split)}", fen)
+    placement, player_to_move, castling_rights, en_passant_square, halfmove_clock, fullmove_number = fen_split
+
+    board_list = parse_piece_placement(placement, fen)
+
+    if player_to_move not in ("w", "b") :
+        raise FenError("player to move", f"expected 'w' or 'b', got '{player_to_move}'", fen)
+
+    castling_rights_w, castling_rights_b = "", ""
+    if castling_rights != "-" :
+        if any(char not in "KQkq" for char in castling_rights) or len(set(castling_rights)) != len(castling_rights) :
+            raise FenError("castling rights", f"expected '-' or letters of 'KQkq', got '{castling_rights}'", fen)
+        castling_rights_w = "".join(char for char in "KQ" if char in castling_rights)
+        castling_rights_b = "".join(char for char in "kq" if char in castling_rights)
+
+    if en_passant_square != "-" and (len(en_passant_square) != 2 or en_passant_square[0] not in "abcdefgh" or en_passant_square[1] not in "36") :
+        raise FenError("en passant square", f"expected '-' or a square on row 3 or 6, got '{en_passant_square}'", fen)
+
+    if not (halfmove_clock.isascii() and halfmove_clock.isdigit()) :
+        raise FenError("halfmove clock", f"expected a positive number, got '{halfmove_clock}'", fen)
+    if not (fullmove_number.isascii() and fullmove_number.isdigit()) :
+        raise FenError("fullmove number", f"expected a positive number, got '{fullmove_number}'", fen)
+
+    return ParsedFen(board_list, player_to_move, castling_rights_w, castling_rights_b, en_passant_square,
+                     int(halfmove_clock), int(fullmove_number))
+
+
+def piece_placement_to_fen(board_list: list[Piece]) -> str:
+    '''
+    Serializes the pieces of a board into the piece placement field of a FEN string.
+    @param board_list: The 64 squares of the board.
+    @return: The piece placement field.
+    '''
+    placement = "/".join(
+        "".join("1" if board_list[index] is None else board_list[index].name for index in range(row_start, row_start - 8, -1))
+        for row_start in ROW_START_INDEXES
+    )
+    for empty_squares_run, count in EMPTY_SQUARES_RUNS :
+        placement = placement.replace(empty_squares_run, count)
+    return placement
@@ -1,83 +1,150 @@
 import numpy as np
 import serial
+import threading
 
 from chess_engine_lib.move import Move
 
+# Bytes on the wire of the LED commands (frame overhead of 5 bytes included, see the protocol in the README)
+RANGE_COMMAND_BYTES = 10
+MULTI_COMMAND_BASE_BYTES = 9
+FULL_FRAME_COMMAND_BYTES = 197
+
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+
+# Urgency of a frame, the most urgent part composed since the last flush decides the priority of its commands
+FRAME_ALERT = 0        # Wrong move, check, end of game
+FRAME_PLAIN = 1        # Plain state of the board (e.g. cleared)
+FRAME_DECORATIVE = 2   # Highlights (moves of the piece in hand, AI move)
+
+
+def new_frame_colors() -> np.ndarray:
+    '''
+    Returns the colors of a frame with every LED off: one (r, g, b) row per square.
+    '''
+    return np.zeros((64, 3), dtype=np.uint8)
+
+
+class LedFrame :
+    '''
+    A state of the LED board: the rgb colors of the 64 squares, as a (64, 3) array.
+    Frames can be composed ahead of time (e.g. by the speculation worker) and shown later.
+    '''
+    def __init__(self) -> None:
+        self.colors = new_frame_colors()
+
 
 class LedCom:
+    '''
+    Frame buffer of the LED board.
+    The methods below only compose the target frame (led_board_colors), flush sends the difference
+    between the target frame and what the LED board shows with as few commands as possible.
+    '''
     def __init__(self, arduino_com:serial.Serial=None) -> None:
-        # Define 1D array to represent the LED board used to store rgb colors
-        self.led_board_colors = np.zeros(64*3, dtype=int)
+        # (64, 3) array of the rgb colors of the squares (target frame)
+        self.led_board_colors = new_frame_colors()
+
+        # Colors shown by the LED board, as acknowledged by the Arduino (not known before the first ACK)
+        self.displayed_colors = new_frame_colors()
+        self.displayed_colors_known = np.zeros(64, dtype=bool)
+        # Colors of the last command sent for each LED still waiting for its ACK, and the generation of that command
+        # (only the last command sent for a LED tells what it shows once done)
+        self.pending_colors = new_frame_colors()
+        self.is_pending = np.zeros(64, dtype=bool)
+        self.pending_generations = np.zeros(64, dtype=int)
+        self.next_generation = 1
+        self.displayed_colors_lock = threading.Lock()
+
+        # Urgency of the frame composed since the last flush (None if nothing was composed)
+        self.frame_urgency = None
 
         self.arduino_com = arduino_com
-    
+
     def square_to_index(self, square: str) -> int:
         '''
         Returns the index of the square.
         @param square: The square name (e.g. "e4").
         @return: The index of the square.
         '''
-        return (int(square[1]) - 1) * 8 + ord('h') - ord(square[0]) 
+        return (int(square[1]) - 1) * 8 + ord('h') - ord(square[0])
+
+    def mark_frame_urgency(self, urgency: int) -> None :
+        '''
+        Raises the urgency of the frame being composed (see FRAME_ALERT to FRAME_DECORATIVE).
+        @param urgency: The urgency of what was just composed.
+        '''
+        if self.frame_urgency == None or urgency < self.frame_urgency :
+            self.frame_urgency = urgency
 
-    def reset_led_board(self) -> None : 
+    def reset_led_board(self) -> None :
         '''
         Resets the LED board to the default state.
         '''
         # Set all the LEDs to off
-        self.led_board_colors = np.zeros(64*3, dtype=int)
+        self.led_board_colors = new_frame_colors()
+        self.mark_frame_urgency(FRAME_PLAIN)
+
+    def fill_led_board(self, color:tuple[int,int,int]) -> None :
+        '''
+        Turns on all the LEDs with the same color.
+        @param color: The color of the LEDs.
+        '''
+        self.led_board_colors = new_frame_colors()
+        self.led_board_colors[:] = color
+        self.mark_frame_urgency(FRAME_ALERT)
 
-        # If the serial connection is established, send the LED commands to the Arduino
-        if self.arduino_com != None: 
-            self.arduino_com.send_leds_range_command(0, 63, (0, 0, 0))
-        
-    def wrong_move_led_board(self, last_piece_index:int = -1) -> None : 
+    def wrong_move_led_board(self, last_piece_index:int = -1) -> None :
         '''
         Turns on all the LEDs in red to indicate a wrong move.
         '''
-        # Set all the LEDs to red (only the red channel is on so 1 out of 3)
-        self.reset_led_board()
+        # Set all the LEDs to red
+        self.fill_led_board(RED)
 
-        self.led_board_colors[0::3] = 255
+        if last_piece_index != -1:
+            self.led_board_colors[last_piece_index] = WHITE
 
-        if self.arduino_com != None: 
-            self.arduino_com.send_leds_range_command(0, 63, (255, 0, 0))
+    def show_led_frame(self, led_frame: LedFrame) -> None :
+        '''
+        Displays a frame on the LED board.
+        @param led_frame: The frame to display.
+        '''
+        self.led_board_colors = led_frame.colors.copy()
+        self.mark_frame_urgency(FRAME_DECORATIVE)
 
-            if last_piece_index != -1:
-                self.arduino_com.set_leds_with_colors([last_piece_index], (255, 255, 255))
-    
-    def highlight_move_led_board(self, moves: list[Move], piece_index: int) -> None : 
+    def compose_highlight_frame(self, moves: list[Move], piece_index: int) -> LedFrame :
+        '''
+        Composes the frame highlighting the moves of a piece, without displaying it.
+        @param moves: The moves of the piece.
+        @param piece_index: The index of the square of the piece.
+        @return: The frame.
+        '''
+        led_frame = LedFrame()
+
+        end_squares = np.fromiter((move.end_pos_index for move in moves), dtype=np.intp, count=len(moves))
+        is_capturing = np.fromiter((move.is_capturing for move in moves), dtype=bool, count=len(moves))
+
+        # Set the end squares to red for the captures and to green for the other moves
+        led_frame.colors[end_squares[is_capturing]] = RED
+        led_frame.colors[end_squares[~is_capturing]] = GREEN
+
+        # Set the square of the piece to white
+        led_frame.colors[piece_index] = WHITE
+
+        return led_frame
+
+    def highlight_move_led_board(self, moves: list[Move], piece_index: int, led_frame: LedFrame = None) -> None :
         '''
         Highlights the move on the LED board.
-        @param move: The move to highlight.
+        @param moves: The moves to highlight.
+        @param piece_index: The index of the square of the piece.
+        @param led_frame: The frame of these moves if it was already composed (see compose_highlight_frame).
         '''
-        self.reset_led_board()
+        if led_frame == None :
+            led_frame = self.compose_highlight_frame(moves, piece_index)
+
+        self.show_led_frame(led_frame)
 
-        moves_end_capturing = []
-        moves_end = []
-        
-        for move in moves : 
-            # Get the start and end square of the move
-            start_square = move.start_pos_index
-            end_square = move.end_pos_index
-            # Set the start square to green
-            self.led_board_colors[start_square*3 + 1] = 255
-
-            if move.is_capturing : 
-                # Set the end square to red
-                self.led_board_colors[end_square*3] = 255
-                moves_end_capturing.append(end_square)
-            else :
-                # Set the end square to green
-                self.led_board_colors[end_square*3 + 1] = 255
-                moves_end.append(end_square)
-        
-        if self.arduino_com != None :
-            self.arduino_com.set_leds_with_colors([piece_index], (255, 255, 255))
-            if len(moves_end) > 0:
-                self.arduino_com.set_leds_with_colors(moves_end, (0, 255, 0))
-            if len(moves_end_capturing) > 0:
-                self.arduino_com.set_leds_with_colors(moves_end_capturing, (255, 0, 0))
-    
     def highlight_specific_move(self, move: Move)-> None :
         '''
         Highlights a specific move on the LED board.
@@ -85,83 +152,166 @@ class LedCom:
         '''
         self.reset_led_board()
 
-        # Get the start and end square of the move
-        start_square = move.start_pos_index
+        # Get the end square of the move
         end_square = move.end_pos_index
-        # Set the start square to green
-        self.led_board_colors[start_square*3 + 1] = 255
-        
-        if self.arduino_com != None: 
-            self.arduino_com.set_leds_with_colors([end_square], (0, 255, 0))
 
-
-        if move.is_capturing : 
+        if move.is_capturing :
             # Set the end square to red
-            self.led_board_colors[end_square*3] = 255
-
-            if self.arduino_com != None:
-                self.arduino_com.set_leds_with_colors([end_square], (255, 0, 0))
+            self.led_board_colors[end_square] = RED
         else :
             # Set the end square to blue
-            self.led_board_colors[end_square*3 + 2] = 255
+            self.led_board_colors[end_square] = (0, 0, 255)
+        self.mark_frame_urgency(FRAME_DECORATIVE)
 
-            if self.arduino_com != None: 
-                self.arduino_com.set_leds_with_colors([end_square], (0, 0, 255))
 
-
-    def highlight_square_led_board(self, square: int, color:tuple[int,int,int]=(0,0,255)) -> None : 
+    def highlight_square_led_board(self, square: int, color:tuple[int,int,int]=(0,0,255), urgency: int = FRAME_DECORATIVE) -> None :
         '''
-        Highlights a square on the LED board. 
+        Highlights a square on the LED board.
         @param square: The square to highlight.
+        @param urgency: The urgency of the highlight (FRAME_ALERT for a king in check).
         '''
-        
-        # Set the square to blue
-        self.led_board_colors[square*3 + 2] = 255
-
-        if self.arduino_com != None: 
-            self.arduino_com.set_leds_with_colors([square], color)
+        self.led_board_colors[square] = color
+        self.mark_frame_urgency(urgency)
 
     def highlight_squares_led_board(self, squares: list[int], color:tuple[int,int,int]) -> None :
         '''
         Highlights the squares on the LED board.
         @param squares: The squares to highlight.
         '''
+        self.led_board_colors[np.asarray(squares, dtype=np.intp)] = color
+        self.mark_frame_urgency(FRAME_DECORATIVE)
 
-        if self.arduino_com != None: 
-            self.arduino_com.set_leds_with_colors(squares, color)
-
-    def end_of_game_led_board(self) -> None : 
+    def end_of_game_led_board(self) -> None :
         '''
         Turns on all the LEDs in blue to indicate the end of the game.
         '''
-        # Set all the LEDs to blue (only the blue channel is on so 3 out of 3)
-        self.reset_led_board()
-
-        self.led_board_colors[2::3] = 255
-
-        if self.arduino_com != None: 
-            self.arduino_com.send_leds_range_command(0, 63, (0, 0, 255))
+        self.fill_led_board((0, 0, 255))
 
 
-    def show_AI_move(self, ai_move) -> None :
+    def show_AI_move(self, ai_move: Move) -> None :
         '''
         Display the move the AI wants to play
+        @param ai_move: The move (e.g. built from the engine output with Move.from_uci).
         '''
+        start_square = ai_move.start_pos_index
+        end_square = ai_move.end_pos_index
+        print(f"Ai wants to play {ai_move} ({ai_move.get_uci()})")
 
-        start_square = ai_move[0:2]
-        end_square = ai_move[2:4]
-        print(f"Ai wants to take the piece on {start_square} and put it on the {end_square} square")
-
-        if self.arduino_com != None : 
-            self.arduino_com.set_leds_with_colors([self.square_to_index(start_square), self.square_to_index(end_square)], (255,0,255))
-        
-
-            
-
-
-
-    
+        self.highlight_squares_led_board([start_square, end_square], (255, 0, 255))
 
+    def flush(self) -> None :
+        '''
+        Sends the target frame to the LED board: only the LEDs that differ from what the board shows are sent,
+        grouped into range commands (LEDs next to each other on the strip) and one multi LEDs command per color.
+        The commands are queued with the priority matching the urgency of the frame.
+        '''
+        if self.arduino_com == None :
+            return
+
+        priority = self.get_flush_priority()
+        self.frame_urgency = None
+
+        target_colors = self.led_board_colors.copy()
+        with self.displayed_colors_lock :
+            # Compare with what the board will show once the commands sent are done
+            expected_colors = np.where(self.is_pending[:, None], self.pending_colors, self.displayed_colors)
+            is_expected_known = self.is_pending | self.displayed_colors_known
+            is_changed = np.any(target_colors != expected_colors, axis=1) | ~is_expected_known
+            if not is_changed.any() :
+                return
+            flush_commands = self.get_flush_commands(target_colors, is_changed)
+
+            generations = []
+            for command_type, squares, color, leds_range in flush_commands :
+                self.pending_colors[squares] = target_colors[squares]
+                self.is_pending[squares] = True
+                self.pending_generations[squares] = self.next_generation
+                generations.append(self.next_generation)
+                self.next_generation += 1
+
+        for (command_type, squares, color, leds_range), generation in zip(flush_commands, generations) :
+            if command_type == "frame" :
+                future = self.arduino_com.send_leds_frame_command(target_colors, priority)
+            elif command_type == "range" :
+                future = self.arduino_com.send_leds_range_command(leds_range[0], leds_range[1], color, priority)
+            else :
+                future = self.arduino_com.set_leds_with_colors(squares, color, priority)
+            future.add_done_callback(lambda future, squares=squares, generation=generation : self.update_displayed_colors(future, squares, generation))
 
+    def get_flush_priority(self) -> int :
+        '''
+        Returns the priority of the LED commands of the frame composed since the last flush.
+        '''
+        if self.frame_urgency == FRAME_ALERT :
+            return self.arduino_com.PRIORITY_ALERT
+        if self.frame_urgency == FRAME_DECORATIVE :
+            return self.arduino_com.PRIORITY_HIGHLIGHT
+        return self.arduino_com.PRIORITY_LEDS
 
+    def update_displayed_colors(self, future, squares, generation: int) -> None :
+        '''
+        Records the colors of a command once it is done: shown if acknowledged, unknown if it failed (the next flush sends them again).
+        The LEDs set again by a later command are left to that command.
+        @param future: The future of the command.
+        @param squares: The squares of the command.
+        @param generation: The generation of the command.
+        '''
+        with self.displayed_colors_lock :
+            squares = np.asarray(squares)[self.pending_generations[squares] == generation]
+            if future.result() :
+                self.displayed_colors[squares] = self.pending_colors[squares]
+                self.displayed_colors_known[squares] = True
+            else :
+                self.displayed_colors_known[squares] = False
+            self.is_pending[squares] = False
 
+    def get_flush_commands(self, target_colors: np.ndarray, is_changed: np.ndarray) -> list[tuple[str, np.ndarray, tuple[int,int,int], tuple[int,int]]] :
+        '''
+        Finds the cheapest commands (in bytes on the wire) turning the changed LEDs into the target colors.
+        For each color, the LEDs are either covered by a range command (a run of LEDs next to each other on the strip
+        already having or getting the color) or put in the multi LEDs command of the color.
+        @param target_colors: The target frame as a (64, 3) array.
+        @param is_changed: Whether the LED of each square has to change.
+        @return: The commands as (type, squares, color, (first LED, last LED) of the range) tuples,
+                 the type being "frame", "range" or "multi".
+        '''
+        strip_to_square = self.arduino_com.LED_STRIP_TO_SQUARE
+        # The frame and the changes in the order of the strip
+        strip_colors = target_colors[strip_to_square]
+        strip_is_changed = is_changed[strip_to_square]
+
+        commands = []
+        total_bytes = 0
+        for color in np.unique(strip_colors[strip_is_changed], axis=0) :
+            color = tuple(int(channel) for channel in color)
+
+            # Runs of LEDs of the color along the strip holding changed LEDs, most changed LEDs first
+            is_color = np.all(strip_colors == color, axis=1)
+            edges = np.diff(np.concatenate(([0], is_color.astype(np.int8), [0])))
+            changed_count = np.concatenate(([0], np.cumsum(strip_is_changed & is_color)))
+            runs = []
+            for run_start, run_end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)) :
+                run_changed_count = int(changed_count[run_end] - changed_count[run_start])
+                if run_changed_count > 0 :
+                    runs.append((int(run_start), int(run_end) - 1, run_changed_count))
+            runs.sort(key=lambda run : run[2], reverse=True)
+
+            # Send the biggest runs as ranges and the rest of the LEDs with one multi LEDs command
+            leds_left = np.cumsum([0] + [run[2] for run in runs][::-1])[::-1]
+            command_bytes = [ranges_count * RANGE_COMMAND_BYTES + (MULTI_COMMAND_BASE_BYTES + leds_left[ranges_count] if leds_left[ranges_count] > 0 else 0)
+                             for ranges_count in range(len(runs) + 1)]
+            best_ranges_count = int(np.argmin(command_bytes))
+            total_bytes += command_bytes[best_ranges_count]
+
+            is_in_multi = strip_is_changed & is_color
+            for run_start, run_end, run_changed_count in runs[:best_ranges_count] :
+                commands.append(("range", strip_to_square[run_start:run_end + 1], color, (run_start, run_end)))
+                is_in_multi[run_start:run_end + 1] = False
+            if is_in_multi.any() :
+                commands.append(("multi", strip_to_square[is_in_multi], color, None))
+
+        # Too many changes: every LED in one command is cheaper
+        if total_bytes > FULL_FRAME_COMMAND_BYTES :
+            return [("frame", np.arange(64), None, None)]
+
+        return commands
@@ -1,52 +1,252 @@
+import re
+
+# Short algebraic notation: piece, origin file / rank (disambiguation), capture, destination, promotion
+SAN_PATTERN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQnbrq]))?$")
+CASTLING_SAN: dict[str, str] = {"O-O": "O-O", "0-0": "O-O", "O-O-O": "O-O-O", "0-0-0": "O-O-O"}
+
+# Packed integer encoding of a move (32 bits):
+# bits 0-5 start index, bits 6-11 end index, bits 12-14 promotion piece,
+# bit 15 capture flag, bit 16 en passant flag, bits 17-20 moving piece
+PACKED_PIECE_NAMES: str = "PNBRQKpnbrqk"
+PACKED_PROMOTIONS: str = " NBRQ"
+PACKED_CAPTURE_FLAG: int = 1 << 15
+PACKED_EN_PASSANT_FLAG: int = 1 << 16
+
+
+def pack_move(piece_name: str, start_pos_index: int, end_pos_index: int, promote_to: str = "", is_capturing: bool = False, is_en_passant: bool = False) -> int:
+    '''
+    Packs a move into an integer.
+    @return: The packed move.
+    '''
+    packed_move = start_pos_index | (end_pos_index << 6) | (PACKED_PIECE_NAMES.index(piece_name) << 17)
+    if promote_to != "" :
+        packed_move |= PACKED_PROMOTIONS.index(promote_to.upper()) << 12
+    if is_capturing :
+        packed_move |= PACKED_CAPTURE_FLAG
+    if is_en_passant :
+        packed_move |= PACKED_EN_PASSANT_FLAG
+    return packed_move
+
+
+def packed_start_index(packed_move: int) -> int:
+    '''
+    Returns the start index of a packed move.
+    '''
+    return packed_move & 0x3F
+
+
+def packed_end_index(packed_move: int) -> int:
+    '''
+    Returns the end index of a packed move.
+    '''
+    return (packed_move >> 6) & 0x3F
+
+
+def packed_promote_to(packed_move: int) -> str:
+    '''
+    Returns the promotion piece of a packed move ("" if it is not a promotion).
+    '''
+    return PACKED_PROMOTIONS[(packed_move >> 12) & 0x7].strip()
+
+
+def packed_is_capturing(packed_move: int) -> bool:
+    '''
+    Returns whether a packed move is a capture.
+    '''
+    return packed_move & PACKED_CAPTURE_FLAG != 0
+
+
+def packed_is_en_passant(packed_move: int) -> bool:
+    '''
+    Returns whether a packed move is an en passant capture.
+    '''
+    return packed_move & PACKED_EN_PASSANT_FLAG != 0
+
+
+def packed_piece_name(packed_move: int) -> str:
+    '''
+    Returns the name of the piece moved by a packed move.
+    '''
+    return PACKED_PIECE_NAMES[(packed_move >> 17) & 0xF]
+
+
+def square_name(index: int) -> str:
+    '''
+    Returns the name of a board index (0 is h1, 7 is a1).
+    @param index: The board index.
+    @return: The square name (e.g. "e4").
+    '''
+    return chr(ord('h') - index % 8) + str(index // 8 + 1)
+
+
+def square_index(square: str) -> int:
+    '''
+    Returns the board index of a square name.
+    @param square: The square name (e.g. "e4").
+    @return: The board index.
+    '''
+    return (int(square[1]) - 1) * 8 + ord('h') - ord(square[0])
+
+
+def pack_moves(moves: list['Move']) -> list[int]:
+    '''
+    Packs a list of moves into integers.
+    @param moves: The moves.
+    @return: The packed moves.
+    '''
+    return [move.to_packed() for move in moves]
+
+
+def unpack_moves(packed_moves: list[int]) -> list['Move']:
+    '''
+    Converts packed moves back into Move objects.
+    @param packed_moves: The packed moves.
+    @return: The moves.
+    '''
+    return [Move.from_packed(packed_move) for packed_move in packed_moves]
+
+
 class Move :
-    def __init__(self, piece_name:str, start_pos_index:int, end_pos_index:int, is_capturing:bool=False, is_check:bool=False, is_checkmate:bool=False, is_en_passant:bool=False, is_stalemate:bool=False, promote_to:str="") -> None:
+    # No per instance __dict__, hundreds of moves are created for each position
+    __slots__ = ("piece_name", "start_pos_index", "end_pos_index", "is_capturing", "is_en_passant", "promote_to",
+                 "_is_check", "_is_checkmate", "_is_stalemate", "annotation_origin", "disambiguation", "_notation")
+
+    def __init__(self, piece_name:str, start_pos_index:int, end_pos_index:int, is_capturing:bool=False, is_check:bool=None, is_checkmate:bool=None, is_en_passant:bool=False, is_stalemate:bool=None, promote_to:str="") -> None:
         self.piece_name = piece_name
         self.start_pos_index: int = start_pos_index
         self.end_pos_index: int = end_pos_index
         self.is_capturing: bool = is_capturing
-        self.is_check: bool = is_check
-        self.is_checkmate: bool = is_checkmate
         self.is_en_passant: bool = is_en_passant
-        self.is_stalemate: bool = is_stalemate
         self.promote_to: str  = promote_to
 
+        # The check, checkmate and stalemate flags are None until computed
+        self._is_check: bool = is_check
+        self._is_checkmate: bool = is_checkmate
+        self._is_stalemate: bool = is_stalemate
+        # Snapshot of the position the move was generated from, used to compute the flags on first access
+        self.annotation_origin = None
+
+        # Origin file and/or rank added to the notation when another piece of the same type can go to the same square
+        self.disambiguation: str = ""
+        # Algebraic notation, computed once
+        self._notation: str = None
+
+    def to_packed(self) -> int:
+        '''
+        Returns the move packed into an integer (the check, checkmate and stalemate flags are not kept).
+        '''
+        return pack_move(self.piece_name, self.start_pos_index, self.end_pos_index, self.promote_to, self.is_capturing, self.is_en_passant)
+
+    @staticmethod
+    def from_packed(packed_move: int) -> 'Move':
+        '''
+        Builds a move from its packed integer.
+        @param packed_move: The packed move.
+        @return: The move.
+        '''
+        return Move(packed_piece_name(packed_move), packed_start_index(packed_move), packed_end_index(packed_move),
+                    is_capturing=packed_is_capturing(packed_move),
+                    is_en_passant=packed_is_en_passant(packed_move),
+                    promote_to=packed_promote_to(packed_move))
+
+    def set_annotation_origin(self, board) -> None:
+        '''
+        Marks the flags of the move as unknown, they will be computed from the board on first access.
+        @param board: The board of the position the move is played from (it must not change afterwards).
+        '''
+        self.annotation_origin = board
+        self._is_check = None
+        self._is_checkmate = None
+        self._is_stalemate = None
+
+    def is_annotated(self) -> bool:
+        '''
+        Returns whether the check, checkmate and stalemate flags are known.
+        '''
+        return self._is_check is not None and self._is_checkmate is not None and self._is_stalemate is not None
+
+    def annotate(self) -> None:
+        '''
+        Computes the check, checkmate and stalemate flags if they are not known yet.
+        '''
+        if not self.is_annotated() and self.annotation_origin is not None :
+            self.annotation_origin.annotate_move(self)
+
+    @property
+    def is_check(self) -> bool:
+        self.annotate()
+        return bool(self._is_check)
+
+    @is_check.setter
+    def is_check(self, value: bool) -> None:
+        self._is_check = value
+        self._notation = None
+
+    @property
+    def is_checkmate(self) -> bool:
+        self.annotate()
+        return bool(self._is_checkmate)
+
+    @is_checkmate.setter
+    def is_checkmate(self, value: bool) -> None:
+        self._is_checkmate = value
+        self._notation = None
+
+    @property
+    def is_stalemate(self) -> bool:
+        self.annotate()
+        return bool(self._is_stalemate)
+
+    @is_stalemate.setter
+    def is_stalemate(self, value: bool) -> None:
+        self._is_stalemate = value
+        self._notation = None
+
+    def is_castling(self) -> bool:
+        '''
+        Returns whether the move is a castling move (the king moving two squares).
+        '''
+        return self.piece_name in "Kk" and abs(self.end_pos_index - self.start_pos_index) == 2
+
+    def get_uci(self) -> str:
+        '''
+        Returns the UCI notation of the move. i.e. "e2e4", "e1g1", "a7a8q", etc.
+        @return: str
+        '''
+        return square_name(self.start_pos_index) + square_name(self.end_pos_index) + self.promote_to.lower()
+
     def get_algebraic_notation(self) -> str:
         '''
-        Returns the algebraic notation of the move. i.e. "e4", "Nf3", "Qxd5", "O-O", "O-O-O", etc.
+        Returns the algebraic notation of the move. i.e. "e4", "Nf3", "Qxd5", "exd6", "Nbd2", "O-O", "O-O-O", etc.
+        The notation is computed once then cached.
         @return: str
         '''
+        if self._notation is not None :
+            return self._notation
+
         algebraic_notation: str = ""
         piece_name_uppercase: str = self.piece_name.upper()
 
-        # If the move is a castling move
-        if piece_name_uppercase == "K" and abs(self.end_pos_index - self.start_pos_index) == 2 :
-            if self.end_pos_index - self.start_pos_index <= 0 :
-                if 'k' in self.piece_name :
-                    algebraic_notation = "o-o"
-                else :
-                    algebraic_notation = "O-O"
-            else :  
-                if 'k' in self.piece_name :
-                    algebraic_notation = "o-o-o"
-                else :
-                    algebraic_notation = "O-O-O"
-            
-            return algebraic_notation
-            
-
-        # If the piece is a pawn, we don't need to specify it in the algebraic notation
-        if piece_name_uppercase != "P" :
-            algebraic_notation += piece_name_uppercase
-
-        # Add an "x" if the move is a capture
-        if self.is_capturing :
-            algebraic_notation += "x"
-
-        algebraic_notation += chr(ord('h') - self.end_pos_index % 8)
-        algebraic_notation += str(self.end_pos_index // 8 + 1)
-
-        if self.promote_to != "" :
-            algebraic_notation += f"={self.promote_to}"
+        # If the move is a castling move (index 0 is h1 so kingside goes towards the lower indexes)
+        if self.is_castling() :
+            algebraic_notation = "O-O" if self.end_pos_index < self.start_pos_index else "O-O-O"
+        else :
+            is_capturing = self.is_capturing or self.is_en_passant
+
+            # If the piece is a pawn, we don't need to specify it in the algebraic notation (except its file on captures)
+            if piece_name_uppercase != "P" :
+                algebraic_notation += piece_name_uppercase + self.disambiguation
+            elif is_capturing :
+                algebraic_notation += square_name(self.start_pos_index)[0]
+
+            # Add an "x" if the move is a capture
+            if is_capturing :
+                algebraic_notation += "x"
+
+            algebraic_notation += square_name(self.end_pos_index)
+
+            if self.promote_to != "" :
+                algebraic_notation += f"={self.promote_to.upper()}"
 
         # Add a "+" if the move is a check or a "#" if the move is a checkmate
         if self.is_checkmate :
@@ -56,7 +256,82 @@ class Move :
         elif self.is_stalemate :
             algebraic_notation += "$"
 
+        self._notation = algebraic_notation
         return algebraic_notation
+
+    @staticmethod
+    def from_uci(board, uci: str, legal_moves: list['Move'] = None) -> 'Move':
+        '''
+        Returns the legal move corresponding to a UCI string (e.g. a best move from Stockfish).
+        @param board: The board of the position.
+        @param uci: The move in UCI notation (e.g. "e2e4", "a7a8q").
+        @param legal_moves: The legal moves of the position (generated from the board if not given,
+                            their check and mate flags are then computed on first access).
+        @return: The move, None if the string is not a legal move.
+        '''
+        if uci == None or len(uci) not in (4, 5) or uci[0] not in "abcdefgh" or uci[2] not in "abcdefgh" or uci[1] not in "12345678" or uci[3] not in "12345678" :
+            return None
+        start_pos_index = square_index(uci[0:2])
+        end_pos_index = square_index(uci[2:4])
+        promote_to = uci[4:].upper()
+
+        if legal_moves == None :
+            legal_moves = board.get_all_moves_in_position()
+        for move in legal_moves :
+            if move.start_pos_index == start_pos_index and move.end_pos_index == end_pos_index and move.promote_to.upper() == promote_to :
+                return move
+        return None
+
+    @staticmethod
+    def from_san(board, san: str, legal_moves: list['Move'] = None) -> 'Move':
+        '''
+        Returns the legal move corresponding to a string in short algebraic notation.
+        @param board: The board of the position.
+        @param san: The move in algebraic notation (e.g. "Nf3", "exd5", "Rad1", "e8=Q+", "O-O").
+        @param legal_moves: The legal moves of the position (generated from the board if not given,
+                            their check and mate flags are then computed on first access).
+        @return: The move, None if the string is not a legal move or if several legal moves match it (e.g. "Nd2" with knights on b1 and f3).
+        '''
+        if san == None :
+            return None
+        san = san.strip().rstrip("+#$!?")
+        if legal_moves == None :
+            legal_moves = board.get_all_moves_in_position()
+
+        castling = CASTLING_SAN.get(san.upper())
+        if castling != None :
+            for move in legal_moves :
+                if move.is_castling() and (move.end_pos_index < move.start_pos_index) == (castling == "O-O") :
+                    return move
+            return None
+
+        match = SAN_PATTERN.match(san)
+        if match == None :
+            return None
+        piece_type, from_file, from_rank, destination, promote_to = match.groups()
+        piece_type = piece_type or "P"
+        end_pos_index = square_index(destination)
+        promote_to = (promote_to or "").upper()
+
+        # A pawn capture always gives the file of the pawn, so a pawn move without it is a push
+        if piece_type == "P" and from_file == None :
+            from_file = destination[0]
+
+        matching_moves = []
+        for move in legal_moves :
+            if move.end_pos_index != end_pos_index or move.piece_name.upper() != piece_type or move.promote_to.upper() != promote_to :
+                continue
+            start_square = square_name(move.start_pos_index)
+            if from_file != None and start_square[0] != from_file :
+                continue
+            if from_rank != None and start_square[1] != from_rank :
+                continue
+            matching_moves.append(move)
+
+        # An ambiguous notation is not guessed
+        if len(matching_moves) != 1 :
+            return None
+        return matching_moves[0]
     
     def __str__(self) -> str:
         return self.get_algebraic_notation()
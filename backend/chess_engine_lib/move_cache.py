@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+from chess_engine_lib.move import Move, pack_moves
+
+
+class CachedPosition :
+    '''
+    Legal moves and terminal status of a position stored in the MoveCache.
+    The moves are kept packed into integers: they are compact and not tracked by the garbage collector.
+    '''
+    def __init__(self, packed_moves: list[int], terminal_status: str) -> None:
+        self.packed_moves: list[int] = packed_moves
+        self.terminal_status: str = terminal_status
+
+
+class MoveCache :
+    '''
+    Bounded LRU cache mapping the Zobrist hash of a position to its legal moves.
+    Positions come back often on the board (moves taken back, game reset to the last valid board,
+    same setup positions from one game to another) so their moves do not need to be generated again.
+    '''
+    def __init__(self, max_size: int = 256) -> None:
+        self.max_size: int = max_size
+        self.entries: OrderedDict[int, CachedPosition] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, zobrist_key: int) -> CachedPosition:
+        '''
+        Returns the cached position for a hash and marks it as the most recently used.
+        @param zobrist_key: The Zobrist hash of the position.
+        @return: The cached position, None if the position is not in the cache.
+        '''
+        cached_position = self.entries.get(zobrist_key)
+        if cached_position == None :
+            self.misses += 1
+            return None
+        self.entries.move_to_end(zobrist_key)
+        self.hits += 1
+        return cached_position
+
+    def put(self, zobrist_key: int, moves: list[Move], terminal_status: str) -> None:
+        '''
+        Stores the legal moves of a position, evicting the least recently used one if the cache is full.
+        @param zobrist_key: The Zobrist hash of the position.
+        @param moves: The legal moves of the position.
+        @param terminal_status: The terminal status of the position ("checkmate", "stalemate" or "").
+        '''
+        if self.max_size <= 0 :
+            return
+        self.entries[zobrist_key] = CachedPosition(pack_moves(moves), terminal_status)
+        self.entries.move_to_end(zobrist_key)
+        while len(self.entries) > self.max_size :
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        '''
+        Removes every position from the cache (the counters are kept).
+        '''
+        self.entries.clear()
+
+    def get_stats(self) -> dict:
+        '''
+        Returns the cache counters.
+        '''
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
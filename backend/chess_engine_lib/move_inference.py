@@ -0,0 +1,127 @@
+from chess_engine_lib.board import Board
+from chess_engine_lib.move import Move
+import numpy as np
+
+
+def binary_board_to_occupancy(binary_board) -> int:
+    '''
+    Converts a binary board (64 values, 1 a piece is there, 0 a piece is not there) into an occupancy bitmask.
+    @param binary_board: The binary board, or an occupancy bitmask (returned as is).
+    @return: The occupancy bitmask (bit i is set if square i has a piece, 0 being h1).
+    '''
+    if isinstance(binary_board, int) :
+        return binary_board
+    packed_board = np.packbits(np.asarray(binary_board, dtype=np.uint8), bitorder="little")
+    return int.from_bytes(packed_board.tobytes(), "little")
+
+
+def occupancy_to_indexes(occupancy: int) -> list[int]:
+    '''
+    Returns the indexes of the squares set in an occupancy bitmask.
+    '''
+    indexes = []
+    while occupancy :
+        square_bit = occupancy & -occupancy
+        occupancy ^= square_bit
+        indexes.append(square_bit.bit_length() - 1)
+    return indexes
+
+
+def get_move_squares(board: Board, move: Move) -> tuple[int, int]:
+    '''
+    Returns how a move changes the occupancy of the board.
+    @param board: The board of the position the move is played from.
+    @param move: The move.
+    @return: The squares emptied or filled once the move is done, and every square a piece is picked up from
+             or put down on while playing it (a capture picks up the captured piece then puts the capturing one on its square).
+    '''
+    start_bit = 1 << move.start_pos_index
+    end_bit = 1 << move.end_pos_index
+
+    if move.is_castling() :
+        rook_start_index, rook_end_index = board.get_castling_rook_squares(move)
+        delta = start_bit | end_bit | 1 << rook_start_index | 1 << rook_end_index
+        return delta, delta
+
+    if move.is_en_passant :
+        captured_index = move.end_pos_index - 8 if move.piece_name == "P" else move.end_pos_index + 8
+        delta = start_bit | end_bit | 1 << captured_index
+        return delta, delta
+
+    if move.is_capturing :
+        return start_bit, start_bit | end_bit
+
+    return start_bit | end_bit, start_bit | end_bit
+
+
+class MoveInference :
+    '''
+    Infers the move played from the occupancy of the board.
+    The occupancy sensed is compared to the one of the last stable position (where the last move ended),
+    the difference is matched against the occupancy change of every legal move, so the pieces can be
+    picked up and put down in any order (both pieces of a capture lifted, the rook of a castling before the king is down...).
+    '''
+    def __init__(self, occupancy: int = 0) -> None:
+        self.stable_occupancy: int = occupancy
+        # Every square that changed at some point since the stable position (a captured piece is lifted then replaced)
+        self.touched_squares: int = 0
+
+        # Occupancy changes of the legal moves of the stable position: (move, delta, squares),
+        # built for one position and one list of legal moves
+        self.position_key: int = None
+        self.position_moves: list[Move] = None
+        self.move_squares: list[tuple[Move, int, int]] = []
+
+    def reset(self, occupancy: int) -> None:
+        '''
+        Sets the stable position, once a move is done or the game is reset.
+        @param occupancy: The occupancy of the board in that position.
+        '''
+        self.stable_occupancy = occupancy
+        self.touched_squares = 0
+        self.position_key = None
+        self.position_moves = None
+        self.move_squares = []
+
+    def update(self, occupancy: int) -> int:
+        '''
+        Records a new occupancy sensed.
+        @return: The squares that changed since the stable position.
+        '''
+        delta = self.stable_occupancy ^ occupancy
+        if delta == 0 :
+            # Everything is back in place, the squares touched meanwhile mean nothing anymore
+            self.touched_squares = 0
+        self.touched_squares |= delta
+        return delta
+
+    def match_moves(self, board: Board, legal_moves: list[Move], occupancy: int) -> tuple[list[Move], list[Move]]:
+        '''
+        Matches the occupancy sensed against the legal moves of the stable position.
+        @param board: The board of the stable position.
+        @param legal_moves: The legal moves of the position.
+        @param occupancy: The occupancy sensed.
+        @return: The moves done (several only for the promotions of a pawn) and the moves under way.
+        '''
+        if self.position_key != board.zobrist_key or self.position_moves is not legal_moves :
+            self.position_key = board.zobrist_key
+            self.position_moves = legal_moves
+            self.move_squares = [(move, *get_move_squares(board, move)) for move in legal_moves]
+
+        delta = self.stable_occupancy ^ occupancy
+        moves_done = []
+        moves_under_way = []
+        for move, move_delta, move_squares in self.move_squares :
+            if delta == move_delta and self.touched_squares & move_squares == move_squares :
+                moves_done.append(move)
+            elif delta & ~move_squares == 0 :
+                moves_under_way.append(move)
+
+        return moves_done, moves_under_way
+
+    def get_missing_squares(self, board: Board, move: Move, occupancy: int) -> int:
+        '''
+        Returns the squares that still have to change for a move under way to be done.
+        '''
+        move_delta, move_squares = get_move_squares(board, move)
+        return (move_delta ^ self.stable_occupancy ^ occupancy) | (move_squares & ~self.touched_squares)
@@ -0,0 +1,101 @@
+import mmap
+import os
+import random
+import struct
+
+from chess_engine_lib.board import Board
+from chess_engine_lib.move import Move, square_index
+
+# Entries of a Polyglot book: key (8 bytes), move (2 bytes), weight (2 bytes), learn (4 bytes), big endian, sorted by key
+POLYGLOT_ENTRY = struct.Struct(">QHHI")
+POLYGLOT_PROMOTIONS: str = " nbrq"
+
+# Polyglot writes castling as the king taking its own rook
+POLYGLOT_CASTLING_MOVES: dict[str, str] = {"e1h1": "e1g1", "e1a1": "e1c1", "e8h8": "e8g8", "e8a8": "e8c8"}
+
+
+class PolyglotBook :
+    '''
+    Opening book in the Polyglot .bin format, memory-mapped and looked up by the Zobrist hash of the board
+    (the keys of chess_engine_lib.zobrist are the Polyglot ones).
+    '''
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.book_file = open(path, "rb")
+        # An empty file cannot be mapped
+        self.book_map = mmap.mmap(self.book_file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) > 0 else b""
+        self.entries_count: int = len(self.book_map) // POLYGLOT_ENTRY.size
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get_entries(self, zobrist_key: int) -> list[tuple[int, int]]:
+        '''
+        Returns the book entries of a position (binary search on the sorted keys).
+        @param zobrist_key: The Zobrist hash of the position.
+        @return: The (raw move, weight) of each entry.
+        '''
+        low, high = 0, self.entries_count
+        while low < high :
+            middle = (low + high) // 2
+            if POLYGLOT_ENTRY.unpack_from(self.book_map, middle * POLYGLOT_ENTRY.size)[0] < zobrist_key :
+                low = middle + 1
+            else :
+                high = middle
+
+        entries = []
+        for i in range(low, self.entries_count) :
+            key, raw_move, weight, _ = POLYGLOT_ENTRY.unpack_from(self.book_map, i * POLYGLOT_ENTRY.size)
+            if key != zobrist_key :
+                break
+            entries.append((raw_move, weight))
+        return entries
+
+    def get_move(self, board: Board, legal_moves: list[Move] = None) -> Move:
+        '''
+        Returns a book move of the position, chosen at random according to the weights of the book.
+        @param board: The board of the position.
+        @param legal_moves: The legal moves of the position (generated from the board if not given).
+        @return: The move, None if the position is not in the book.
+        '''
+        book_moves = []
+        weights = []
+        for raw_move, weight in self.get_entries(board.zobrist_key) :
+            move = Move.from_uci(board, self.raw_move_to_uci(board, raw_move), legal_moves)
+            if move != None and weight > 0 :
+                book_moves.append(move)
+                weights.append(weight)
+
+        if len(book_moves) == 0 :
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choices(book_moves, weights)[0]
+
+    def raw_move_to_uci(self, board: Board, raw_move: int) -> str:
+        '''
+        Converts a move of the book into UCI notation.
+        @param board: The board of the position.
+        @param raw_move: The move: to file (bits 0-2), to row (3-5), from file (6-8), from row (9-11), promotion (12-14).
+        '''
+        to_square = "abcdefgh"[raw_move & 7] + str((raw_move >> 3 & 7) + 1)
+        from_square = "abcdefgh"[raw_move >> 6 & 7] + str((raw_move >> 9 & 7) + 1)
+        uci = from_square + to_square
+        if uci in POLYGLOT_CASTLING_MOVES :
+            moved_piece = board.board_list[square_index(from_square)]
+            if moved_piece != None and moved_piece.name in "Kk" :
+                uci = POLYGLOT_CASTLING_MOVES[uci]
+        return uci + POLYGLOT_PROMOTIONS[raw_move >> 12 & 7].strip()
+
+    def get_stats(self) -> dict:
+        return {
+            "path": self.path,
+            "entries": self.entries_count,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        if isinstance(self.book_map, mmap.mmap) :
+            self.book_map.close()
+        self.book_file.close()
@@ -0,0 +1,193 @@
+'''
+Perft (performance test) of the move generator.
+
+Counts the leaf nodes of the legal move tree up to a given depth and compares them with the
+reference counts of well known positions. Used as a regression gate for the move generator
+and as a throughput benchmark.
+
+Usage (from the backend folder):
+    python -m chess_engine_lib.perft                      # reference suite up to depth 3
+    python -m chess_engine_lib.perft --depth 4            # deeper (slower) run
+    python -m chess_engine_lib.perft --divide "<fen>" 3   # node count per root move
+'''
+import argparse
+import sys
+import time
+
+from chess_engine_lib.board import Board
+from chess_engine_lib.move import Move
+
+
+# Reference positions and their known node counts per depth
+PERFT_POSITIONS: list[dict] = [
+    {
+        "name": "Initial position",
+        "fen": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "nodes": {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609},
+    },
+    {
+        "name": "Kiwipete",
+        "fen": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "nodes": {1: 48, 2: 2039, 3: 97862, 4: 4085603},
+    },
+    {
+        "name": "Position 3 (en passant and pins on the rank)",
+        "fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "nodes": {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624},
+    },
+    {
+        "name": "Position 4 (promotions and castling)",
+        "fen": "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        "nodes": {1: 6, 2: 264, 3: 9467, 4: 422333},
+    },
+    {
+        "name": "Position 4 mirrored",
+        "fen": "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+        "nodes": {1: 6, 2: 264, 3: 9467, 4: 422333},
+    },
+    {
+        "name": "Position 5",
+        "fen": "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        "nodes": {1: 44, 2: 1486, 3: 62379, 4: 2103487},
+    },
+    {
+        "name": "Position 6",
+        "fen": "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        "nodes": {1: 46, 2: 2079, 3: 89890, 4: 3894594},
+    },
+    {
+        "name": "En passant capture out of check",
+        "fen": "8/8/8/2k5/2pP4/8/B7/4K3 b - d3 0 3",
+        "nodes": {1: 8},
+    },
+    {
+        "name": "En passant exposing the king",
+        "fen": "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+        "nodes": {6: 1134888},
+    },
+    {
+        "name": "Promotion out of check",
+        "fen": "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+        "nodes": {6: 92683},
+    },
+    {
+        "name": "Promotion to give stalemate",
+        "fen": "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+        "nodes": {6: 2217},
+    },
+    {
+        "name": "Castling through check",
+        "fen": "r6r/1b2k1bq/8/8/7B/8/8/R3K2R b KQ - 3 2",
+        "nodes": {1: 8},
+    },
+    {
+        "name": "Discovered check by knight",
+        "fen": "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+        "nodes": {4: 23527},
+    },
+]
+
+
+def move_to_coordinates(board: Board, move: Move) -> str:
+    '''
+    Returns the move in coordinate notation (e.g. "e2e4", "a7a8q").
+    @param board: The board (used for the square names).
+    @param move: The move.
+    @return: The coordinate notation of the move.
+    '''
+    return board.index_to_square(move.start_pos_index) + board.index_to_square(move.end_pos_index) + move.promote_to.lower()
+
+
+def perft(board: Board, depth: int) -> int:
+    '''
+    Counts the leaf nodes of the legal move tree.
+    @param board: The board (restored to its initial position at the end).
+    @param depth: The depth of the tree.
+    @return: The number of leaf nodes.
+    '''
+    if depth <= 0 :
+        return 1
+
+    moves = board.generate_legal_moves()
+    # Bulk counting: the moves of the last ply do not need to be executed
+    if depth == 1 :
+        return len(moves)
+
+    nodes = 0
+    for move in moves :
+        undo_record = board.execute_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move(undo_record)
+    return nodes
+
+
+def perft_divide(board: Board, depth: int) -> dict[str, int]:
+    '''
+    Counts the leaf nodes under each root move.
+    @param board: The board (restored to its initial position at the end).
+    @param depth: The depth of the tree (root move included).
+    @return: A dict mapping the coordinate notation of each root move to its node count.
+    '''
+    nodes_per_move: dict[str, int] = {}
+    for move in board.generate_legal_moves() :
+        undo_record = board.execute_move(move)
+        nodes_per_move[move_to_coordinates(board, move)] = perft(board, depth - 1)
+        board.unmake_move(undo_record)
+    return nodes_per_move
+
+
+def run_perft_suite(max_depth: int = 3, positions: list[dict] = PERFT_POSITIONS) -> bool:
+    '''
+    Runs perft on the reference positions and prints the results.
+    @param max_depth: The deepest depth to run (deeper reference counts are skipped).
+    @param positions: The reference positions.
+    @return: Whether every count matched the reference.
+    '''
+    all_passed = True
+    board = Board()
+    for position in positions :
+        depths = [depth for depth in sorted(position["nodes"]) if depth <= max_depth]
+        if len(depths) == 0 :
+            continue
+
+        print(f"{position['name']} -- {position['fen']}")
+        board.set_board_fen(position["fen"])
+        for depth in depths :
+            time_start = time.perf_counter()
+            nodes = perft(board, depth)
+            time_taken = time.perf_counter() - time_start
+
+            expected_nodes = position["nodes"][depth]
+            passed = nodes == expected_nodes
+            all_passed = all_passed and passed
+
+            nodes_per_second = nodes / time_taken if time_taken > 0 else float("inf")
+            result = "OK" if passed else f"FAIL (expected {expected_nodes})"
+            print(f"    depth {depth}: {nodes:>10} nodes  {time_taken:8.3f} s  {nodes_per_second:>10.0f} nps  {result}")
+
+    print("All perft counts match." if all_passed else "Some perft counts do NOT match.")
+    return all_passed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Perft test and benchmark of the move generator.")
+    parser.add_argument("--depth", type=int, default=3, help="deepest depth of the reference suite")
+    parser.add_argument("--divide", nargs=2, metavar=("FEN", "DEPTH"), help="print the node count of each root move")
+    arguments = parser.parse_args()
+
+    if arguments.divide != None :
+        board = Board()
+        board.set_board_fen(arguments.divide[0])
+        time_start = time.perf_counter()
+        nodes_per_move = perft_divide(board, int(arguments.divide[1]))
+        time_taken = time.perf_counter() - time_start
+        for move_name, nodes in sorted(nodes_per_move.items()) :
+            print(f"{move_name}: {nodes}")
+        print(f"\nMoves: {len(nodes_per_move)}  Nodes: {sum(nodes_per_move.values())}  Time: {time_taken:.3f} s")
+        return 0
+
+    return 0 if run_perft_suite(arguments.depth) else 1
+
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -1,34 +1,29 @@
 from chess_engine_lib.move import Move
+from chess_engine_lib.attack_tables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, bishop_attacks, rook_attacks, queen_attacks
 import numpy as np
 
 
 def generate_piece_from_name(name:str) :
-    generated_piece = None 
-
-    color_of_piece = "w" if name.isupper() else "b"
-
-    if name == "Q" or name =="q" :
-        generated_piece = Queen(color=color_of_piece)
-    elif name == "K" or name == "k" :
-        generated_piece = King(color=color_of_piece)
-    elif name == "B" or name == "b" :
-        generated_piece = Bishop(color=color_of_piece)
-    elif name == "K" or name == "k" :
-        generated_piece = Knight(color=color_of_piece)
-    elif name == "R" or name == "r" :
-        generated_piece = Rook(color=color_of_piece)
-    elif name == "N" or name == "n" :
-        generated_piece = Knight(color=color_of_piece)
-    elif name == "P" or name == "p" :
-        generated_piece = Pawn(color=color_of_piece)
-    
-    return generated_piece
+    '''
+    Returns the shared piece of a name (e.g. "Q" for the white queen).
+    @param name: The name of the piece.
+    @return: The piece, None if the name is unknown.
+    '''
+    return PIECES.get(name)
 
 class Piece :
-    def __init__(self) -> None:
-        self.position: int = -1
-        self.color: str = "w"
-        self.name: str = "piece"
+    '''
+    Pieces hold no state about where they are, so one instance per type and color is shared by
+    every board (see PIECES). They cannot be modified once created.
+    '''
+    __slots__ = ("color", "name")
+
+    def __init__(self, color: str = "w", name: str = "piece") -> None:
+        object.__setattr__(self, "color", color)
+        object.__setattr__(self, "name", name)
+
+    def __setattr__(self, attribute_name: str, value) -> None:
+        raise AttributeError(f"Pieces are shared between boards, '{attribute_name}' cannot be modified")
 
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
@@ -38,12 +33,21 @@ class Piece :
         '''
         return []
     
-    def move(self, new_position: list[int, int]) -> None:
+    def targets_to_moves(self, chess_board, position, targets: int) -> list[Move]:
         '''
-        Moves the piece to a new position.
-        @param new_position: The new position of the piece.
+        Converts a bitboard of target squares into moves, flagging the captures.
+        @param chess_board: The board.
+        @param position: The index of the piece.
+        @param targets: The bitboard of the squares the piece can go to.
+        @return: The list of moves.
         '''
-        self.position = new_position
+        moves_list: list[Move] = []
+        ennemy_occupancy = chess_board.occupancy["b" if self.color == "w" else "w"]
+        while targets :
+            target_bit = targets & -targets
+            moves_list.append(Move(self.name, position, target_bit.bit_length() - 1, is_capturing=(target_bit & ennemy_occupancy) != 0))
+            targets ^= target_bit
+        return moves_list
 
     def __repr__(self) -> str:
         return self.name
@@ -64,12 +68,13 @@ class Unknown(Piece) :
 
     /!\ CURRENTLY : To prevent any misjudgement I added a check 
     '''
+    __slots__ = ("possible_names",)
+
     def __init__(self, color:str) -> None : 
-        super().__init__()
-        self.color: str = color
+        super().__init__(color, "?")
 
         # List of the different pieces it could be
-        self.possible_names = ["q", "k", "b", "r"]
+        object.__setattr__(self, "possible_names", ["q", "k", "b", "r"])
     
     def possible_moves(self, chess_board, position) -> list[Move] :
         '''
@@ -81,14 +86,11 @@ class Unknown(Piece) :
         
 
 class Pawn(Piece):
-    def __init__(self, color:str) -> None:
-        super().__init__()
-        self.color: str = color
-        if color == "w":
-            self.name: str = "P"
-        else:
-            self.name: str = "p"
+    __slots__ = ()
 
+    def __init__(self, color:str) -> None:
+        super().__init__(color, "P" if color == "w" else "p")
+    
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
         The pawn can move one square forward at a time, except for the first move, where it can move two squares forward.
@@ -98,225 +100,133 @@ class Pawn(Piece):
 
         moves_list: list[Move] = []
         dir_val = 1 if self.color == "w" else -1
+        occupied = chess_board.occupancy["w"] | chess_board.occupancy["b"]
+        ennemy_occupancy = chess_board.occupancy["b" if self.color == "w" else "w"]
+        promotion_row = 7 if self.color == "w" else 0
         
         # Capture moves
-        pos_target_1 = position + (8 * dir_val - 1)
-        pos_target_2 = position + (8 * dir_val + 1)
+        targets = PAWN_ATTACKS[self.color][position] & ennemy_occupancy
 
-        if pos_target_1 < 64 and pos_target_1 >= 0 and chess_board.board_list[pos_target_1] != None and chess_board.board_list[pos_target_1].color != self.color :
-            moves_list.append(Move(self.name, position, position + (8 * dir_val - 1), is_capturing=True))
-        
-        if pos_target_2 < 64 and pos_target_2 >= 0 and chess_board.board_list[pos_target_2] != None and chess_board.board_list[pos_target_2].color != self.color :
-            moves_list.append(Move(self.name, position, position + (8 * dir_val + 1), is_capturing=True))
-        
         # Forward moves
         forward_1_pos = position + (8 * dir_val)
-        if forward_1_pos < 64 and forward_1_pos >= 0 and chess_board.board_list[forward_1_pos] == None:
+        if not occupied & (1 << forward_1_pos) :
+            targets |= 1 << forward_1_pos
 
             # If the pawn is at the starting position, it can move two squares forward
             if (position // 8 == 1 and self.color == "w") or (position // 8 == 6 and self.color == "b") :
-                if chess_board.board_list[position + 16 * dir_val] == None :
-                    moves_list.append(Move(self.name, position, position + (16 * dir_val)))
+                if not occupied & (1 << (position + 16 * dir_val)) :
+                    targets |= 1 << (position + 16 * dir_val)
 
-            if (forward_1_pos >= 0 and forward_1_pos <= 7) or (forward_1_pos >= 56 and forward_1_pos <= 63) : 
+        for move in self.targets_to_moves(chess_board, position, targets) :
+            if move.end_pos_index // 8 == promotion_row :
                 # Promotion for every piece possible to promote to
-                pieces_promotion = ["Q", "R", "N", "B"]
-                for i in range(0, len(pieces_promotion)) :
-                    moves_list.append(Move(self.name, position, position + (8 * dir_val), promote_to=pieces_promotion[i]))
-
-            else : 
-                #Basic pawn move forward one square
-                moves_list.append(Move(self.name, position, position + (8 * dir_val)))
+                for piece_promotion in ["Q", "R", "N", "B"] :
+                    moves_list.append(Move(self.name, position, move.end_pos_index, is_capturing=move.is_capturing, promote_to=piece_promotion))
+            else :
+                moves_list.append(move)
         
         # En passant
         if chess_board.en_passant_square != '-' :
             index_en_passant = chess_board.square_to_index(chess_board.en_passant_square)
-            if index_en_passant == position + (8 * dir_val - 1) or index_en_passant == position + (8 * dir_val + 1) :
-                moves_list.append(Move(self.name, position, index_en_passant, is_en_passant=True))
+            if PAWN_ATTACKS[self.color][position] & (1 << index_en_passant) :
+                moves_list.append(Move(self.name, position, index_en_passant, is_capturing=True, is_en_passant=True))
         
         return moves_list
 
+
 class Knight(Piece):
+    __slots__ = ()
+
     def __init__(self, color:str) -> None:
-        super().__init__()
-        if color == "w":
-            self.name: str = "N"
-        else:
-            self.name: str = "n"
-        self.color: str = color
+        super().__init__(color, "N" if color == "w" else "n")
     
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
         The knight can move in an L shape.
         '''
-        moves_list: list[Move] = []
+        targets = KNIGHT_ATTACKS[position] & ~chess_board.occupancy[self.color]
+        return self.targets_to_moves(chess_board, position, targets)
 
-        # Possible moves for the knight 
-        possible_moves = [[1,2], [2,1], [-1,2], [-2,1], [1,-2], [2,-1], [-1,-2], [-2,-1]]
-        for move in possible_moves :
-            current_position_x = position % 8 + move[0]
-            current_position_y = position // 8 + move[1]
-            if current_position_x >= 0 and current_position_x < 8 and current_position_y >= 0 and current_position_y < 8 :
-                target_position = current_position_y * 8 + current_position_x
-                if chess_board.board_list[target_position] == None :
-                    moves_list.append(Move(self.name, position, target_position))
-                else :
-                    if chess_board.board_list[target_position].color != self.color :
-                        moves_list.append(Move(self.name, position, target_position, is_capturing=True))
-    
-        return moves_list
 
 class Bishop(Piece):
+    __slots__ = ()
+
     def __init__(self, color:str) -> None:
-        super().__init__()
-        self.color: str = color
-        if color == "w":
-            self.name: str = "B"
-        else:
-            self.name: str = "b"
+        super().__init__(color, "B" if color == "w" else "b")
     
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
         The bishop can move diagonally.
         '''
-        moves_list: list[Move] = []
+        targets = bishop_attacks(position, chess_board.occupancy["w"] | chess_board.occupancy["b"]) & ~chess_board.occupancy[self.color]
+        return self.targets_to_moves(chess_board, position, targets)
 
-        directions_to_check = [[1,1], [1,-1], [-1, -1], [-1, 1]] 
-        for direction in directions_to_check :
-            
-            current_position_x = position % 8 + direction[0]
-            current_position_y = position // 8 + direction[1]
-            
-            while current_position_x >= 0 and current_position_x < 8 and current_position_y >= 0 and current_position_y < 8 :
-                target_position = current_position_y * 8 + current_position_x
-                if chess_board.board_list[target_position] == None :
-                    moves_list.append(Move(self.name, position, target_position))
-                else :
-                    if chess_board.board_list[target_position].color != self.color :
-                        moves_list.append(Move(self.name, position, target_position, is_capturing=True))
-                    break
-                current_position_x += direction[0]
-                current_position_y += direction[1]
-
-        # Possible moves for the bishop in the 4 diagonals
-        return moves_list
 
 class Rook(Piece):
+    __slots__ = ()
+
     def __init__(self, color:str) -> None:
-        super().__init__()
-        self.color: str = color
-        if color == "w":
-            self.name: str = "R"
-        else:
-            self.name: str = "r"
+        super().__init__(color, "R" if color == "w" else "r")
     
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
         The rook can move horizontally and vertically.
         '''
-        moves_list: list[Move] = []
+        targets = rook_attacks(position, chess_board.occupancy["w"] | chess_board.occupancy["b"]) & ~chess_board.occupancy[self.color]
+        return self.targets_to_moves(chess_board, position, targets)
 
-        directions_to_check = [[1,0], [0,1], [-1, 0], [0, -1]]
-        for direction in directions_to_check :
-            
-            current_position_x = position % 8 + direction[0]
-            current_position_y = position // 8 + direction[1]
-            
-            while current_position_x >= 0 and current_position_x < 8 and current_position_y >= 0 and current_position_y < 8 :
-                target_position = current_position_y * 8 + current_position_x
-                if chess_board.board_list[target_position] == None :
-                    moves_list.append(Move(self.name, position, target_position))
-                else :
-                    if chess_board.board_list[target_position].color != self.color :
-                        moves_list.append(Move(self.name, position, target_position, is_capturing=True))
-                    break
-                current_position_x += direction[0]
-                current_position_y += direction[1]
-
-        return moves_list
 
 class Queen(Piece):
+    __slots__ = ()
+
     def __init__(self, color:str) -> None:
-        super().__init__()
-        self.color: str = color
-        if color == "w":
-            self.name: str = "Q"
-        else:
-            self.name: str = "q"
+        super().__init__(color, "Q" if color == "w" else "q")
     
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
         The queen can move horizontally, vertically and diagonally.
         '''
-        moves_list: list[Move] = []
+        targets = queen_attacks(position, chess_board.occupancy["w"] | chess_board.occupancy["b"]) & ~chess_board.occupancy[self.color]
+        return self.targets_to_moves(chess_board, position, targets)
 
-        directions_to_check = [[1,1], [1,-1], [-1, -1], [-1, 1], [1,0], [0,1], [-1, 0], [0, -1]]
-        for direction in directions_to_check :
-            
-            current_position_x = position % 8 + direction[0]
-            current_position_y = position // 8 + direction[1]
-            
-            while current_position_x >= 0 and current_position_x < 8 and current_position_y >= 0 and current_position_y < 8 :
-                target_position = current_position_y * 8 + current_position_x
-                if chess_board.board_list[target_position] == None :
-                    moves_list.append(Move(self.name, position, target_position))
-                else :
-                    if chess_board.board_list[target_position].color != self.color :
-                        moves_list.append(Move(self.name, position, target_position, is_capturing=True))
-                    break
-                current_position_x += direction[0]
-                current_position_y += direction[1]
-
-        return moves_list
 
 class King(Piece):
+    __slots__ = ()
+
     def __init__(self, color:str) -> None:
-        super().__init__()
-        self.color: str = color
-        if color == "w":
-            self.name: str = "K"
-        else:
-            self.name: str = "k"
+        super().__init__(color, "K" if color == "w" else "k")
     
     def possible_moves(self, chess_board, position) -> list[Move]:
         '''
         The king can move one square in any direction.
         '''
-        moves_list: list[Move] = []
-
-        # TODO: Implement castling, check and checkmate (prevent the king from moving into check)
-
-        directions_to_check = [[1,1], [1,-1], [-1, -1], [-1, 1], [1,0], [0,1], [-1, 0], [0, -1]]
-        for direction in directions_to_check :
-            
-            current_position_x = position % 8 + direction[0]
-            current_position_y = position // 8 + direction[1]
-            
-            if current_position_x >= 0 and current_position_x < 8 and current_position_y >= 0 and current_position_y < 8 :
-                target_position = current_position_y * 8 + current_position_x
-                if chess_board.board_list[target_position] == None :
-                    moves_list.append(Move(self.name, position, target_position))
-                else :
-                    if chess_board.board_list[target_position].color != self.color :
-                        moves_list.append(Move(self.name, position, target_position, is_capturing=True))
-                current_position_x += direction[0]
-                current_position_y += direction[1]
+        moves_list: list[Move] = self.targets_to_moves(chess_board, position, KING_ATTACKS[position] & ~chess_board.occupancy[self.color])
         
-        # White king 
-        if self.color == "w" :
-            if chess_board.castling_rights_w != "" :
-                if chess_board.castling_rights_w.find("K") != -1 :
-                    if chess_board.get_piece_at("b1") == None and chess_board.get_piece_at("c1") == None and chess_board.get_piece_at("d1") == None :
-                        moves_list.append(Move(self.name, position, chess_board.square_to_index("c1")))
-                if chess_board.castling_rights_w.find("Q") != -1 :
-                    if chess_board.get_piece_at("g1") == None and chess_board.get_piece_at("f1") == None :
-                        moves_list.append(Move(self.name, position, chess_board.square_to_index("g1")))
-        elif self.color == "b" :
-            if chess_board.castling_rights_b != "" :
-                if chess_board.castling_rights_b.find("k") != -1 :
-                    if chess_board.get_piece_at("b8") == None and chess_board.get_piece_at("c8") == None and chess_board.get_piece_at("d8") == None :
-                        moves_list.append(Move(self.name, position, chess_board.square_to_index("c8")))
-                if chess_board.castling_rights_b.find("q") != -1 :
-                    if chess_board.get_piece_at("g8") == None and chess_board.get_piece_at("f8") == None :
-                        moves_list.append(Move(self.name, position, chess_board.square_to_index("g8")))
+        # Castling: the king and the rook must be on their starting squares, the squares between them empty
+        # and the king can neither be in check nor go through or land on an attacked square
+        ennemy_color = "b" if self.color == "w" else "w"
+        castling_rights = chess_board.castling_rights_w if self.color == "w" else chess_board.castling_rights_b
+        first_row_index = 0 if self.color == "w" else 56
+        rook_name = "R" if self.color == "w" else "r"
+        occupied = chess_board.occupancy["w"] | chess_board.occupancy["b"]
+
+        if castling_rights != "" and position == first_row_index + 3 and not chess_board.is_square_attacked(position, ennemy_color) :
+            # Kingside (king goes to g, rook from h to f)
+            if castling_rights.upper().find("K") != -1 and chess_board.bitboards[rook_name] & (1 << first_row_index) :
+                if not occupied & (0b110 << first_row_index) :
+                    if not chess_board.is_square_attacked(position - 1, ennemy_color) and not chess_board.is_square_attacked(position - 2, ennemy_color) :
+                        moves_list.append(Move(self.name, position, position - 2))
+            # Queenside (king goes to c, rook from a to d)
+            if castling_rights.upper().find("Q") != -1 and chess_board.bitboards[rook_name] & (1 << (first_row_index + 7)) :
+                if not occupied & (0b1110000 << first_row_index) :
+                    if not chess_board.is_square_attacked(position + 1, ennemy_color) and not chess_board.is_square_attacked(position + 2, ennemy_color) :
+                        moves_list.append(Move(self.name, position, position + 2))
         return moves_list
+
+
+# Shared instance of every piece, indexed by name
+PIECES: dict[str, Piece] = {
+    piece.name: piece
+    for piece_class in (Pawn, Knight, Bishop, Rook, Queen, King)
+    for piece in (piece_class("w"), piece_class("b"))
+}
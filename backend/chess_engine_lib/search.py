@@ -0,0 +1,590 @@
+'''
+Built-in alpha-beta search, used as the AI when no UCI engine (Stockfish) is available.
+
+Iterative deepening negamax with a transposition table, move ordering (hash move, MVV-LVA captures,
+killer moves, history heuristic) and a quiescence search of the captures, bounded by a time limit.
+BuiltinEngine wraps it behind the same interface as UciEngine so that the AI advisor can use either.
+
+Usage (from the backend folder):
+    python -m chess_engine_lib.search                       # benchmark: fixed depth search of a few positions
+    python -m chess_engine_lib.search --depth 5             # deeper benchmark
+    python -m chess_engine_lib.search --fen "<fen>" --time 2  # best move of a position within 2 seconds
+'''
+import argparse
+import sys
+import threading
+import time
+
+from chess_engine_lib.board import Board, PIECE_NAMES
+from chess_engine_lib.move import Move
+from chess_engine_lib.uci_engine import STARTING_FEN, UciInfo
+
+# Scores in centipawns, from the point of view of the player to move
+MATE_SCORE: int = 100000
+# Scores above this are mates (in MATE_SCORE - score plies)
+MATE_THRESHOLD: int = MATE_SCORE - 1000
+MAX_PLY: int = 64
+
+PIECE_VALUES: dict[str, int] = {"P": 100, "N": 320, "B": 330, "R": 500, "Q": 900, "K": 0}
+
+# Piece-square tables for white, from a8 to h1 (rank 8 first, file a first)
+PIECE_SQUARE_TABLES_A8: dict[str, list[int]] = {
+    "P": [  0,  0,  0,  0,  0,  0,  0,  0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+            5,  5, 10, 25, 25, 10,  5,  5,
+            0,  0,  0, 20, 20,  0,  0,  0,
+            5, -5,-10,  0,  0,-10, -5,  5,
+            5, 10, 10,-20,-20, 10, 10,  5,
+            0,  0,  0,  0,  0,  0,  0,  0],
+    "N": [-50,-40,-30,-30,-30,-30,-40,-50,
+          -40,-20,  0,  0,  0,  0,-20,-40,
+          -30,  0, 10, 15, 15, 10,  0,-30,
+          -30,  5, 15, 20, 20, 15,  5,-30,
+          -30,  0, 15, 20, 20, 15,  0,-30,
+          -30,  5, 10, 15, 15, 10,  5,-30,
+          -40,-20,  0,  5,  5,  0,-20,-40,
+          -50,-40,-30,-30,-30,-30,-40,-50],
+    "B": [-20,-10,-10,-10,-10,-10,-10,-20,
+          -10,  0,  0,  0,  0,  0,  0,-10,
+          -10,  0,  5, 10, 10,  5,  0,-10,
+          -10,  5,  5, 10, 10,  5,  5,-10,
+          -10,  0, 10, 10, 10, 10,  0,-10,
+          -10, 10, 10, 10, 10, 10, 10,-10,
+          -10,  5,  0,  0,  0,  0,  5,-10,
+          -20,-10,-10,-10,-10,-10,-10,-20],
+    "R": [  0,  0,  0,  0,  0,  0,  0,  0,
+            5, 10, 10, 10, 10, 10, 10,  5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+            0,  0,  0,  5,  5,  0,  0,  0],
+    "Q": [-20,-10,-10, -5, -5,-10,-10,-20,
+          -10,  0,  0,  0,  0,  0,  0,-10,
+          -10,  0,  5,  5,  5,  5,  0,-10,
+           -5,  0,  5,  5,  5,  5,  0, -5,
+            0,  0,  5,  5,  5,  5,  0, -5,
+          -10,  5,  5,  5,  5,  5,  0,-10,
+          -10,  0,  5,  0,  0,  0,  0,-10,
+          -20,-10,-10, -5, -5,-10,-10,-20],
+    "K": [-30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -20,-30,-30,-40,-40,-30,-30,-20,
+          -10,-20,-20,-20,-20,-20,-20,-10,
+           20, 20,  0,  0,  0,  0, 20, 20,
+           20, 30, 10,  0,  0, 10, 30, 20],
+}
+
+
+def build_piece_square_values() -> dict[str, list[int]]:
+    '''
+    Builds the value of each piece on each board index (0 is h1, 63 is a8), material included.
+    White pieces read the tables from a8 (index 63 - i), black pieces read them mirrored vertically (index i ^ 7).
+    '''
+    piece_square_values = {}
+    for name in PIECE_NAMES :
+        table = PIECE_SQUARE_TABLES_A8[name.upper()]
+        value = PIECE_VALUES[name.upper()]
+        if name.isupper() :
+            piece_square_values[name] = [value + table[63 - i] for i in range(64)]
+        else :
+            piece_square_values[name] = [value + table[i ^ 7] for i in range(64)]
+    return piece_square_values
+
+PIECE_SQUARE_VALUES: dict[str, list[int]] = build_piece_square_values()
+
+# Bounds stored in the transposition table
+EXACT_BOUND: int = 0
+LOWER_BOUND: int = 1
+UPPER_BOUND: int = 2
+
+# Move ordering scores
+HASH_MOVE_SCORE: int = 1 << 30
+CAPTURE_SCORE: int = 1 << 28
+KILLER_SCORES: tuple[int, int] = (1 << 27, (1 << 27) - 1)
+
+
+class SearchTimeout(Exception) :
+    '''
+    Raised inside the search when the time is over or the search was stopped.
+    '''
+
+
+class Searcher :
+    '''
+    Alpha-beta searcher working directly on a Board (with execute_move / unmake_move).
+    The transposition table, killers and history are kept between searches of the same game.
+    '''
+    def __init__(self, transposition_table_size: int = 1 << 18) -> None:
+        self.transposition_table_size: int = transposition_table_size
+        # Zobrist key -> (depth, score, bound, packed best move)
+        self.transposition_table: dict[int, tuple[int, int, int, int]] = {}
+        self.killer_moves: list[list[int]] = [[0, 0] for _ in range(MAX_PLY + 1)]
+        # History heuristic, by start and end index of the quiet moves
+        self.history: list[int] = [0] * (64 * 64)
+
+        # Time limit: None to search until stop (see set_deadline)
+        self.deadline: float = None
+        # Stop of the next (or current) search, a new one for each search (see start)
+        self.stop_event = threading.Event()
+        self.search_stop_event = self.stop_event
+        self.nodes: int = 0
+        # Zobrist keys of the positions of the game and of the current line, for the repetitions
+        self.position_keys: list[int] = []
+
+    def new_game(self) -> None:
+        '''
+        Forgets everything learnt in the previous game.
+        '''
+        self.transposition_table.clear()
+        self.killer_moves = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * (64 * 64)
+
+    def set_deadline(self, deadline: float) -> None:
+        '''
+        Changes the time limit of the search (can be called during a search, e.g. on ponderhit).
+        @param deadline: The time.perf_counter() value the search must end at, None for no limit.
+        '''
+        self.deadline = deadline
+
+    def start(self, time_limit: float = None) -> None:
+        '''
+        Gets the searcher ready for the next search, to be called when the search is submitted so that a stop
+        or a new deadline arriving before the search begins is kept. A search still running is stopped.
+        @param time_limit: The time the search can take in seconds (None for no limit, until stop or max_depth).
+        '''
+        self.stop_event.set()
+        self.stop_event = threading.Event()
+        self.set_deadline(time.perf_counter() + time_limit if time_limit != None else None)
+
+    def stop(self) -> None:
+        '''
+        Ends the current search right away (or the next one if it has not begun), the best move of the last depth completed is kept.
+        '''
+        self.stop_event.set()
+
+    def search(self, board: Board, max_depth: int = MAX_PLY, on_info=None, game_keys: list[int] = None) -> tuple[Move, UciInfo]:
+        '''
+        Searches the best move of a position with iterative deepening, until the deadline, stop or max_depth (see start).
+        @param board: The board of the position (restored once the search is over).
+        @param max_depth: The deepest depth to search.
+        @param on_info: Function called with the UciInfo after each depth completed.
+        @param game_keys: The Zobrist keys of the positions played before, to see the repetitions.
+        @return: The best move (None if there is no legal move) and what was found about the position.
+        '''
+        self.search_stop_event = self.stop_event
+        self.nodes = 0
+        self.position_keys = list(game_keys or [])
+        self.killer_moves = [[0, 0] for _ in range(MAX_PLY + 1)]
+
+        root_moves = board.generate_legal_moves()
+        uci_info = UciInfo()
+        if len(root_moves) == 0 :
+            return None, uci_info
+        best_move = root_moves[0]
+
+        for depth in range(1, max_depth + 1) :
+            try :
+                score = self.negamax(board, depth, -MATE_SCORE, MATE_SCORE, 0)
+            except SearchTimeout :
+                break
+
+            entry = self.transposition_table.get(board.zobrist_key)
+            if entry != None :
+                best_move = self.find_move(root_moves, entry[3]) or best_move
+
+            uci_info.depth = depth
+            if abs(score) >= MATE_THRESHOLD :
+                plies_to_mate = MATE_SCORE - abs(score)
+                uci_info.score_cp, uci_info.score_mate = None, (plies_to_mate + 1) // 2 * (1 if score > 0 else -1)
+            else :
+                uci_info.score_cp, uci_info.score_mate = score, None
+            uci_info.pv = self.get_principal_variation(board, depth)
+            if on_info != None :
+                on_info(uci_info)
+
+            # No need to go deeper once a mate is found
+            if abs(score) >= MATE_THRESHOLD :
+                break
+
+        return best_move, uci_info
+
+    def check_time(self) -> None:
+        '''
+        Raises SearchTimeout if the time is over (checked every few thousand nodes).
+        '''
+        if self.search_stop_event.is_set() or (self.deadline != None and time.perf_counter() >= self.deadline) :
+            raise SearchTimeout()
+
+    def negamax(self, board: Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        '''
+        Returns the score of the position for the player to move, searched depth plies deep.
+        '''
+        self.nodes += 1
+        if self.nodes & 2047 == 0 :
+            self.check_time()
+
+        zobrist_key = board.zobrist_key
+        if ply > 0 :
+            # Draw by repetition or by the 50 moves rule
+            if board.halfmove_clock >= 100 or zobrist_key in self.position_keys :
+                return 0
+
+        in_check = board.check_verification(board.player_to_move) == 1
+        if in_check and ply < MAX_PLY :
+            # Check extension: never stop the search in the middle of a check
+            depth += 1
+
+        if depth <= 0 or ply >= MAX_PLY :
+            return self.quiescence(board, alpha, beta, ply)
+
+        # Transposition table
+        hash_move = 0
+        entry = self.transposition_table.get(zobrist_key)
+        if entry != None :
+            entry_depth, entry_score, entry_bound, hash_move = entry
+            if ply > 0 and entry_depth >= depth :
+                entry_score = self.score_from_table(entry_score, ply)
+                if entry_bound == EXACT_BOUND :
+                    return entry_score
+                if entry_bound == LOWER_BOUND and entry_score >= beta :
+                    return entry_score
+                if entry_bound == UPPER_BOUND and entry_score <= alpha :
+                    return entry_score
+
+        moves = board.generate_legal_moves()
+        if len(moves) == 0 :
+            return -(MATE_SCORE - ply) if in_check else 0
+
+        original_alpha = alpha
+        best_score = -MATE_SCORE
+        best_move = None
+        self.position_keys.append(zobrist_key)
+        try :
+            for move in self.order_moves(board, moves, hash_move, ply) :
+                undo_record = board.execute_move(move)
+                try :
+                    if best_move == None :
+                        score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                    else :
+                        # Principal variation search: prove the move is not better with a null window first
+                        score = -self.negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                        if alpha < score < beta :
+                            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+                finally :
+                    board.unmake_move(undo_record)
+
+                if score > best_score :
+                    best_score = score
+                    best_move = move
+                if score > alpha :
+                    alpha = score
+                if alpha >= beta :
+                    if not move.is_capturing and not move.is_en_passant :
+                        self.update_killers_and_history(move, depth, ply)
+                    break
+        finally :
+            self.position_keys.pop()
+
+        if best_score <= original_alpha :
+            bound = UPPER_BOUND
+        elif best_score >= beta :
+            bound = LOWER_BOUND
+        else :
+            bound = EXACT_BOUND
+        self.store(zobrist_key, depth, self.score_to_table(best_score, ply), bound, best_move.to_packed())
+        return best_score
+
+    def quiescence(self, board: Board, alpha: int, beta: int, ply: int) -> int:
+        '''
+        Searches the captures (and promotions) only, until the position is quiet.
+        In check every move is searched since standing pat is not possible.
+        '''
+        self.nodes += 1
+        if self.nodes & 2047 == 0 :
+            self.check_time()
+
+        in_check = board.check_verification(board.player_to_move) == 1
+        if not in_check :
+            stand_pat = self.evaluate(board)
+            if stand_pat >= beta or ply >= MAX_PLY :
+                return stand_pat
+            if stand_pat > alpha :
+                alpha = stand_pat
+
+        moves = board.generate_legal_moves()
+        if len(moves) == 0 :
+            return -(MATE_SCORE - ply) if in_check else 0
+        if not in_check :
+            moves = [move for move in moves if move.is_capturing or move.is_en_passant or move.promote_to != ""]
+        elif ply >= MAX_PLY :
+            return self.evaluate(board)
+
+        best_score = alpha if not in_check else -MATE_SCORE
+        for move in self.order_moves(board, moves, 0, ply) :
+            undo_record = board.execute_move(move)
+            try :
+                score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            finally :
+                board.unmake_move(undo_record)
+
+            if score > best_score :
+                best_score = score
+            if score > alpha :
+                alpha = score
+            if alpha >= beta :
+                break
+        return best_score
+
+    def evaluate(self, board: Board) -> int:
+        '''
+        Returns the material and piece-square score of the position for the player to move.
+        '''
+        score = 0
+        for name, bitboard in board.bitboards.items() :
+            values = PIECE_SQUARE_VALUES[name]
+            piece_score = 0
+            while bitboard :
+                piece_bit = bitboard & -bitboard
+                piece_score += values[piece_bit.bit_length() - 1]
+                bitboard ^= piece_bit
+            score += piece_score if name.isupper() else -piece_score
+        return score if board.player_to_move == "w" else -score
+
+    def order_moves(self, board: Board, moves: list[Move], hash_move: int, ply: int) -> list[Move]:
+        '''
+        Sorts the moves most promising first: hash move, captures (most valuable victim, least valuable attacker),
+        promotions, killer moves then the quiet moves by history.
+        '''
+        killer_moves = self.killer_moves[ply] if ply <= MAX_PLY else (0, 0)
+        history = self.history
+        board_list = board.board_list
+        scored_moves = []
+        for move in moves :
+            if hash_move != 0 and move.to_packed() == hash_move :
+                move_score = HASH_MOVE_SCORE
+            elif move.is_capturing or move.is_en_passant :
+                victim = board_list[move.end_pos_index]
+                victim_value = PIECE_VALUES[victim.name.upper()] if victim != None else PIECE_VALUES["P"]
+                move_score = CAPTURE_SCORE + victim_value * 16 - PIECE_VALUES[move.piece_name.upper()] // 100
+            else :
+                move_key = move.start_pos_index * 64 + move.end_pos_index
+                if move.promote_to != "" :
+                    move_score = CAPTURE_SCORE + PIECE_VALUES[move.promote_to.upper()]
+                elif move_key == killer_moves[0] :
+                    move_score = KILLER_SCORES[0]
+                elif move_key == killer_moves[1] :
+                    move_score = KILLER_SCORES[1]
+                else :
+                    move_score = history[move_key]
+            if move.promote_to != "" and move.promote_to.upper() != "Q" :
+                # Under-promotions last among the moves of their kind
+                move_score -= PIECE_VALUES["Q"]
+            scored_moves.append((move_score, move))
+        scored_moves.sort(key=lambda scored_move : scored_move[0], reverse=True)
+        return [move for _, move in scored_moves]
+
+    def update_killers_and_history(self, move: Move, depth: int, ply: int) -> None:
+        '''
+        Remembers a quiet move that caused a cutoff.
+        '''
+        move_key = move.start_pos_index * 64 + move.end_pos_index
+        killer_moves = self.killer_moves[ply]
+        if killer_moves[0] != move_key :
+            killer_moves[1] = killer_moves[0]
+            killer_moves[0] = move_key
+        self.history[move_key] += depth * depth
+        if self.history[move_key] >= KILLER_SCORES[1] :
+            # Keep the history below the killers
+            self.history = [value // 2 for value in self.history]
+
+    def store(self, zobrist_key: int, depth: int, score: int, bound: int, packed_move: int) -> None:
+        '''
+        Stores a result in the transposition table (emptied when it is full).
+        '''
+        if len(self.transposition_table) >= self.transposition_table_size and zobrist_key not in self.transposition_table :
+            self.transposition_table.clear()
+        self.transposition_table[zobrist_key] = (depth, score, bound, packed_move)
+
+    def score_to_table(self, score: int, ply: int) -> int:
+        '''
+        Mate scores are stored from the position (not from the root) so that they stay right from any other path.
+        '''
+        if score >= MATE_THRESHOLD :
+            return score + ply
+        if score <= -MATE_THRESHOLD :
+            return score - ply
+        return score
+
+    def score_from_table(self, score: int, ply: int) -> int:
+        if score >= MATE_THRESHOLD :
+            return score - ply
+        if score <= -MATE_THRESHOLD :
+            return score + ply
+        return score
+
+    def find_move(self, moves: list[Move], packed_move: int) -> Move:
+        '''
+        Returns the move of a list matching a packed move, None if there is none.
+        '''
+        for move in moves :
+            if move.to_packed() == packed_move :
+                return move
+        return None
+
+    def get_principal_variation(self, board: Board, max_length: int) -> list[str]:
+        '''
+        Follows the best moves of the transposition table from the position.
+        @return: The moves in UCI notation.
+        '''
+        principal_variation = []
+        undo_records = []
+        seen_keys = set()
+        while len(principal_variation) < max_length and board.zobrist_key not in seen_keys :
+            seen_keys.add(board.zobrist_key)
+            entry = self.transposition_table.get(board.zobrist_key)
+            if entry == None :
+                break
+            move = self.find_move(board.generate_legal_moves(), entry[3])
+            if move == None :
+                break
+            principal_variation.append(move.get_uci())
+            undo_records.append(board.execute_move(move))
+        for undo_record in reversed(undo_records) :
+            board.unmake_move(undo_record)
+        return principal_variation
+
+
+class BuiltinEngine :
+    '''
+    The built-in searcher behind the interface of UciEngine (search, ponderhit, stop, new_game, quit),
+    used by the EnginePool when the UCI engine binary is not available.
+    '''
+    # Part of the time left on the clock used for one move
+    TIME_FRACTION: int = 30
+
+    def __init__(self) -> None:
+        self.searcher = Searcher()
+        self.path = "builtin"
+        self.search_lock = threading.Lock()
+        self.think_time: float = None
+        self.is_pondering: bool = False
+
+    def new_game(self) -> None:
+        self.searcher.new_game()
+
+    def prepare_search(self, ponder: bool = False) -> None:
+        '''
+        Gets the engine ready for the next search, to be called when the search is submitted (before search runs).
+        @param ponder: Whether the search ponders.
+        '''
+        with self.search_lock :
+            # No time limit until the clocks are known (see search)
+            self.searcher.start()
+            self.is_pondering = ponder
+            self.think_time = None
+
+    def search(self, initial_fen: str, moves: list[str], wtime: int, btime: int, on_info=None, ponder: bool = False) -> str:
+        '''
+        Searches the best move of a position (same parameters as UciEngine.search, prepare_search is called first).
+        @return: The best move in UCI notation, None if there is no legal move.
+        '''
+        board = Board()
+        board.set_board_fen(initial_fen)
+        game_keys = []
+        for uci in moves :
+            game_keys.append(board.zobrist_key)
+            move = Move.from_uci(board, uci)
+            if move == None :
+                print(f"Built-in engine: illegal move {uci} in the position")
+                return None
+            board.execute_move(move)
+
+        time_left = (wtime if board.player_to_move == "w" else btime) / 1000
+        with self.search_lock :
+            self.think_time = max(time_left / self.TIME_FRACTION, 0.05)
+            # While pondering there is no time limit until ponderhit (unless it already came)
+            if not (ponder and self.is_pondering) :
+                self.searcher.set_deadline(time.perf_counter() + self.think_time)
+        best_move, _ = self.searcher.search(board, on_info=on_info, game_keys=game_keys)
+        return best_move.get_uci() if best_move != None else None
+
+    def ponderhit(self) -> None:
+        '''
+        The search goes on with the time of a normal search.
+        '''
+        with self.search_lock :
+            self.is_pondering = False
+            if self.think_time != None :
+                self.searcher.set_deadline(time.perf_counter() + self.think_time)
+
+    def stop(self) -> None:
+        self.searcher.stop()
+
+    def quit(self) -> None:
+        self.searcher.stop()
+
+
+# Positions of the benchmark
+BENCHMARK_POSITIONS: list[dict] = [
+    {"name": "Initial position", "fen": STARTING_FEN},
+    {"name": "Kiwipete", "fen": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"},
+    {"name": "Middlegame", "fen": "r1bq1rk1/pp2ppbp/2np1np1/8/3NP3/2N1BP2/PPPQ2PP/R3KB1R w KQ - 0 1"},
+    {"name": "Endgame", "fen": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"},
+]
+
+
+def run_benchmark(depth: int = 4) -> None:
+    '''
+    Searches the benchmark positions at a fixed depth and prints the speed of the search.
+    @param depth: The depth of the searches.
+    '''
+    total_nodes = 0
+    total_time = 0
+    board = Board()
+    for position in BENCHMARK_POSITIONS :
+        board.set_board_fen(position["fen"])
+        searcher = Searcher()
+        time_start = time.perf_counter()
+        searcher.start()
+        best_move, uci_info = searcher.search(board, max_depth=depth)
+        time_taken = time.perf_counter() - time_start
+        total_nodes += searcher.nodes
+        total_time += time_taken
+
+        nodes_per_second = searcher.nodes / time_taken if time_taken > 0 else float("inf")
+        score = f"mate {uci_info.score_mate}" if uci_info.score_mate != None else f"cp {uci_info.score_cp}"
+        print(f"{position['name']:<20} depth {uci_info.depth}  {searcher.nodes:>8} nodes  {time_taken:7.2f} s  {nodes_per_second:>7.0f} nps  "
+              f"{score:<10} best {best_move.get_uci()}  pv {' '.join(uci_info.pv)}")
+
+    print(f"Total: {total_nodes} nodes  {total_time:.2f} s  {total_nodes / total_time:.0f} nps")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Built-in search engine: benchmark or best move of a position.")
+    parser.add_argument("--depth", type=int, default=4, help="depth of the benchmark searches")
+    parser.add_argument("--fen", help="search the best move of this position instead of running the benchmark")
+    parser.add_argument("--time", type=float, default=2, help="time of the search of --fen in seconds")
+    arguments = parser.parse_args()
+
+    if arguments.fen != None :
+        board = Board()
+        board.set_board_fen(arguments.fen)
+        searcher = Searcher()
+        print_info = lambda uci_info : print(f"depth {uci_info.depth}  score {uci_info.score_cp if uci_info.score_mate == None else f'mate {uci_info.score_mate}'}  "
+                                             f"nodes {searcher.nodes}  pv {' '.join(uci_info.pv)}")
+        searcher.start(arguments.time)
+        best_move, _ = searcher.search(board, on_info=print_info)
+        print(f"bestmove {best_move.get_uci() if best_move != None else '(none)'}")
+        return 0
+
+    run_benchmark(arguments.depth)
+    return 0
+
+
+if __name__ == "__main__" :
+    sys.exit(main())
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+from chess_engine_lib.move import Move
+from chess_engine_lib.led_com import LedFrame
+
+
+class PrecomputedPickUp :
+    '''
+    What the engine needs when a piece is lifted from a square: its legal moves (already annotated)
+    and the LED frame highlighting them.
+    '''
+    def __init__(self, moves: list[Move], led_frame: LedFrame) -> None:
+        self.moves: list[Move] = moves
+        self.led_frame: LedFrame = led_frame
+
+
+class SpeculativeCache :
+    '''
+    Bounded LRU cache of the pick-ups precomputed while the board is idle, keyed by the Zobrist hash
+    of the position and the square of the piece.
+    The size is the memory budget of the speculation: a pick-up holds a few moves and one LED frame.
+    '''
+    def __init__(self, max_size: int = 512) -> None:
+        self.max_size: int = max_size
+        self.entries: OrderedDict[tuple[int, int], PrecomputedPickUp] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.cancelled_runs: int = 0
+
+    def contains(self, zobrist_key: int, square: int) -> bool:
+        '''
+        Returns whether a pick-up is already precomputed (without touching the counters nor the LRU order).
+        @param zobrist_key: The Zobrist hash of the position.
+        @param square: The index of the square the piece is lifted from.
+        '''
+        return (zobrist_key, square) in self.entries
+
+    def get(self, zobrist_key: int, square: int) -> PrecomputedPickUp:
+        '''
+        Returns a precomputed pick-up and marks it as the most recently used.
+        @param zobrist_key: The Zobrist hash of the position.
+        @param square: The index of the square the piece is lifted from.
+        @return: The precomputed pick-up, None if it was not precomputed.
+        '''
+        precomputed_pick_up = self.entries.get((zobrist_key, square))
+        if precomputed_pick_up == None :
+            self.misses += 1
+            return None
+        self.entries.move_to_end((zobrist_key, square))
+        self.hits += 1
+        return precomputed_pick_up
+
+    def put(self, zobrist_key: int, square: int, precomputed_pick_up: PrecomputedPickUp) -> None:
+        '''
+        Stores a precomputed pick-up, evicting the least recently used one if the budget is reached.
+        @param zobrist_key: The Zobrist hash of the position.
+        @param square: The index of the square the piece is lifted from.
+        @param precomputed_pick_up: The moves and LED frame of the pick-up.
+        '''
+        if self.max_size <= 0 :
+            return
+        self.entries[(zobrist_key, square)] = precomputed_pick_up
+        self.entries.move_to_end((zobrist_key, square))
+        while len(self.entries) > self.max_size :
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        '''
+        Removes every pick-up from the cache (the counters are kept).
+        '''
+        self.entries.clear()
+
+    def get_stats(self) -> dict:
+        '''
+        Returns the cache counters.
+        '''
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled_runs": self.cancelled_runs,
+        }
@@ -0,0 +1,85 @@
+from chess_engine_lib.board import Board
+from chess_engine_lib.move import Move
+
+# The Syzygy probing code comes from python-chess, the tablebase is simply disabled without it
+try :
+    import chess
+    import chess.syzygy
+except ImportError :
+    chess = None
+
+
+class SyzygyTablebase :
+    '''
+    Endgame tablebase in the Syzygy format, probed for the positions with few pieces left.
+    Needs python-chess (pip install chess) and the tablebase files, it is disabled otherwise.
+    '''
+    def __init__(self, directory: str, max_pieces: int = 5) -> None:
+        self.directory: str = directory
+        self.max_pieces: int = max_pieces
+        self.tablebase = None
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+        if chess == None :
+            print("python-chess is not installed, the endgame tablebase is disabled.")
+            return
+        try :
+            self.tablebase = chess.syzygy.open_tablebase(directory)
+        except Exception as e :
+            print(f"Could not open the endgame tablebase in {directory}: {e}")
+
+    def is_available(self) -> bool:
+        return self.tablebase != None
+
+    def get_move(self, board: Board, legal_moves: list[Move] = None) -> Move:
+        '''
+        Returns the best move of a position according to the tablebase: a win as fast as possible (fewest moves
+        before a capture or pawn move), a draw, or the longest loss.
+        @param board: The board of the position.
+        @param legal_moves: The legal moves of the position (generated from the board if not given).
+        @return: The move, None if the position has too many pieces or is not in the tablebase.
+        '''
+        if self.tablebase == None or bin(board.get_occupied()).count("1") > self.max_pieces :
+            return None
+
+        if legal_moves == None :
+            legal_moves = board.generate_legal_moves()
+        chess_board = chess.Board(board.get_board_fen())
+
+        best_move = None
+        best_rank = None
+        try :
+            for move in legal_moves :
+                chess_board.push_uci(move.get_uci())
+                # Result for the player to move after the move: negative if we win
+                child_wdl = self.tablebase.probe_wdl(chess_board)
+                child_dtz = self.tablebase.probe_dtz(chess_board)
+                chess_board.pop()
+
+                wdl = -child_wdl
+                # Win: shortest way, loss: longest way
+                rank = (wdl, -abs(child_dtz) if wdl > 0 else abs(child_dtz))
+                if best_rank == None or rank > best_rank :
+                    best_rank = rank
+                    best_move = move
+        except (KeyError, chess.syzygy.MissingTableError) :
+            # Some table of the position is missing
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return best_move
+
+    def get_stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "available": self.is_available(),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        if self.tablebase != None :
+            self.tablebase.close()
@@ -0,0 +1,204 @@
+import subprocess
+import threading
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def get_position_command(initial_fen: str, moves: list[str]) -> str:
+    '''
+    Returns the UCI command of a position given as the start of the game and the moves played since.
+    @param initial_fen: The FEN of the position the game started from.
+    @param moves: The moves played since in UCI notation.
+    '''
+    position_command = "position startpos" if initial_fen == STARTING_FEN else f"position fen {initial_fen}"
+    if len(moves) > 0 :
+        position_command += " moves " + " ".join(moves)
+    return position_command
+
+
+class UciInfo :
+    '''
+    What a UCI engine reported about its search so far (from its "info" lines).
+    '''
+    def __init__(self) -> None:
+        self.depth: int = 0
+        # Score from the point of view of the player to move, in centipawns or in moves to mate (None if not given)
+        self.score_cp: int = None
+        self.score_mate: int = None
+        # Principal variation in UCI notation, best move first
+        self.pv: list[str] = []
+
+    def update(self, info_line: str) -> bool:
+        '''
+        Reads the fields of an "info" line.
+        @param info_line: The line sent by the engine.
+        @return: Whether the line had a principal variation (so a new best move).
+        '''
+        tokens = info_line.split()
+        has_pv = False
+        i = 1
+        while i < len(tokens) :
+            token = tokens[i]
+            if token == "depth" and i + 1 < len(tokens) :
+                self.depth = int(tokens[i + 1])
+                i += 2
+            elif token == "score" and i + 2 < len(tokens) :
+                if tokens[i + 1] == "cp" :
+                    self.score_cp, self.score_mate = int(tokens[i + 2]), None
+                elif tokens[i + 1] == "mate" :
+                    self.score_cp, self.score_mate = None, int(tokens[i + 2])
+                i += 3
+            elif token == "pv" :
+                # The pv is always the last field of the line
+                self.pv = tokens[i + 1:]
+                has_pv = len(self.pv) > 0
+                break
+            else :
+                i += 1
+        return has_pv
+
+    def serialize(self) -> dict:
+        return {
+            "depth": self.depth,
+            "score_cp": self.score_cp,
+            "score_mate": self.score_mate,
+            "pv": self.pv,
+        }
+
+
+class UciEngine :
+    '''
+    Minimal client of a UCI engine (e.g. Stockfish) running as a subprocess.
+    A search is run by one thread at a time (see search), stop and ponderhit can be called from any thread
+    once the search is prepared (see prepare_search).
+    The process is kept for the whole game: the positions are sent as the moves played from the start
+    so that the engine keeps its hash from one move to the next.
+    '''
+    def __init__(self, path: str, parameters: dict = None) -> None:
+        self.path = path
+        self.process = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True, bufsize=1)
+        self.write_lock = threading.Lock()
+
+        # State of the search prepared or running: the go command is only sent once, a stop or ponderhit
+        # arriving before it is applied to the go command instead of being lost
+        self.search_lock = threading.Lock()
+        self.is_pondering: bool = False
+        self.is_stop_requested: bool = False
+        self.is_go_sent: bool = False
+
+        self.send("uci")
+        self.wait_for("uciok")
+        for name, value in (parameters or {}).items() :
+            self.send(f"setoption name {name} value {value}")
+        self.send("isready")
+        self.wait_for("readyok")
+
+    def send(self, command: str) -> None:
+        '''
+        Sends a command to the engine.
+        '''
+        with self.write_lock :
+            self.process.stdin.write(command + "\n")
+            self.process.stdin.flush()
+
+    def read_line(self) -> str:
+        '''
+        Reads the next line sent by the engine.
+        @return: The line, without the end of line.
+        '''
+        line = self.process.stdout.readline()
+        if line == "" :
+            raise EOFError(f"The UCI engine {self.path} has stopped.")
+        return line.strip()
+
+    def wait_for(self, token: str) -> str:
+        '''
+        Reads lines until one starts with a token.
+        @return: The line starting with the token.
+        '''
+        while True :
+            line = self.read_line()
+            if line.startswith(token) :
+                return line
+
+    def new_game(self) -> None:
+        '''
+        Tells the engine the next searches are from another game (it clears its hash).
+        Not to be called during a search.
+        '''
+        self.send("ucinewgame")
+        self.send("isready")
+        self.wait_for("readyok")
+
+    def prepare_search(self, ponder: bool = False) -> None:
+        '''
+        Gets the engine ready for the next search, to be called when the search is submitted (before search runs).
+        @param ponder: Whether the search ponders.
+        '''
+        with self.search_lock :
+            self.is_pondering = ponder
+            self.is_stop_requested = False
+            self.is_go_sent = False
+
+    def search(self, initial_fen: str, moves: list[str], wtime: int, btime: int, on_info=None, ponder: bool = False) -> str:
+        '''
+        Searches the best move of a position, the engine manages its time from the clocks (prepare_search is called first).
+        @param initial_fen: The FEN of the position the game started from.
+        @param moves: The moves played since in UCI notation.
+        @param wtime: The time left on the clock of white in milliseconds.
+        @param btime: The time left on the clock of black in milliseconds.
+        @param on_info: Function called with the UciInfo each time the engine reports a new principal variation.
+        @param ponder: Whether to ponder: the search goes on until ponderhit (then it is a normal search) or stop
+                       (a ponderhit received since prepare_search makes it a normal search).
+        @return: The best move in UCI notation, None if the engine has no move or if the search was stopped before it began.
+        '''
+        with self.search_lock :
+            if self.is_stop_requested :
+                return None
+            self.send(get_position_command(initial_fen, moves))
+            self.send(f"go {'ponder ' if ponder and self.is_pondering else ''}wtime {int(wtime)} btime {int(btime)}")
+            self.is_go_sent = True
+
+        uci_info = UciInfo()
+        try :
+            while True :
+                line = self.read_line()
+                if line.startswith("info") :
+                    if uci_info.update(line) and on_info != None :
+                        on_info(uci_info)
+                elif line.startswith("bestmove") :
+                    tokens = line.split()
+                    if len(tokens) < 2 or tokens[1] == "(none)" :
+                        return None
+                    return tokens[1]
+        finally :
+            with self.search_lock :
+                self.is_go_sent = False
+
+    def ponderhit(self) -> None:
+        '''
+        Tells the engine the opponent played the move it was pondering on, the search goes on as a normal search.
+        '''
+        with self.search_lock :
+            self.is_pondering = False
+            if self.is_go_sent :
+                self.send("ponderhit")
+
+    def stop(self) -> None:
+        '''
+        Asks the engine to end the current search right away (it still sends its best move).
+        '''
+        with self.search_lock :
+            self.is_stop_requested = True
+            if self.is_go_sent :
+                self.send("stop")
+
+    def quit(self) -> None:
+        '''
+        Stops the engine process.
+        '''
+        try :
+            self.send("quit")
+            self.process.wait(timeout=1)
+        except Exception :
+            self.process.kill()
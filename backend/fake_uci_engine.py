@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+'''
+Fake UCI engine to try the AI advisor without Stockfish (e.g. EnginePool("./fake_uci_engine.py")).
+It plays random legal moves, deepening its "search" a few times per second, and understands
+position startpos/fen ... moves ..., go [ponder] wtime btime, ponderhit, stop, ucinewgame and quit.
+'''
+import os
+import random
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chess_engine_lib.board import Board
+from chess_engine_lib.move import Move
+from chess_engine_lib.uci_engine import STARTING_FEN
+
+# Seconds of "search" per depth
+DEPTH_TIME = 0.1
+MAX_DEPTH = 20
+
+
+class FakeSearch :
+    def __init__(self, board: Board, think_time: float, ponder: bool) -> None:
+        self.board = board
+        self.think_time = think_time
+        self.stop_event = threading.Event()
+        # Set by ponderhit (or right away if not pondering): the think time starts then
+        self.ponderhit_event = threading.Event()
+        if not ponder :
+            self.ponderhit_event.set()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        legal_moves = self.board.generate_legal_moves()
+        best_line = []
+        depth = 0
+        while not self.stop_event.is_set() and len(legal_moves) > 0 :
+            # The search only ends on its own once it is not pondering anymore
+            if self.ponderhit_event.is_set() and (depth >= MAX_DEPTH or depth * DEPTH_TIME >= self.think_time) :
+                break
+            if self.stop_event.wait(DEPTH_TIME) :
+                break
+            depth += 1
+            best_line = self.get_random_line(2)
+            send(f"info depth {depth} score cp {random.randint(-50, 50)} nodes {depth * 1000} pv {' '.join(best_line)}")
+
+        send(f"bestmove {best_line[0] if len(best_line) > 0 else '(none)'}" + (f" ponder {best_line[1]}" if len(best_line) > 1 else ""))
+
+    def get_random_line(self, length: int) -> list[str]:
+        board = self.board.get_copy()
+        line = []
+        for _ in range(length) :
+            legal_moves = board.generate_legal_moves()
+            if len(legal_moves) == 0 :
+                break
+            move = random.choice(legal_moves)
+            line.append(move.get_uci())
+            board.execute_move(move)
+        return line
+
+
+def send(line: str) -> None:
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+def get_position(tokens: list[str]) -> Board:
+    '''
+    Builds the board of a position command.
+    '''
+    board = Board()
+    if tokens[1] == "startpos" :
+        board.set_board_fen(STARTING_FEN)
+        moves_index = 2
+    else :
+        moves_index = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board.set_board_fen(" ".join(tokens[2:moves_index]))
+    for uci in tokens[moves_index + 1:] :
+        board.execute_move(Move.from_uci(board, uci))
+    return board
+
+
+def main() -> None:
+    board = Board()
+    board.set_board_fen(STARTING_FEN)
+    search = None
+
+    for line in sys.stdin :
+        tokens = line.split()
+        if len(tokens) == 0 :
+            continue
+
+        if tokens[0] == "uci" :
+            send("id name FakeUciEngine")
+            send("option name Ponder type check default false")
+            send("uciok")
+        elif tokens[0] == "isready" :
+            send("readyok")
+        elif tokens[0] == "position" :
+            board = get_position(tokens)
+        elif tokens[0] == "go" :
+            ponder = "ponder" in tokens
+            clock = "wtime" if board.player_to_move == "w" else "btime"
+            time_left = int(tokens[tokens.index(clock) + 1]) / 1000 if clock in tokens else 1
+            search = FakeSearch(board.get_copy(), time_left / 40, ponder)
+            search.thread.start()
+        elif tokens[0] == "ponderhit" and search != None :
+            search.ponderhit_event.set()
+        elif tokens[0] == "stop" and search != None :
+            search.stop_event.set()
+            search.thread.join()
+        elif tokens[0] == "quit" :
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,14 @@ from flask_cors import CORS
 from flask_socketio import SocketIO
 
 import threading
+import queue
 import json
 import time
 import serial
-from stockfish import Stockfish
 
 # Libraries related to the chess engine
 from chess_engine_lib import ChessEngine
+from chess_engine_lib.engine_pool import EnginePool
 from arduino_com import ArduinoCom
 import numpy as np
 
@@ -27,10 +28,59 @@ class GameState:
     GAME_OVER = 2
 
 
+# Events handled by the game loop, in the order they happened
+class GameEvent:
+    BOARD_CHANGED = 0   # The Arduino sent a new board state
+    ACTION_DONE = 1     # The game was changed from the web interface, the last board state has to be handled again
+    TURN_TIMEOUT = 2    # The player to move ran out of time
+
+
 # Define the chess engine globally
 myEngine = None
 current_game_state = GameState.SETUP_START_POS
 
+# Queue of (event, data) tuples consumed by the game loop
+game_events = queue.Queue()
+
+
+def post_game_event(event: int, data=None) -> None:
+    '''
+    Adds an event to the queue of the game loop (can be called from any thread).
+    '''
+    game_events.put((event, data))
+
+
+class TurnTimer:
+    '''
+    Posts a TURN_TIMEOUT event when the time of the player to move is over, restarted at each turn.
+    '''
+    def __init__(self) -> None:
+        self.timer = None
+        # Incremented at each restart, so that a timeout of a previous turn is ignored
+        self.turn_number = 0
+
+    def restart(self, time_remaining: float) -> None:
+        '''
+        Starts the timer of a new turn.
+        @param time_remaining: The time left to the player to move in seconds.
+        '''
+        self.stop()
+        self.turn_number += 1
+        self.timer = threading.Timer(max(time_remaining, 0), post_game_event, args=(GameEvent.TURN_TIMEOUT, self.turn_number))
+        self.timer.daemon = True
+        self.timer.start()
+
+    def stop(self) -> None:
+        '''
+        Stops the timer of the current turn.
+        '''
+        if self.timer != None :
+            self.timer.cancel()
+            self.timer = None
+
+    def is_current_turn(self, turn_number: int) -> bool:
+        return turn_number == self.turn_number
+
 @app.route('/api/v1/chess_engine_data', methods=['GET'])
 def get_chess_engine_data():
     '''
@@ -79,13 +129,13 @@ def start_new_game():
             fen_loaded = myEngine.load_fen_pos(fen_pos_start)
 
             if not fen_loaded : 
-                response = jsonify({"error": "Invalid fen string, could not start the game"}), 400
+                response = jsonify({"error": "Invalid fen string, could not start the game", "details": myEngine.last_fen_error.serialize()}), 400
             else : 
                 response = jsonify({"message": "Fen string loaded... game will start"})
             
             current_game_state = GameState.SETUP_START_POS
 
-            myEngine.action_done = True
+            post_game_event(GameEvent.ACTION_DONE)
 
         except Exception as e:
             response = jsonify({"error": str(e)}), 500
@@ -135,12 +185,14 @@ def run_chess_engine():
     else:
         print("ERROR with arduino communication")
 
-    # Load the stockfish binary
+    # Load the stockfish binary (one long-lived process per AI player, started when first needed,
+    # the built-in search is used if the binary is missing)
     stockfish_path = "/home/rpi/Stockfish/src/stockfish"  
 
-    stockfish = Stockfish(
+    stockfish = EnginePool(
         path=stockfish_path,
-        parameters={"Threads": 4, "Hash": 64}
+        parameters={"Threads": 4, "Hash": 64},
+        ponder=True
     )
     
     # Setup chess engine ---------------------------------------------------------------------
@@ -151,56 +203,58 @@ def run_chess_engine():
 
     
     # Clear the LED board
-    arduino_com.send_leds_range_command(0, 63, (0, 0, 0))
+    myEngine.led_com.reset_led_board()
+    myEngine.led_com.flush()
+
+    # The board states are handed to the game loop as soon as the reader thread receives them
+    arduino_com.set_board_frames_listener(lambda occupancy : post_game_event(GameEvent.BOARD_CHANGED, occupancy))
+
     # Ask the Arduino to get the initial board state
     arduino_com.ask_for_board_state()
-    arduino_com.process_queue()
 
     # Main loop to handle the game state -----------------------------------------------------
-    time_start_turn = time.time()
-    time_remaining_turn = 10000
+    # The loop sleeps until the next event: a board state, an action from the web interface or the end of a turn
+    turn_timer = TurnTimer()
+    turn_timer.restart(10000)
 
-    move_stockfish_found = False
     myEngine.is_player_b_AI = False
 
-    last_binary_board = None
+    last_occupancy = None
 
     while True:
-        # Read the board state from the Arduino (if available)
-        binary_board = arduino_com.read_board_data()
+        event, data = game_events.get()
 
-        # Check the data received from the Arduino
-        if binary_board is None and myEngine.action_done == False: 
-
-            if time.time() - time_start_turn > time_remaining_turn:
+        if event == GameEvent.TURN_TIMEOUT :
+            if turn_timer.is_current_turn(data) and current_game_state != GameState.GAME_OVER :
                 current_game_state = GameState.GAME_OVER
-            # No data has been read, meaning the board state has not changed
+                print("Game Over.")
             continue
-        elif myEngine.action_done : 
-
-            myEngine.action_done = False
-            binary_board = last_binary_board
-
-        else : 
-            last_binary_board = binary_board
+        elif event == GameEvent.ACTION_DONE :
+            occupancy = last_occupancy
+            if occupancy is None :
+                # No board state received yet, the next one is handled anyway
+                continue
+        else :
+            occupancy = data
+            last_occupancy = occupancy
 
         
         # Check the current game state to determine the action to take
         # Setup is used to show the current start FEN position to the player 
         if current_game_state == GameState.SETUP_START_POS:
             # Help the player to set up the board in the correct position
-            is_setup_done = myEngine.setup_start_position(binary_board)
+            is_setup_done = myEngine.setup_start_position(occupancy)
 
             if is_setup_done :
                 # Change the game state to PLAYING_GAME
                 current_game_state = GameState.PLAYING_GAME
                 socketio.emit('reload_backend', {})
-                time_start_turn = time.time()
+                turn_timer.restart(10000)
         
         # If the game is currently playing handle moves
         elif current_game_state == GameState.PLAYING_GAME:
             # Check if a move was played based on the received board state
-            move_played = myEngine.handle_moves(binary_board)
+            move_played = myEngine.handle_moves(occupancy)
 
             if move_played != None :
                 # Tells frontend to reload
@@ -208,16 +262,13 @@ def run_chess_engine():
                 
                 # Switch time remaining for the turn's player
                 if myEngine.board.player_to_move == "w" : 
-                    time_remaining_turn = myEngine.timer_white
+                    turn_timer.restart(myEngine.timer_white)
                 else : 
-                    time_remaining_turn = myEngine.timer_black
+                    turn_timer.restart(myEngine.timer_black)
                 print(f"time black : {myEngine.timer_black:.2f}, time white : {myEngine.timer_white:.2f}")
 
         elif current_game_state == GameState.GAME_OVER: 
             print("Game Over.")
-        
-        # Process queued commands
-        arduino_com.process_queue()
                 
                 
     
@@ -54,16 +54,12 @@ if __name__ == "__main__" :
     time.sleep(1)
     
     while True :
-        # Receive the response : 
-        scan_result = arduino_com.read_board_data()
-
-        if scan_result is None : 
-            continue
+        # Receive the response (wait for it) : 
+        scan_result = arduino_com.read_board_data(timeout=None)
         
         index_to_light_on = []
-        for i in range(len(scan_result)) :
-            square_state = scan_result[i]
-            if square_state == 1 :
+        for i in range(64) :
+            if scan_result >> i & 1 :
                 index_to_light_on.append(i)
         
         arduino_com.send_leds_range_command(0,63, OFF)
@@ -0,0 +1,105 @@
+import os
+import time
+
+from chess_engine_lib.ai_advisor import AIAdvisor
+from chess_engine_lib.board import Board
+from chess_engine_lib.engine_pool import EnginePool
+from chess_engine_lib.move import Move
+from chess_engine_lib.uci_engine import STARTING_FEN, UciEngine
+
+# Runs the AI advisor against the fake UCI engine (no Stockfish needed): python -m pytest test_ai_advisor.py
+FAKE_ENGINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_uci_engine.py")
+
+# The fake engine thinks 1/40 of its clock: 4s gives a search of a few tenths of a second, 10min one of 15s
+SHORT_CLOCK = 4000
+LONG_CLOCK = 600000
+TIMEOUT = 10
+
+
+def start_advisor() -> tuple[AIAdvisor, list]:
+    '''
+    Starts an advisor on the fake UCI engine.
+    @return: The advisor and the list the best moves it reports are appended to.
+    '''
+    reported_moves = []
+    engine_pool = EnginePool(FAKE_ENGINE_PATH, ponder=True)
+    assert not engine_pool.is_builtin
+    advisor = AIAdvisor(engine_pool, lambda ai_search, best_move : reported_moves.append(best_move))
+    return advisor, reported_moves
+
+
+def get_start_board() -> Board:
+    board = Board()
+    board.set_board_fen(STARTING_FEN)
+    return board
+
+
+def test_best_move() :
+    advisor, reported_moves = start_advisor()
+    try :
+        board = get_start_board()
+        legal_moves = board.get_all_moves_in_position()
+        ai_search = advisor.start_search("w", STARTING_FEN, [], board.get_copy(), legal_moves, SHORT_CLOCK, SHORT_CLOCK)
+        assert isinstance(ai_search.uci_engine, UciEngine)
+
+        best_move = ai_search.future.result(timeout=TIMEOUT)
+        assert best_move in legal_moves
+        assert ai_search.is_done and ai_search.best_move is best_move
+        assert reported_moves[-1] is best_move
+    finally :
+        advisor.close()
+
+
+def test_ponder_hit() :
+    advisor, reported_moves = start_advisor()
+    try :
+        board = get_start_board()
+        ai_search = advisor.start_search("w", STARTING_FEN, [], board.get_copy(), board.get_all_moves_in_position(), SHORT_CLOCK, SHORT_CLOCK)
+        ai_search.future.result(timeout=TIMEOUT)
+        ai_move, expected_reply = ai_search.info.pv[0], ai_search.info.pv[1]
+
+        # The AI plays, it ponders on the reply it expects
+        board.execute_move(ai_search.best_move)
+        ponder_search = advisor.start_ponder("w", STARTING_FEN, [ai_move], board.get_copy(), SHORT_CLOCK, SHORT_CLOCK)
+        assert ponder_search != None and ponder_search.is_pondering
+        assert advisor.get_infos()["pondering"]
+
+        # The pondering goes on until the opponent plays, it reports nothing meanwhile
+        reported_count = len(reported_moves)
+        time.sleep(0.5)
+        assert not ponder_search.future.done()
+        assert len(reported_moves) == reported_count
+
+        # The opponent plays the expected reply: the same search goes on
+        board.execute_move(Move.from_uci(board, expected_reply))
+        legal_moves = board.get_all_moves_in_position()
+        ai_search = advisor.start_search("w", STARTING_FEN, [ai_move, expected_reply], board.get_copy(), legal_moves, SHORT_CLOCK, SHORT_CLOCK)
+        assert ai_search is ponder_search and not ai_search.is_pondering
+        assert advisor.ponder_hits == 1 and advisor.ponder_misses == 0
+
+        best_move = ai_search.future.result(timeout=TIMEOUT)
+        assert best_move.get_uci() in [move.get_uci() for move in legal_moves]
+        assert reported_moves[-1] is best_move
+    finally :
+        advisor.close()
+
+
+def test_stop() :
+    advisor, reported_moves = start_advisor()
+    try :
+        board = get_start_board()
+        ai_search = advisor.start_search("w", STARTING_FEN, [], board.get_copy(), board.get_all_moves_in_position(), LONG_CLOCK, LONG_CLOCK)
+        time.sleep(0.3)
+        assert not ai_search.future.done()
+
+        # The board changed: the search ends right away and its best move is not reported anymore
+        reported_count = len(reported_moves)
+        stop_time = time.time()
+        advisor.stop_search()
+        ai_search.future.result(timeout=TIMEOUT)
+        assert time.time() - stop_time < 1
+        assert ai_search.is_stopped
+        assert len(reported_moves) == reported_count
+        assert advisor.get_infos()["last_search"]["searching"] == False
+    finally :
+        advisor.close()
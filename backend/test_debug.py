@@ -1,6 +1,7 @@
 import pygame
 import numpy as np
 from chess_engine_lib import ChessEngine
+from chess_engine_lib.move_inference import binary_board_to_occupancy
 # Initialize pygame
 pygame.init()
 
@@ -40,7 +41,7 @@ binary_board[0:16] = 1
 # Change two last rows to 1
 binary_board[48:64] = 1
 
-myEngine.binary_board = binary_board
+myEngine.occupancy = binary_board_to_occupancy(binary_board)
 
 # Main game loop
 running = True
@@ -86,7 +87,7 @@ while running:
         else:
             color = black
 
-        check_color = (myEngine.led_com.led_board_colors[index * 3], myEngine.led_com.led_board_colors[index * 3 + 1], myEngine.led_com.led_board_colors[index * 3 + 2])
+        check_color = tuple(int(channel) for channel in myEngine.led_com.led_board_colors[index])
         if check_color != (0, 0, 0):
             color = check_color
                     